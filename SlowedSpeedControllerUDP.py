@@ -9,11 +9,16 @@ from queue import Queue, Empty
 import subprocess
 import os
 
+# Reference time of the startup trace, taken as early as possible after process launch
+STARTUP_T0 = time.monotonic()
+
 # --- Settings for RTDE ---
 sys.path.append("./rtde")
 try:
     import rtde.rtde as rtde
     import rtde.rtde_config as rtde_config
+    import rtde.rtde_proxy as rtde_proxy
+    import rtde.reconnect as reconnect
 except ImportError:
     print("Error: The RTDE library was not found. Please ensure the path is correct and the library is installed.")
     sys.exit(1)
@@ -22,7 +27,14 @@ except ImportError:
 ROBOT_HOST = "10.4.1.87" # Must correspond to the robot IP
 ROBOT_PORT = 30004 # Must correspond to the robot RTDE port (default 30004)
 CONFIG_XML = './recipe.xml' # Make sure this is the correct path to your recipe.xml
-RTDE_FREQUENCY = 30 # Hz
+RTDE_FREQUENCY = 30 # Hz, idle output rate while nobody is in the inner zones
+RTDE_ALERT_FREQUENCY = 500 # Hz, output rate while somebody is in the inner zones
+RTDE_PROXY_SOCKET = None # Unix socket of rtde_examples/proxy.py to share its robot connection, None to connect directly
+DEAD_LINK_CYCLES = 10 # RTDE periods without data before the link is declared dead, at least rtde.MIN_DEAD_LINK_TIME
+TCP_KEEPALIVE_IDLE = 1 # s without traffic before the first keepalive probe
+TCP_KEEPALIVE_INTERVAL = 1 # s between keepalive probes
+TCP_KEEPALIVE_COUNT = 3 # unanswered probes before the kernel drops the connection
+TCP_USER_TIMEOUT = 0.5 # s sent data may stay unacknowledged
 
 # --- Speed thresholds and params ---
 VELOCITY_ZONE_1         = 0.0 # % [0,1]
@@ -36,7 +48,13 @@ ZONE_2_END_DISTANCE   = 2.1 # m
 ZONE_3_END_DISTANCE   = 2.6 # m
 ZONE_4_END_DISTANCE   = 3.5 # m
 
+# --- Adaptive RTDE frequency ---
+ALERT_ENTER_DISTANCE = ZONE_2_END_DISTANCE # m, switch to RTDE_ALERT_FREQUENCY below this distance
+ALERT_EXIT_DISTANCE  = ZONE_3_END_DISTANCE # m, switch back to RTDE_FREQUENCY beyond this distance...
+ALERT_EXIT_HOLD      = 2.0 # s ...once it stayed there for this long
+
 LAST_SPEED_RECEIVED = 1.0
+# The MIN_TIMES_* are counted in cycles at RTDE_FREQUENCY and scaled while at RTDE_ALERT_FREQUENCY
 MIN_TIMES_HIGH = 90 # maximum times after which the speed is changed upon receiving a higher one
 MIN_TIMES_LOW = 2  # maximum times after which the speed is changed upon receiving a lower one
 CURR_TIMES_LOW = 0
@@ -54,6 +72,12 @@ logging.basicConfig(
 # --- Distance queue ---
 distance_queue = Queue()
 
+def trace_startup(event: str, t0: float = STARTUP_T0):
+    """
+    Log a startup milestone with the time elapsed since t0 (process launch by default).
+    """
+    logging.info(f"[STARTUP] {event}: +{(time.monotonic() - t0) * 1000:.1f} ms")
+
 def calculate_speed_fraction(distance: float) -> float:
     """
     Calculate the speed fraction based on the distance.
@@ -71,6 +95,24 @@ def calculate_speed_fraction(distance: float) -> float:
     else:
         return VELOCITY_ZONE_5
 
+def select_rtde_frequency(distance: float, frequency: int, far_since, now: float):
+    """
+    Select the RTDE output frequency with hysteresis: the alert rate as soon as the distance
+    enters the inner zones, the idle rate once it stayed beyond ALERT_EXIT_DISTANCE for
+    ALERT_EXIT_HOLD seconds. Returns the frequency and the time since the distance is beyond
+    ALERT_EXIT_DISTANCE (None while it is not).
+    """
+    if 0 <= distance < ALERT_ENTER_DISTANCE:
+        return RTDE_ALERT_FREQUENCY, None
+    if 0 <= distance < ALERT_EXIT_DISTANCE:
+        return frequency, None
+    # Beyond the exit distance, or no distance received yet
+    if far_since is None:
+        far_since = now
+    if now - far_since >= ALERT_EXIT_HOLD:
+        frequency = RTDE_FREQUENCY
+    return frequency, far_since
+
 def run_rtde_controller(stop_event: threading.Event):
 
     global LAST_SPEED_RECEIVED, MIN_TIMES_LOW, MIN_TIMES_HIGH, CURR_TIMES_LOW, CURR_TIMES_HIGH, CHANGED
@@ -81,73 +123,79 @@ def run_rtde_controller(stop_event: threading.Event):
     input_data = None
     current_distance = -1.0
     previous_speed_fraction = -1.0 # Variable to store the last sent speed fraction
+    far_since = None # Since when the distance is beyond ALERT_EXIT_DISTANCE
+    # The first connection is traced from process launch, the following ones from the connection loss
+    trace_t0 = STARTUP_T0
+
+    # The recipes are parsed, checked and compiled once, while the main thread starts the UDP listener.
+    # Every reconnect reuses the compiled recipes.
+    try:
+        conf = rtde_config.ConfigFile(CONFIG_XML)
+        input_names, input_types = conf.get_recipe('in')
+        output_names, output_types = conf.get_recipe('out')
+        conf.get_config('out').set_decoding(lazy=True) # Compiles the lazy records used by open_connection
+    except (OSError, ValueError, KeyError) as e:
+        logging.error(f"[RTDE_TX] Invalid recipe configuration {CONFIG_XML}: {e}")
+        stop_event.set()
+        return
+    trace_startup("recipes parsed")
+
+    def open_connection():
+        logging.info("[RTDE_TX] Attempting to connect to UR robot...")
+        con = rtde.RTDE(ROBOT_HOST, ROBOT_PORT, dead_link_cycles=DEAD_LINK_CYCLES)
+        con.set_keepalive(TCP_KEEPALIVE_IDLE, TCP_KEEPALIVE_INTERVAL, TCP_KEEPALIVE_COUNT)
+        con.set_user_timeout(TCP_USER_TIMEOUT)
+        con.set_output_decoding(lazy=True) # The loop reads no output field, decode them only when accessed
+        con.connect(rtde_proxy.open_socket(RTDE_PROXY_SOCKET) if RTDE_PROXY_SOCKET else None)
+        logging.info("[RTDE_TX] Connected to the robot.")
+        trace_startup("connected", trace_t0)
+        return con
+
+    def setup_connection(con):
+        # Input setup, output setup and start are pipelined: the requests are sent together
+        # and the replies collected in order, so the whole setup costs a single round trip.
+        logging.info("[RTDE_TX] Attempting pipelined setup (input, output, start)...")
+        inputs = con.send_setup(output_names, output_types, RTDE_FREQUENCY, [(input_names, input_types)])
+        if not inputs:
+            logging.info("[RTDE_TX] Error configuring RTDE input/output or starting synchronization.")
+        return inputs
+
+    # Failed attempts are retried with a bounded exponential backoff with jitter, the first retry
+    # after a connection loss follows almost immediately. All waits end as soon as stop_event is set.
+    reconnector = reconnect.Reconnector(open_connection, setup_connection, stop_event)
 
     # The outer loop handles RTDE reconnection attempts
     while not stop_event.is_set():
+        con, inputs = reconnector.connect()
+        if con is None:
+            break # Stopped while reconnecting
         try:
-            logging.info("[RTDE_TX] Attempting to connect to UR robot...")
-            con = rtde.RTDE(ROBOT_HOST, ROBOT_PORT)
-
-            # --- RTDE CONNECTION LOOP ---
-            retries = 0
-            MAX_RETRIES = 5 
-            while not con.is_connected() and not stop_event.is_set():
-                if retries >= MAX_RETRIES:
-                    logging.info(f"[RTDE_TX] Unable to connect after {MAX_RETRIES} attempts. Retrying full sequence in 10 seconds.")
-                    raise ConnectionRefusedError("RTDE connection failed repeatedly")
-
-                try:
-                    con.connect()
-                    if con.is_connected():
-                        logging.info("[RTDE_TX] Connected to the robot.")
-                        break # Exit the connection loop if successful
-                except Exception as e:
-                    logging.info(f"[RTDE_TX] Connection error: {e}. Retrying in 2 seconds...")
-                time.sleep(2) # Pause between attempts
-                retries += 1
-
-            if not con.is_connected():
-                raise ConnectionRefusedError("RTDE connection not established")
-
-            conf = rtde_config.ConfigFile(CONFIG_XML)
-            input_names, input_types = conf.get_recipe('in')
-            output_names, output_types = conf.get_recipe('out')
-
-            # --- RTDE SETUP ORDER IS CRUCIAL ---
-            # 1. Setup Input (data to change)
-            logging.info("[RTDE_TX] Attempting send_input_setup...")
-            input_data = con.send_input_setup(input_names, input_types)
-            if not input_data:
-                logging.info("[RTDE_TX] Error configuring RTDE input. Terminating RTDE thread.")
-                raise Exception("Error configuring RTDE input")
-            logging.info("[RTDE_TX] send_input_setup completed.")
-
-            # Initialize the mask and fraction of the slider in the data packet
-            # Ensure these attributes exist on the input_data object
+            input_data = inputs[0]
+            rtde_frequency = RTDE_FREQUENCY # Output frequency of the current connection
+            logging.info("[RTDE_TX] RTDE started and synchronized.")
+            trace_startup("RTDE started", trace_t0)
+            if trace_t0 is not STARTUP_T0:
+                logging.info(f"[RTDE_TX] Recovered from the connection loss in {reconnector.last_recovery_time*1000:.1f} ms "
+                             f"({reconnector.recovery_count} recoveries, {reconnector.attempt_count} connection attempts)")
+
+            # Initialize the mask and slider fraction in the data packet
+            # Make sure these attributes exist on the input_data object
             if hasattr(input_data, 'speed_slider_mask'):
                 input_data.speed_slider_mask = 1
             else:
                 logging.info("[RTDE_TX] 'speed_slider_mask' not found in input recipe. Unable to control speed slider.")
 
             if hasattr(input_data, 'speed_slider_fraction'):
-                input_data.speed_slider_fraction = VELOCITY_ZONE_5 # Initialize to 100%
+                # Restore the last commanded speed right after the start: a reconnection must not
+                # release the robot to full speed. Only the very first connection starts at 100%.
+                if previous_speed_fraction < 0:
+                    previous_speed_fraction = VELOCITY_ZONE_5
+                input_data.speed_slider_fraction = previous_speed_fraction
+                con.send(input_data)
+                trace_startup("first speed_slider_fraction sent", trace_t0)
             else:
                 logging.info("[RTDE_TX] 'speed_slider_fraction' not found in input recipe.")
 
-            # 2. Setup Output
-            logging.info("[RTDE_TX] Attempting send_output_setup...")
-            if not con.send_output_setup(output_names, output_types, RTDE_FREQUENCY):
-                logging.info("[RTDE_TX] Error configuring RTDE output. Terminating RTDE thread.")
-                raise Exception("Error configuring RTDE output")
-            logging.info("[RTDE_TX] send_output_setup completed.")
-
-            # 3. Starting RTDE Synchronization
-            logging.info("[RTDE_TX] Attempting send_start...")
-            if not con.send_start():
-                logging.info("[RTDE_TX] RTDE synchronization failed (send_start). Terminating RTDE thread.")
-                raise Exception("Error send_start RTDE")
-            logging.info("[RTDE_TX] RTDE started and synchronized.")
-
             # --- MAIN RTDE COMMUNICATION LOOP ---
             while not stop_event.is_set() and con.is_connected():
                 state = con.receive() # Receive a state packet from the robot
@@ -163,11 +211,12 @@ def run_rtde_controller(stop_event: threading.Event):
                     # Calculate the new speed fraction based on the distance
                     new_speed_fraction = calculate_speed_fraction(current_distance)
 
+                    cycle_scale = rtde_frequency / RTDE_FREQUENCY # Keeps the hold times constant in seconds
                     # To avoid sudden changes (due to estimation errors or other factors), maintain the same speed for a few receptions
                     # unless the speed needs to be decreased
                     if new_speed_fraction > LAST_SPEED_RECEIVED:
                         CURR_TIMES_HIGH += 1
-                        if(CURR_TIMES_HIGH < MIN_TIMES_HIGH):
+                        if(CURR_TIMES_HIGH < MIN_TIMES_HIGH * cycle_scale):
                             new_speed_fraction = LAST_SPEED_RECEIVED
                             CHANGED = False
                         else:
@@ -177,7 +226,7 @@ def run_rtde_controller(stop_event: threading.Event):
                     else:
                         if new_speed_fraction < LAST_SPEED_RECEIVED:
                             CURR_TIMES_LOW += 1
-                            if(CURR_TIMES_LOW < MIN_TIMES_LOW):
+                            if(CURR_TIMES_LOW < MIN_TIMES_LOW * cycle_scale):
                                 new_speed_fraction = LAST_SPEED_RECEIVED
                                 CHANGED = False
                             else:
@@ -188,7 +237,7 @@ def run_rtde_controller(stop_event: threading.Event):
                     logging.info(f"[RTDE_TX] {LAST_SPEED_RECEIVED*100:.0f}%")
                     # Send the new speed fraction only if it has changed compared to the last sent one
                     if input_data and hasattr(input_data, 'speed_slider_fraction') and \
-                       new_speed_fraction != previous_speed_fraction and CHANGED:
+                       (new_speed_fraction != previous_speed_fraction and CHANGED):
                         input_data.speed_slider_fraction = new_speed_fraction
                         con.send(input_data) # <--- SEND SPEED SLIDER
                         previous_speed_fraction = new_speed_fraction # Update the value for the next comparison
@@ -203,6 +252,15 @@ def run_rtde_controller(stop_event: threading.Event):
 
                     #logging.info(log_robot_data) # Enable for continuous logging of robot data
 
+                    # Switch the RTDE output frequency after the speed command, the switch costs a round trip
+                    target_frequency, far_since = select_rtde_frequency(current_distance, rtde_frequency, far_since, time.monotonic())
+                    if target_frequency != rtde_frequency:
+                        if not con.set_output_frequency(target_frequency):
+                            raise Exception("Error switching the RTDE output frequency")
+                        rtde_frequency = target_frequency
+                        logging.info(f"[RTDE_TX] Distance: {current_distance:.2f} m -> RTDE output at {rtde_frequency} Hz, "
+                                     f"switch took {con.frequency_switch_latency*1000:.1f} ms ({con.frequency_switch_count} switches)")
+
                 elif state is None:
                     # This happens if there is no data available in the RTDE buffer for the current frequency.
                     # It is not necessarily a connection error, but it may indicate that the connection is slow
@@ -210,29 +268,25 @@ def run_rtde_controller(stop_event: threading.Event):
                     logging.info("[RTDE_TX] No RTDE packet received. Check connection or frequency.")
 
                 # The pause between cycles of the RTDE loop is based on the frequency
-                time.sleep(1 / RTDE_FREQUENCY)
-
-        except ConnectionRefusedError as e:
-            logging.info(f"[RTDE_TX] Connection to robot refused or not established: {e}. Retrying in 10s...")
-            time.sleep(10) # Longer pause before retrying full connection
+                time.sleep(1 / rtde_frequency)
+
+            # Without an exception the loop only ends when stopped or when the robot closed the connection
+            if not stop_event.is_set():
+                raise rtde.RTDEException("connection closed by the robot")
+            reconnector.close(con) # Pauses to release the controls
+        except rtde.RTDELinkLostException as e:
+            logging.info(f"[RTDE_TX] RTDE link lost: {e}. Detected {con.link_loss_detection_latency*1000:.0f} ms after the last packet.")
+            trace_t0 = time.monotonic()
+            reconnector.failed(con, e)
+        except (rtde.RTDEException, OSError) as e:
+            logging.info(f"[RTDE_TX] RTDE connection error: {e}. Reconnecting.")
+            trace_t0 = time.monotonic()
+            reconnector.failed(con, e)
         except Exception as e:
-            logging.info(f"[RTDE_TX] Critical error in RTDE thread: {e}. Retrying full sequence in 5 seconds.", exc_info=True)
-            time.sleep(5) # Pause before retrying connection after a generic error
-        finally:
-            # Ensure clean disconnection in any case
-            if con and con.is_connected():
-                try:
-                    logging.info("[RTDE_TX] Sending send_pause before disconnection.")
-                    con.send_pause() # Important to release controls
-                    logging.info("[RTDE_TX] RTDE disconnection in progress.")
-                    con.disconnect()
-                    logging.info("[RTDE_TX] RTDE connection successfully disconnected.")
-                except Exception as e:
-                    logging.info(f"[RTDE_TX] Error during RTDE disconnection: {e}")
-            con = None
-            # Significant pause to give the robot time to clean up state
-            logging.info("[RTDE_TX] Pausing for 30 seconds before new RTDE connection attempt.")
-            time.sleep(30) # Increased pause here to avoid aggressive reconnections
+            logging.info(f"[RTDE_TX] Error in RTDE thread: {e}. Reconnecting.", exc_info=True)
+            trace_t0 = time.monotonic()
+            reconnector.failed(con, e)
+        con = None
 
     logging.info("[RTDE_TX] Thread RTDE terminated.")
 
@@ -240,6 +294,11 @@ def run_rtde_controller(stop_event: threading.Event):
 def main():
     stop_event = threading.Event()
     
+    # The RTDE thread is started first: the TCP connect and the RTDE setup run
+    # while the UDP subprocess starts up and binds its socket
+    rtde_thread = threading.Thread(target=run_rtde_controller, args=(stop_event,), daemon=True)
+    rtde_thread.start()
+
     udp_process = None
     try:
         script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -265,8 +324,6 @@ def main():
         logging.info(f"Error starting UDP subprocess: {e}", exc_info=True)
         sys.exit(1)
 
-    rtde_thread = threading.Thread(target=run_rtde_controller, args=(stop_event,), daemon=True)
-    rtde_thread.start()
 
     logging.info("Premi 'q' e Invio per uscire.")
 
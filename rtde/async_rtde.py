@@ -0,0 +1,343 @@
+# Copyright (c) 2020-2022, Universal Robots A/S,
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the Universal Robots A/S nor the names of its
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL UNIVERSAL ROBOTS A/S BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import asyncio
+import logging
+import socket
+import struct
+
+from rtde import serialize
+from rtde.rtde import (
+    Command,
+    ConnectionState,
+    RTDEException,
+    DEFAULT_TIMEOUT,
+    DEFAULT_QUEUE_SIZE,
+    HEADER_SIZE,
+    LOGNAME,
+    RTDE_PROTOCOL_VERSION_1,
+    RTDE_PROTOCOL_VERSION_2,
+)
+
+_log = logging.getLogger(LOGNAME)
+
+_header = struct.Struct(">HB")
+
+
+class AsyncRTDE(object):
+    """asyncio client for the RTDE interface.
+
+    Offers the handshake of rtde.RTDE as coroutines. A single reader task
+    per connection frames the stream, resolves the replies of pending
+    requests and queues data packages, which are consumed with
+    "async for state in con" or receive(). When the queue of maxsize
+    packages is full the oldest one is dropped and counted in
+    skipped_package_count.
+    """
+
+    def __init__(self, hostname, port=30004, maxsize=DEFAULT_QUEUE_SIZE):
+        self.hostname = hostname
+        self.port = port
+        self.timeout = DEFAULT_TIMEOUT
+        self.__maxsize = maxsize
+        self.__conn_state = ConnectionState.DISCONNECTED
+        self.__reader = None
+        self.__writer = None
+        self.__read_task = None
+        self.__pending = {}
+        self.__states = None
+        self.__output_config = None
+        self.__input_config = {}
+        self.__skipped_package_count = 0
+        self.__protocolVersion = RTDE_PROTOCOL_VERSION_1
+
+    async def connect(self):
+        if self.__writer:
+            return
+
+        self.__reader, self.__writer = await asyncio.wait_for(
+            asyncio.open_connection(self.hostname, self.port), self.timeout
+        )
+        sock = self.__writer.get_extra_info("socket")
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.__skipped_package_count = 0
+        self.__states = asyncio.Queue(self.__maxsize)
+        self.__conn_state = ConnectionState.CONNECTED
+        self.__read_task = asyncio.ensure_future(self.__read_loop())
+        if not await self.negotiate_protocol_version():
+            raise RTDEException("Unable to negotiate protocol version")
+
+    async def disconnect(self):
+        read_task = self.__read_task
+        self.__read_task = None
+        if read_task is not None and read_task is not asyncio.current_task():
+            read_task.cancel()
+        writer = self.__writer
+        self.__writer = None
+        # disconnected before yielding, a woken up caller must not see the
+        # connection as still connected
+        self.__on_disconnected()
+        if writer:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    def is_connected(self):
+        return self.__conn_state is not ConnectionState.DISCONNECTED
+
+    async def get_controller_version(self):
+        version = await self.__sendAndReceive(Command.RTDE_GET_URCONTROL_VERSION)
+        if version:
+            _log.info(
+                "Controller version: %d.%d.%d.%d",
+                version.major,
+                version.minor,
+                version.bugfix,
+                version.build,
+            )
+            return version.major, version.minor, version.bugfix, version.build
+        return None, None, None, None
+
+    async def negotiate_protocol_version(self):
+        cmd = Command.RTDE_REQUEST_PROTOCOL_VERSION
+        payload = struct.pack(">H", RTDE_PROTOCOL_VERSION_2)
+        success = await self.__sendAndReceive(cmd, payload)
+        if success:
+            self.__protocolVersion = RTDE_PROTOCOL_VERSION_2
+        return success
+
+    async def send_input_setup(self, variables, types=[]):
+        cmd = Command.RTDE_CONTROL_PACKAGE_SETUP_INPUTS
+        payload = bytearray(",".join(variables), "utf-8")
+        result = await self.__sendAndReceive(cmd, payload)
+        if result is None:
+            return None
+        if len(types) != 0 and result.types != list(types):
+            _log.error(
+                "Data type inconsistency for input setup: %s - %s", types, result.types
+            )
+            return None
+        result.names = variables
+        self.__input_config[result.id] = result
+        return serialize.DataObject.create_empty(variables, result.id)
+
+    async def send_output_setup(self, variables, types=[], frequency=125):
+        cmd = Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS
+        payload = struct.pack(">d", frequency)
+        payload = payload + (",".join(variables).encode("utf-8"))
+        result = await self.__sendAndReceive(cmd, payload)
+        if result is None:
+            return False
+        if len(types) != 0 and result.types != list(types):
+            _log.error(
+                "Data type inconsistency for output setup: %s - %s", types, result.types
+            )
+            return False
+        result.names = variables
+        self.__output_config = result
+        return True
+
+    async def send_start(self):
+        success = await self.__sendAndReceive(Command.RTDE_CONTROL_PACKAGE_START)
+        if success:
+            _log.info("RTDE synchronization started")
+            self.__conn_state = ConnectionState.STARTED
+        else:
+            _log.error("RTDE synchronization failed to start")
+        return success
+
+    async def send_pause(self):
+        success = await self.__sendAndReceive(Command.RTDE_CONTROL_PACKAGE_PAUSE)
+        if success:
+            _log.info("RTDE synchronization paused")
+            self.__conn_state = ConnectionState.PAUSED
+        else:
+            _log.error("RTDE synchronization failed to pause")
+        return success
+
+    async def send(self, input_data):
+        if self.__conn_state != ConnectionState.STARTED:
+            _log.error("Cannot send when RTDE synchronization is inactive")
+            return
+        if not input_data.recipe_id in self.__input_config:
+            _log.error("Input configuration id not found: " + str(input_data.recipe_id))
+            return
+        config = self.__input_config[input_data.recipe_id]
+        return await self.__sendall(Command.RTDE_DATA_PACKAGE, config.pack(input_data))
+
+    async def receive(self):
+        """Recieve the next data package.
+        Waits until a package is available, returns None when the connection
+        is lost.
+        """
+        if self.__output_config is None:
+            raise RTDEException("Output configuration not initialized")
+        if self.__states is None:
+            return None
+        if self.__conn_state == ConnectionState.DISCONNECTED and self.__states.empty():
+            return None
+        return await self.__states.get()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        state = await self.receive()
+        if state is None:
+            raise StopAsyncIteration
+        return state
+
+    async def send_message(
+        self, message, source="Python Client", type=serialize.Message.INFO_MESSAGE
+    ):
+        cmd = Command.RTDE_TEXT_MESSAGE
+        fmt = ">B%dsB%dsB" % (len(message), len(source))
+        payload = struct.pack(fmt, len(message), message, len(source), source, type)
+        return await self.__sendall(cmd, payload)
+
+    async def __sendAndReceive(self, cmd, payload=b""):
+        future = asyncio.get_event_loop().create_future()
+        self.__pending[cmd] = future
+        try:
+            if not await self.__sendall(cmd, payload):
+                return None
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            _log.warning("no reply received within timeout")
+            return None
+        finally:
+            if self.__pending.get(cmd) is future:
+                del self.__pending[cmd]
+
+    async def __sendall(self, command, payload=b""):
+        if self.__writer is None:
+            _log.error("Unable to send: not connected to Robot")
+            return False
+        self.__writer.write(_header.pack(HEADER_SIZE + len(payload), command) + payload)
+        try:
+            await asyncio.wait_for(self.__writer.drain(), self.timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            await self.disconnect()
+            return False
+        return True
+
+    async def __read_loop(self):
+        cmd = None
+        try:
+            while True:
+                header = await self.__reader.readexactly(HEADER_SIZE)
+                size, cmd = _header.unpack(header)
+                if size < HEADER_SIZE:
+                    raise RTDEException("Invalid package size: " + str(size))
+                payload = await self.__reader.readexactly(size - HEADER_SIZE)
+                self.__on_packet(cmd, payload)
+        except asyncio.IncompleteReadError:
+            _log.error(
+                "received 0 bytes from Controller, probable cause: Controller has stopped"
+            )
+        except (ConnectionError, RTDEException) as e:
+            _log.error("RTDE connection lost: " + str(e))
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            # e.g. ValueError for an IN_USE input setup reply: raised to the
+            # caller of the request, like rtde.RTDE does
+            _log.error("RTDE package %s could not be handled: %s" % (cmd, e))
+            future = self.__pending.pop(cmd, None)
+            if future is not None and not future.done():
+                future.set_exception(e)
+        await self.disconnect()
+
+    def __on_disconnected(self):
+        if self.__conn_state != ConnectionState.DISCONNECTED:
+            _log.info("RTDE disconnected")
+        self.__conn_state = ConnectionState.DISCONNECTED
+        for future in self.__pending.values():
+            if not future.done():
+                future.set_result(None)
+        self.__pending.clear()
+        # wake up a consumer waiting in receive()
+        if self.__states is not None and self.__states.empty():
+            self.__states.put_nowait(None)
+
+    def __on_packet(self, cmd, payload):
+        if cmd == Command.RTDE_DATA_PACKAGE:
+            if self.__output_config is None:
+                _log.error("RTDE_DATA_PACKAGE: Missing output configuration")
+                return
+            if self.__states.full():
+                self.__states.get_nowait()
+                self.__skipped_package_count += 1
+            self.__states.put_nowait(self.__output_config.unpack(payload))
+            return
+        if cmd == Command.RTDE_TEXT_MESSAGE:
+            self.__on_text_message(payload)
+            return
+
+        if cmd == Command.RTDE_REQUEST_PROTOCOL_VERSION:
+            result = serialize.ReturnValue.unpack(payload).success
+        elif cmd == Command.RTDE_GET_URCONTROL_VERSION:
+            result = serialize.ControlVersion.unpack(payload)
+        elif cmd == Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS:
+            result = serialize.DataConfig.unpack_recipe(payload)
+        elif cmd == Command.RTDE_CONTROL_PACKAGE_SETUP_INPUTS:
+            result = serialize.DataConfig.unpack_recipe(payload)
+        elif cmd == Command.RTDE_CONTROL_PACKAGE_START:
+            result = serialize.ReturnValue.unpack(payload).success
+        elif cmd == Command.RTDE_CONTROL_PACKAGE_PAUSE:
+            result = serialize.ReturnValue.unpack(payload).success
+        else:
+            _log.error("Unknown package command: " + str(cmd))
+            return
+
+        future = self.__pending.pop(cmd, None)
+        if future is None or future.done():
+            _log.debug("skipping package(2)")
+            return
+        future.set_result(result)
+
+    def __on_text_message(self, payload):
+        if len(payload) < 1:
+            _log.error("RTDE_TEXT_MESSAGE: No payload")
+            return
+        if self.__protocolVersion == RTDE_PROTOCOL_VERSION_1:
+            msg = serialize.MessageV1.unpack(payload)
+        else:
+            msg = serialize.Message.unpack(payload)
+
+        if (
+            msg.level == serialize.Message.EXCEPTION_MESSAGE
+            or msg.level == serialize.Message.ERROR_MESSAGE
+        ):
+            _log.error(msg.source + ": " + msg.message)
+        elif msg.level == serialize.Message.WARNING_MESSAGE:
+            _log.warning(msg.source + ": " + msg.message)
+        elif msg.level == serialize.Message.INFO_MESSAGE:
+            _log.info(msg.source + ": " + msg.message)
+
+    @property
+    def skipped_package_count(self):
+        """Packages dropped because the consumer fell behind, resets on connect"""
+        return self.__skipped_package_count
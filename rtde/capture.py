@@ -0,0 +1,118 @@
+# Copyright (c) 2020-2022, Universal Robots A/S,
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the Universal Robots A/S nor the names of its
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL UNIVERSAL ROBOTS A/S BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import struct
+import time
+
+MAGIC = b"RTDECAP1"
+_chunk = struct.Struct(">dI")  # receive time (s since the epoch), length
+
+
+class CaptureWriter(object):
+    """Writes the chunks of a received RTDE byte stream with their receive
+    time. The file starts with MAGIC, followed by one record per chunk: a
+    big endian double timestamp, a uint32 length and the bytes.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.__file = open(filename, "wb")
+        self.__file.write(MAGIC)
+
+    def write(self, timestamp, data):
+        self.__file.write(_chunk.pack(timestamp, len(data)))
+        self.__file.write(data)
+
+    def close(self):
+        self.__file.close()
+
+
+class CaptureReader(object):
+    """Iterates over the (timestamp, bytes) chunks of a capture file"""
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def __iter__(self):
+        with open(self.filename, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("Not an RTDE capture file: " + self.filename)
+            while True:
+                header = f.read(_chunk.size)
+                if len(header) < _chunk.size:
+                    return
+                timestamp, size = _chunk.unpack(header)
+                data = f.read(size)
+                if len(data) < size:
+                    return
+                yield timestamp, data
+
+
+class ReplaySource(object):
+    """Socket replacement serving the byte stream of a capture file.
+
+    Every recv_into() call returns at most one recorded chunk, so the
+    framing sees the recorded read boundaries. With realtime set the
+    chunks are delivered at their recorded pace. Sent data is discarded.
+    """
+
+    def __init__(self, filename, realtime=False):
+        self.filename = filename
+        self.realtime = realtime
+        self.__chunks = iter(CaptureReader(filename))
+        self.__data = memoryview(b"")
+        self.__timestamp = None
+        self.__offset = None  # replay start minus capture start
+
+    def last_timestamp(self):
+        """Recorded receive time of the chunk returned last"""
+        return self.__timestamp
+
+    def recv_into(self, view):
+        if not len(self.__data):
+            chunk = next(self.__chunks, None)
+            if chunk is None:
+                return 0
+            self.__timestamp, data = chunk
+            self.__data = memoryview(data)
+            if self.realtime:
+                self.__wait(self.__timestamp)
+        size = min(len(view), len(self.__data))
+        view[:size] = self.__data[:size]
+        self.__data = self.__data[size:]
+        return size
+
+    def send(self, data):
+        return len(data)
+
+    def close(self):
+        self.__chunks = iter(())
+
+    def __wait(self, timestamp):
+        now = time.monotonic()
+        if self.__offset is None:
+            self.__offset = now - timestamp
+        delay = timestamp + self.__offset - now
+        if delay > 0:
+            time.sleep(delay)
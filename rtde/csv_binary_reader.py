@@ -0,0 +1,199 @@
+# Copyright (c) 2020-2022, Universal Robots A/S,
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the Universal Robots A/S nor the names of its
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL UNIVERSAL ROBOTS A/S BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import bisect
+import logging
+import mmap
+import struct
+
+import numpy as np
+
+from . import serialize
+from .csv_binary_writer import HEADER, INDEX_ENTRY, INDEX_MAGIC, MAGIC, TRAILER
+from .csv_reader import runtime_state
+from .rtde import LOGNAME
+
+_log = logging.getLogger(LOGNAME)
+
+runtime_state_running = 2
+
+
+def record_dtype(names, types):
+    """The numpy structured dtype of a record, vector fields as subarrays"""
+    config = serialize.DataConfig.unpack_recipe(
+        b"\x00" + ",".join(types).encode("utf-8")
+    )
+    config.names = names
+    packed = config.dtype()
+    # the records are stored without the recipe id
+    return np.dtype(
+        {
+            "names": list(names),
+            "formats": [packed.fields[name][0] for name in names],
+            "offsets": [packed.fields[name][1] - 1 for name in names],
+            "itemsize": packed.itemsize - 1,
+        }
+    )
+
+
+class CSVBinaryReader(object):
+    """Reads a recording written by csv_binary_writer.CSVBinaryWriter.
+
+    The file is memory mapped and not read: like CSVReader every column is
+    an attribute holding a numpy array, vector fields are split into
+    name_0, name_1, ... columns, but the arrays are read-only views of the
+    mapped records. Only the pages of the columns that are used are read
+    from disk. With filter_running_program a column is copied on first
+    access, keeping the rows of a running program.
+    """
+
+    __columns = {}  # column name -> (field, vector element or None)
+
+    def __init__(self, binfile, filter_running_program=False):
+        self.__filename = binfile.name
+        magic, length = HEADER.unpack(binfile.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("Not an RTDE binary recording: " + self.__filename)
+        names, types, self.fmt = binfile.read(length).decode("utf-8").split("\n")
+        self.names = names.split()
+        self.types = types.split()
+        self.__struct = struct.Struct(self.fmt)
+        self.record_size = self.__struct.size
+        self.__data_offset = HEADER.size + length
+        self.index = []
+        self.__count = self.__read_trailer(binfile)
+        # the mapping stays valid after binfile is closed
+        self.__mmap = mmap.mmap(binfile.fileno(), 0, access=mmap.ACCESS_READ)
+        self.records_view = np.ndarray(
+            (self.__count,),
+            record_dtype(self.names, self.types),
+            self.__mmap,
+            self.__data_offset,
+        )
+
+        self.__columns = {}
+        for name, data_type in zip(self.names, self.types):
+            size = serialize.get_item_size(data_type)
+            if size > 1:
+                for j in range(size):
+                    self.__columns[name + "_" + str(j)] = (name, j)
+            else:
+                self.__columns[name] = (name, None)
+
+        self.__rows = None  # all rows
+        if filter_running_program:
+            if runtime_state not in self.names:
+                _log.warning(
+                    "Unable to filter data since runtime_state field is missing in data set"
+                )
+            else:
+                self.__rows = np.flatnonzero(
+                    self.records_view[runtime_state] == runtime_state_running
+                )
+
+        self.__samples = self.__count if self.__rows is None else len(self.__rows)
+        if self.__samples == 0:
+            _log.warning("No data left from file: " + self.__filename + " after filtering")
+
+    def __getattr__(self, name):
+        # called for the columns not accessed before
+        try:
+            field, j = self.__columns[name]
+        except KeyError:
+            raise AttributeError(name)
+        column = self.records_view[field]
+        if j is not None:
+            column = column[:, j]
+        if self.__rows is not None:
+            column = column[self.__rows]
+        self.__dict__[name] = column
+        return column
+
+    def get_samples(self):
+        return self.__samples
+
+    def get_name(self):
+        return self.__filename
+
+    def get_record_count(self):
+        """Records in the file, before filtering"""
+        return self.__count
+
+    def column_names(self):
+        return list(self.__columns)
+
+    def records(self, start=0, stop=None):
+        """Yields the flat value tuples of the records start to stop"""
+        stop = self.__count if stop is None else min(stop, self.__count)
+        if start >= stop:
+            return
+        begin = self.__data_offset + start * self.record_size
+        data = memoryview(self.__mmap)[begin : begin + (stop - start) * self.record_size]
+        try:
+            for values in self.__struct.iter_unpack(data):
+                yield values
+        finally:
+            data.release()
+
+    def find_timestamp(self, timestamp):
+        """The number of the first record at or after timestamp, the index
+        narrows the search to INDEX_INTERVAL records"""
+        if "timestamp" not in self.names or not self.index:
+            raise ValueError("The recording has no timestamp index")
+        block = bisect.bisect_right([t for _, t in self.index], timestamp) - 1
+        if block < 0:
+            return 0
+        start = self.index[block][0]
+        stop = (
+            self.index[block + 1][0] if block + 1 < len(self.index) else self.__count
+        )
+        timestamps = self.records_view["timestamp"][start:stop]
+        return start + int(np.searchsorted(timestamps, timestamp))
+
+    def close(self):
+        """Unmaps the file. Raises BufferError while views of the columns
+        are still referenced."""
+        for name in self.__columns:
+            self.__dict__.pop(name, None)
+        self.records_view = None
+        self.__mmap.close()
+
+    def __read_trailer(self, binfile):
+        """Reads the index, returns the number of records"""
+        size = binfile.seek(0, 2)
+        count = (size - self.__data_offset) // self.record_size
+        if size - TRAILER.size >= self.__data_offset:
+            binfile.seek(size - TRAILER.size)
+            records, index_offset, entries, magic = TRAILER.unpack(
+                binfile.read(TRAILER.size)
+            )
+            if magic == INDEX_MAGIC:
+                binfile.seek(index_offset)
+                data = binfile.read(entries * INDEX_ENTRY.size)
+                self.index = list(INDEX_ENTRY.iter_unpack(data))
+                return records
+        _log.warning(
+            "No index in " + self.__filename + ", the recording was not closed"
+        )
+        return count
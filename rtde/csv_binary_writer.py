@@ -21,173 +21,87 @@
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-import sys
+"""Binary recordings.
 
-sys.path.append("..")
+A recording is made of
+  - a header: MAGIC, the length of the header text and the header text,
+    the space separated recipe names, types and the struct format of a
+    record on three lines
+  - fixed-size records, the data package payloads without the recipe id
+    as returned by RTDE.receive(binary=True)
+  - a trailing index: (record number, timestamp) of every INDEX_INTERVAL-th
+    record followed by the trailer, which holds the record count, the
+    offset and length of the index and INDEX_MAGIC
+
+A recording that was not closed has no trailer, its complete records can
+still be read. See csv_binary_reader.CSVBinaryReader.
+"""
 
 import struct
+
 from rtde import serialize
 
+MAGIC = b"RTDEREC1"
+INDEX_MAGIC = b"RTDEIDX1"
+HEADER = struct.Struct(">8sI")  # MAGIC, length of the header text
+INDEX_ENTRY = struct.Struct(">Qd")  # record number, timestamp
+TRAILER = struct.Struct(">QQQ8s")  # records, index offset, entries, INDEX_MAGIC
+INDEX_INTERVAL = 1024  # records
+
+
+def record_format(types):
+    """The struct format of a record of the given field types"""
+    if not types:
+        return ">"
+    payload = ",".join(types).encode("utf-8")
+    return ">" + serialize.DataConfig.unpack_recipe(b"\x00" + payload).fmt[2:]
+
 
 class CSVBinaryWriter(object):
-    def __init__(self, file, names, types, delimiter=" "):
+    def __init__(self, file, names, types):
         if len(names) != len(types):
             raise ValueError("List sizes are not identical.")
         self.__file = file
         self.__names = names
         self.__types = types
-        self.__delimiter = delimiter
-        self.__header_names = []
-        self.__columns = 0
-        for i in range(len(self.__names)):
-            size = serialize.get_item_size(self.__types[i])
-            self.__columns += size
-            if size > 1:
-                for j in range(size):
-                    name = self.__names[i] + "_" + str(j)
-                    self.__header_names.append(name)
-            else:
-                name = self.__names[i]
-                self.__header_names.append(name)
-
-    def getType(self, vtype):
-        if vtype == "VECTOR3D":
-            return "DOUBLE" + self.__delimiter + "DOUBLE" + self.__delimiter + "DOUBLE"
-        elif vtype == "VECTOR6D":
-            return (
-                "DOUBLE"
-                + self.__delimiter
-                + "DOUBLE"
-                + self.__delimiter
-                + "DOUBLE"
-                + self.__delimiter
-                + "DOUBLE"
-                + self.__delimiter
-                + "DOUBLE"
-                + self.__delimiter
-                + "DOUBLE"
-            )
-        elif vtype == "VECTOR6INT32":
-            return (
-                "INT32"
-                + self.__delimiter
-                + "INT32"
-                + self.__delimiter
-                + "INT32"
-                + self.__delimiter
-                + "INT32"
-                + self.__delimiter
-                + "INT32"
-                + self.__delimiter
-                + "INT32"
-            )
-        elif vtype == "VECTOR6UINT32":
-            return (
-                "UINT32"
-                + self.__delimiter
-                + "UINT32"
-                + self.__delimiter
-                + "UINT32"
-                + self.__delimiter
-                + "UINT32"
-                + self.__delimiter
-                + "UINT32"
-                + self.__delimiter
-                + "UINT32"
-            )
-        else:
-            return str(vtype)
+        self.__fmt = record_format(types)
+        self.__record_size = struct.calcsize(self.__fmt)
+        self.__records = 0
+        self.__index = []
+        # the timestamp of the indexed records, if the recipe has one
+        self.__timestamp_offset = None
+        if "timestamp" in names and types[names.index("timestamp")] == "DOUBLE":
+            i = names.index("timestamp")
+            self.__timestamp_offset = struct.calcsize(record_format(types[:i]))
 
     def writeheader(self):
-        # Header names
-        headerStr = str("")
-        for i in range(len(self.__header_names)):
-            if i != 0:
-                headerStr += self.__delimiter
-
-            headerStr += self.__header_names[i]
+        text = "\n".join(
+            [" ".join(self.__names), " ".join(self.__types), self.__fmt]
+        ).encode("utf-8")
+        self.__file.write(HEADER.pack(MAGIC, len(text)) + text)
 
-        headerStr += "\n"
-        self.__file.write(struct.pack(str(len(headerStr)) + "s", headerStr if sys.version_info[0] < 3 else headerStr.encode("utf-8")))
-
-        # Header types
-        typeStr = str("")
-        for i in range(len(self.__names)):
-            if i != 0:
-                typeStr += self.__delimiter
-
-            typeStr += self.getType(self.__types[i])
-
-        typeStr += "\n"
-        self.__file.write(struct.pack(str(len(typeStr)) + "s", typeStr if sys.version_info[0] < 3 else typeStr.encode("utf-8")))
-
-    def packToBinary(self, vtype, value):
-        print(vtype)
-        if vtype == "BOOL":
-            print("isBOOL" + str(value))
-        if vtype == "UINT8":
-            print("isUINT8" + str(value))
-        elif vtype == "INT32":
-            print("isINT32" + str(value))
-        elif vtype == "INT64":
-            print("isINT64" + str(value))
-        elif vtype == "UINT32":
-            print("isUINT32" + str(value))
-        elif vtype == "UINT64":
-            print("isUINT64" + str(value))
-        elif vtype == "DOUBLE":
-            print(
-                "isDOUBLE" + str(value) + str(type(value)) + str(sys.getsizeof(value))
-            )
-        elif vtype == "VECTOR3D":
-            print(
-                "isVECTOR3D" + str(value[0]) + "," + str(value[1]) + "," + str(value[2])
-            )
-        elif vtype == "VECTOR6D":
-            print(
-                "isVECTOR6D"
-                + str(value[0])
-                + ","
-                + str(value[1])
-                + ","
-                + str(value[2])
-                + ","
-                + str(value[3])
-                + ","
-                + str(value[4])
-                + ","
-                + str(value[5])
-            )
-        elif vtype == "VECTOR6INT32":
-            print(
-                "isVECTOR6INT32"
-                + str(value[0])
-                + ","
-                + str(value[1])
-                + ","
-                + str(value[2])
-                + ","
-                + str(value[3])
-                + ","
-                + str(value[4])
-                + ","
-                + str(value[5])
-            )
-        elif vtype == "VECTOR6UINT32":
-            print(
-                "isVECTOR6UINT32"
-                + str(value[0])
-                + ","
-                + str(value[1])
-                + ","
-                + str(value[2])
-                + ","
-                + str(value[3])
-                + ","
-                + str(value[4])
-                + ","
-                + str(value[5])
+    def writerow(self, data):
+        """Appends the bytes of a record, as returned by RTDE.receive(binary=True)"""
+        if len(data) != self.__record_size:
+            raise ValueError(
+                "Record of %d bytes, expected %d" % (len(data), self.__record_size)
             )
+        if self.__records % INDEX_INTERVAL == 0:
+            self.__index_record(data)
+        self.__file.write(data)
+        self.__records += 1
 
-    def writerow(self, data_object):
-        self.__file.write(data_object)
+    def writefooter(self):
+        """Writes the index and the trailer, the recording is complete"""
+        index_offset = self.__file.tell()
+        self.__file.write(b"".join(INDEX_ENTRY.pack(*e) for e in self.__index))
+        self.__file.write(
+            TRAILER.pack(self.__records, index_offset, len(self.__index), INDEX_MAGIC)
+        )
+
+    def __index_record(self, data):
+        if self.__timestamp_offset is None:
+            timestamp = float("nan")
+        else:
+            timestamp = struct.unpack_from(">d", data, self.__timestamp_offset)[0]
+        self.__index.append((self.__records, timestamp))
@@ -22,9 +22,11 @@
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import csv
+import itertools
 import numpy as np
 import logging
 
+from . import field_catalog
 from .rtde import LOGNAME
 
 _log = logging.getLogger(LOGNAME)
@@ -33,8 +35,114 @@ _log = logging.getLogger(LOGNAME)
 runtime_state = "runtime_state"
 runtime_state_running = "2"
 
+DEFAULT_CHUNK_SIZE = 10000  # rows
+
+# numpy types of the RTDE types, vectors per element
+_DTYPES = {
+    "DOUBLE": "f8",
+    "VECTOR3D": "f8",
+    "VECTOR6D": "f8",
+    "INT32": "i4",
+    "VECTOR6INT32": "i4",
+    "UINT32": "u4",
+    "VECTOR6UINT32": "u4",
+    "UINT64": "u8",
+    "UINT8": "u1",
+    "BOOL": "?",
+}
+
+
+def column_dtype(column):
+    """The numpy type of a column, from the type of its field in
+    rtde.field_catalog. Unknown columns are read as float64."""
+    data_type = field_catalog.field_type(column)
+    if data_type is None:
+        # an element of a vector field, name_0, name_1, ...
+        field, _, element = column.rpartition("_")
+        if element.isdigit():
+            data_type = field_catalog.field_type(field)
+    return np.dtype(_DTYPES.get(data_type, "f8"))
+
+
+def _parse_bool(text):
+    return text == "True"
+
+
+class _ChunkParser(object):
+    """Parses the rows of a CSV recording chunk_size rows at a time into
+    structured arrays of the wanted columns"""
+
+    def __init__(self, csvfile, delimiter, columns, filter_running_program):
+        self.lines = (line for line in csvfile if line.strip())
+        self.delimiter = delimiter
+        self.header = next(csv.reader(self.lines, delimiter=delimiter))
+        if columns is None:
+            columns = self.header
+        else:
+            missing = [c for c in columns if c not in self.header]
+            if missing:
+                _log.warning("Columns not in file: " + ", ".join(missing))
+        self.columns = [c for c in self.header if c in set(columns)]
+
+        self.filter = False
+        if filter_running_program:
+            if runtime_state not in self.header:
+                _log.warning(
+                    "Unable to filter data since runtime_state field is missing in data set"
+                )
+            else:
+                self.filter = True
+        parsed = list(self.columns)
+        if self.filter and runtime_state not in parsed:
+            parsed.append(runtime_state)
+        self.usecols = [self.header.index(c) for c in parsed]
+        self.dtype = np.dtype([(c, column_dtype(c)) for c in parsed])
+        self.converters = {
+            i: _parse_bool for i, c in zip(self.usecols, parsed) if self.dtype[c] == np.bool_
+        }
+
+    def blocks(self, chunk_size):
+        """Yields (rows read, structured array of the kept rows) per chunk"""
+        while True:
+            rows = list(itertools.islice(self.lines, chunk_size))
+            if not rows:
+                return
+            block = np.loadtxt(
+                rows,
+                dtype=self.dtype,
+                delimiter=self.delimiter,
+                usecols=self.usecols,
+                converters=self.converters or None,
+                ndmin=1,
+            )
+            if self.filter:
+                block = block[block[runtime_state] == int(runtime_state_running)]
+            yield len(rows), block
+
+
+def read_chunks(
+    csvfile,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    delimiter=" ",
+    filter_running_program=False,
+    columns=None,
+):
+    """Reads a CSV recording chunk_size rows at a time. Yields a dictionary
+    from the header elements, or only the given columns, to numpy arrays
+    per chunk, with filtering the rows of a running program only. At most
+    one chunk is held in memory."""
+    parser = _ChunkParser(csvfile, delimiter, columns, filter_running_program)
+    for _, block in parser.blocks(chunk_size):
+        if len(block):
+            yield {c: block[c] for c in parser.columns}
+
 
 class CSVReader(object):
+    """Reads a CSV recording into one numpy array per column, held in
+    attributes named like the header elements. With columns only these
+    columns are parsed. The array types follow the field types, see
+    column_dtype()."""
+
     __samples = None
     __filename = None
 
@@ -42,45 +150,40 @@ class CSVReader(object):
         header = next(__reader)
         return header
 
-    def __init__(self, csvfile, delimiter=" ", filter_running_program=False):
+    def __init__(
+        self,
+        csvfile,
+        delimiter=" ",
+        filter_running_program=False,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        columns=None,
+    ):
         self.__filename = csvfile.name
 
-        csvfile = [
-            csvfile for csvfile in csvfile.readlines() if csvfile.strip()
-        ]  # remove any empty lines
+        # the file is parsed chunk_size rows at a time, straight into typed arrays
+        parser = _ChunkParser(csvfile, delimiter, columns, filter_running_program)
+        blocks = []
+        read = 0
+        for rows, block in parser.blocks(chunk_size):
+            read += rows
+            blocks.append(block)
 
-        reader = csv.reader(csvfile, delimiter=delimiter)
-        header = self.get_header_data(reader)
+        if read == 0:
+            _log.warning("No data read from file: " + self.__filename)
 
-        # read csv file
-        data = [row for row in reader]
-
-        if len(data) == 0:
-            _log.warn("No data read from file: " + self.__filename)
-
-        # filter data
-        if filter_running_program:
-            if runtime_state not in header:
-                _log.warn(
-                    "Unable to filter data since runtime_state field is missing in data set"
-                )
-            else:
-                idx = header.index(runtime_state)
-                data = [row for row in data if row[idx] == runtime_state_running]
-
-        self.__samples = len(data)
+        self.__samples = sum(len(block) for block in blocks)
 
         if self.__samples == 0:
-            _log.warn("No data left from file: " + self.__filename + " after filtering")
-
-        # transpose data
-        data = list(zip(*data))
+            _log.warning("No data left from file: " + self.__filename + " after filtering")
 
-        # create dictionary from  header elements (keys) to float arrays
+        # create dictionary from  header elements (keys) to typed arrays
         self.__dict__.update(
             {
-                header[i]: np.array(list(map(float, data[:][i])))
-                for i in range(len(header))
+                c: np.concatenate(
+                    [block[c] for block in blocks]
+                    or [np.empty(0, parser.dtype[c])]
+                )
+                for c in parser.columns
             }
         )
 
@@ -57,9 +57,21 @@ class CSVWriter(object):
         data = []
         for i in range(len(self.__names)):
             size = serialize.get_item_size(self.__types[i])
-            value = data_object.__dict__[self.__names[i]]
+            value = getattr(data_object, self.__names[i])
             if size > 1:
                 data.extend(value)
             else:
                 data.append(value)
         self.__writer.writerow(data)
+
+    def writebatch(self, batch):
+        """Writes a numpy structured array as returned by RTDE.receive_batch(),
+        one row per package"""
+        columns = []
+        for name in self.__names:
+            column = batch[name]
+            if column.ndim > 1:
+                columns.extend(column.T.tolist())
+            else:
+                columns.append(column.tolist())
+        self.__writer.writerows(zip(*columns))
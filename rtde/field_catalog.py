@@ -0,0 +1,166 @@
+# Copyright (c) 2020-2022, Universal Robots A/S,
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the Universal Robots A/S nor the names of its
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL UNIVERSAL ROBOTS A/S BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Names and types of the RTDE fields known to the controller.
+
+A recipe is checked against these tables when it is loaded, so a misspelt
+name or a wrong type is reported before anything is sent to a robot.
+"""
+
+OUTPUT_FIELDS = {
+    "timestamp": "DOUBLE",
+    "target_q": "VECTOR6D",
+    "target_qd": "VECTOR6D",
+    "target_qdd": "VECTOR6D",
+    "target_current": "VECTOR6D",
+    "target_moment": "VECTOR6D",
+    "actual_q": "VECTOR6D",
+    "actual_qd": "VECTOR6D",
+    "actual_current": "VECTOR6D",
+    "actual_current_window": "VECTOR6D",
+    "joint_control_output": "VECTOR6D",
+    "actual_TCP_pose": "VECTOR6D",
+    "actual_TCP_speed": "VECTOR6D",
+    "actual_TCP_force": "VECTOR6D",
+    "target_TCP_pose": "VECTOR6D",
+    "target_TCP_speed": "VECTOR6D",
+    "actual_digital_input_bits": "UINT64",
+    "joint_temperatures": "VECTOR6D",
+    "actual_execution_time": "DOUBLE",
+    "robot_mode": "INT32",
+    "joint_mode": "VECTOR6INT32",
+    "safety_mode": "INT32",
+    "safety_status": "INT32",
+    "actual_tool_accelerometer": "VECTOR3D",
+    "speed_scaling": "DOUBLE",
+    "target_speed_fraction": "DOUBLE",
+    "actual_momentum": "DOUBLE",
+    "actual_main_voltage": "DOUBLE",
+    "actual_robot_voltage": "DOUBLE",
+    "actual_robot_current": "DOUBLE",
+    "actual_joint_voltage": "VECTOR6D",
+    "actual_digital_output_bits": "UINT64",
+    "runtime_state": "UINT32",
+    "elbow_position": "VECTOR3D",
+    "elbow_velocity": "VECTOR3D",
+    "robot_status_bits": "UINT32",
+    "safety_status_bits": "UINT32",
+    "analog_io_types": "UINT32",
+    "standard_analog_input0": "DOUBLE",
+    "standard_analog_input1": "DOUBLE",
+    "standard_analog_output0": "DOUBLE",
+    "standard_analog_output1": "DOUBLE",
+    "io_current": "DOUBLE",
+    "euromap67_input_bits": "UINT32",
+    "euromap67_output_bits": "UINT32",
+    "euromap67_24V_voltage": "DOUBLE",
+    "euromap67_24V_current": "DOUBLE",
+    "tool_mode": "UINT32",
+    "tool_analog_input_types": "UINT32",
+    "tool_analog_input0": "DOUBLE",
+    "tool_analog_input1": "DOUBLE",
+    "tool_output_voltage": "INT32",
+    "tool_output_current": "DOUBLE",
+    "tool_temperature": "DOUBLE",
+    "tcp_force_scalar": "DOUBLE",
+    "output_bit_registers0_to_31": "UINT32",
+    "output_bit_registers32_to_63": "UINT32",
+    "input_bit_registers0_to_31": "UINT32",
+    "input_bit_registers32_to_63": "UINT32",
+    "tool_output_mode": "UINT8",
+    "tool_digital_output0_mode": "UINT8",
+    "tool_digital_output1_mode": "UINT8",
+    "payload": "DOUBLE",
+    "payload_cog": "VECTOR3D",
+    "payload_inertia": "VECTOR6D",
+    "script_control_line": "UINT32",
+    "ft_raw_wrench": "VECTOR6D",
+    "joint_position_deviation_ratio": "DOUBLE",
+    "actual_configurable_digital_input_bits": "UINT64",
+    "actual_configurable_digital_output_bits": "UINT64",
+    "encoder0_raw": "INT32",
+    "encoder1_raw": "INT32",
+    "tcp_offset": "VECTOR6D",
+}
+
+INPUT_FIELDS = {
+    "speed_slider_mask": "UINT32",
+    "speed_slider_fraction": "DOUBLE",
+    "standard_digital_output_mask": "UINT8",
+    "standard_digital_output": "UINT8",
+    "configurable_digital_output_mask": "UINT8",
+    "configurable_digital_output": "UINT8",
+    "tool_digital_output_mask": "UINT8",
+    "tool_digital_output": "UINT8",
+    "standard_analog_output_mask": "UINT8",
+    "standard_analog_output_type": "UINT8",
+    "standard_analog_output_0": "DOUBLE",
+    "standard_analog_output_1": "DOUBLE",
+    "input_bit_registers0_to_31": "UINT32",
+    "input_bit_registers32_to_63": "UINT32",
+    "external_force_torque": "VECTOR6D",
+}
+
+# the general purpose registers, outputs can also read the input registers
+REGISTER_COUNT = 48
+for _i in range(REGISTER_COUNT):
+    for _prefix in ("input", "output"):
+        OUTPUT_FIELDS["%s_int_register_%d" % (_prefix, _i)] = "INT32"
+        OUTPUT_FIELDS["%s_double_register_%d" % (_prefix, _i)] = "DOUBLE"
+    INPUT_FIELDS["input_int_register_%d" % _i] = "INT32"
+    INPUT_FIELDS["input_double_register_%d" % _i] = "DOUBLE"
+for _i in range(64, 128):
+    for _prefix in ("input", "output"):
+        OUTPUT_FIELDS["%s_bit_register_%d" % (_prefix, _i)] = "BOOL"
+    INPUT_FIELDS["input_bit_register_%d" % _i] = "BOOL"
+del _i, _prefix
+
+
+def field_type(name, fields=None):
+    """The type of a known field, None if unknown. fields is one of the
+    tables, by default a name may be an output or an input field."""
+    if fields is not None:
+        return fields.get(name)
+    return OUTPUT_FIELDS.get(name, INPUT_FIELDS.get(name))
+
+
+def check_recipe(names, types, fields=None):
+    """Raises ValueError listing every unknown, duplicate or mistyped field
+    of a recipe"""
+    errors = []
+    seen = set()
+    for name, data_type in zip(names, types):
+        known = field_type(name, fields)
+        if known is None:
+            errors.append("unknown field " + str(name))
+        elif data_type != known:
+            errors.append(
+                "field %s has type %s, expected %s" % (name, data_type, known)
+            )
+        if name in seen:
+            errors.append("duplicate field " + str(name))
+        seen.add(name)
+    if len(names) != len(types):
+        errors.append("%d names but %d types" % (len(names), len(types)))
+    if errors:
+        raise ValueError(", ".join(errors))
@@ -0,0 +1,133 @@
+# Copyright (c) 2020-2022, Universal Robots A/S,
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the Universal Robots A/S nor the names of its
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL UNIVERSAL ROBOTS A/S BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import array
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _copy(value):
+    # vectors are modified in place, copy them
+    if isinstance(value, (list, array.array)):
+        return value[:]
+    if numpy is not None and isinstance(value, numpy.ndarray):
+        return numpy.array(value, copy=True)
+    return value
+
+
+def _equal(a, b):
+    # == of numpy arrays is elementwise
+    if numpy is not None and (isinstance(a, numpy.ndarray) or isinstance(b, numpy.ndarray)):
+        return numpy.array_equal(a, b)
+    return a == b
+
+
+def _snapshot(input_data):
+    return dict((name, _copy(value)) for name, value in input_data.__dict__.items())
+
+
+def _changed(values, sent_values):
+    if sent_values is None or values.keys() != sent_values.keys():
+        return True
+    return not all(_equal(value, sent_values[name]) for name, value in values.items())
+
+
+class _ScheduledInput(object):
+    __slots__ = ["input_data", "period", "on_change", "next_due", "sent_values"]
+
+    def __init__(self, input_data, period, on_change):
+        self.input_data = input_data
+        self.period = period
+        self.on_change = on_change
+        self.next_due = 0.0
+        self.sent_values = None
+
+
+class InputScheduler(object):
+    """Sends the input recipes of an RTDE connection at their own rates.
+
+    Every input object returned by send_input_setup is added with a rate
+    in Hz, with on_change=True to be sent whenever one of its values
+    changed, or both. run_once() is called once per control cycle and
+    sends all packages that are due in a single write, nothing is sent
+    when no package is due.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.write_count = 0
+        self.package_count = 0
+        self.__inputs = []
+
+    def add(self, input_data, rate=None, on_change=False):
+        """Schedules input_data every 1/rate seconds and/or on change,
+        without a rate it is only sent on change."""
+        if rate is None:
+            on_change = True
+        period = 1.0 / rate if rate else None
+        for entry in self.__inputs:
+            if entry.input_data.recipe_id == input_data.recipe_id:
+                raise ValueError(
+                    "Input recipe already scheduled: " + str(input_data.recipe_id)
+                )
+        self.__inputs.append(_ScheduledInput(input_data, period, on_change))
+
+    def remove(self, input_data):
+        self.__inputs = [e for e in self.__inputs if e.input_data is not input_data]
+
+    def reset(self):
+        """Makes every input due on the next cycle, e.g. after a reconnect"""
+        for entry in self.__inputs:
+            entry.next_due = 0.0
+            entry.sent_values = None
+
+    def run_once(self, now=None):
+        """Sends the due input packages, returns how many were sent"""
+        if now is None:
+            now = time.monotonic()
+        due = []
+        for entry in self.__inputs:
+            values = _snapshot(entry.input_data) if entry.on_change else None
+            periodic = entry.period is not None and now >= entry.next_due
+            if periodic or (entry.on_change and _changed(values, entry.sent_values)):
+                due.append((entry, values, periodic))
+        if len(due) == 0:
+            return 0
+
+        if not self.connection.send_many([entry.input_data for entry, _, _ in due]):
+            return 0
+        self.write_count += 1
+        self.package_count += len(due)
+        for entry, values, periodic in due:
+            entry.sent_values = values
+            # a send on change keeps the periodic deadline
+            if periodic:
+                entry.next_due += entry.period
+                if entry.next_due <= now:  # late, do not burst to catch up
+                    entry.next_due = now + entry.period
+        return len(due)
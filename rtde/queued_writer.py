@@ -0,0 +1,161 @@
+# Copyright (c) 2020-2022, Universal Robots A/S,
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the Universal Robots A/S nor the names of its
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL UNIVERSAL ROBOTS A/S BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import logging
+import queue
+import threading
+import time
+
+from rtde.rtde import LOGNAME
+
+_log = logging.getLogger(LOGNAME)
+
+DEFAULT_BATCH_SIZE = 64  # rows
+DEFAULT_MAX_BATCHES = 256  # queued batches
+DEFAULT_FLUSH_INTERVAL = 0.1  # s, a batch is queued at the latest after this
+
+
+class QueuedWriter(object):
+    """Runs a CSVWriter or CSVBinaryWriter on its own thread.
+
+    The receiving thread hands rows to write() and structured arrays from
+    RTDE.receive_batch() to write_batch(). Rows are collected into batches
+    of batch_size rows, a batch is queued once it is full or flush_interval
+    seconds old. The writer thread writes the queued batches, so a slow
+    disk or formatting spike does not delay the socket reads.
+
+    When max_batches batches are queued a new batch is dropped and its rows
+    counted in dropped_rows, unless block is set: then the receiving thread
+    waits for room, which is right when the packages wait in the receive
+    buffer meanwhile (RTDE.receive_buffered, receive_batch).
+    """
+
+    def __init__(
+        self,
+        writer,
+        batch_size=DEFAULT_BATCH_SIZE,
+        max_batches=DEFAULT_MAX_BATCHES,
+        flush_interval=DEFAULT_FLUSH_INTERVAL,
+        block=False,
+    ):
+        self.__writer = writer
+        self.__batch_size = batch_size
+        self.__flush_interval = flush_interval
+        self.__block = block
+        self.__queue = queue.Queue(max_batches)
+        self.__rows = []
+        self.__batch_start = 0.0
+        self.__error = None
+        self.queued_rows = 0
+        self.written_rows = 0
+        self.dropped_rows = 0
+        self.max_depth = 0  # queued batches
+        self.__depth_sum = 0
+        self.__depth_count = 0
+        self.__thread = threading.Thread(target=self.__run, name="rtde-writer")
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def write(self, row):
+        if not self.__rows:
+            self.__batch_start = time.monotonic()
+        self.__rows.append(row)
+        if (
+            len(self.__rows) >= self.__batch_size
+            or time.monotonic() - self.__batch_start >= self.__flush_interval
+        ):
+            self.flush()
+
+    def write_batch(self, batch):
+        """Queues a structured array for CSVWriter.writebatch()"""
+        self.flush()
+        self.__put(batch)
+
+    def flush(self):
+        """Queues the rows collected so far"""
+        if self.__rows:
+            rows, self.__rows = self.__rows, []
+            self.__put(rows)
+
+    def close(self):
+        """Writes all queued rows and stops the writer thread. Raises the
+        error the writer failed with, if any."""
+        self.flush()
+        self.__queue.put(None)  # waits for room, also when not blocking
+        self.__thread.join()
+        if self.__error is not None:
+            raise self.__error
+
+    @property
+    def mean_depth(self):
+        """Mean number of queued batches seen when queuing a batch"""
+        if self.__depth_count == 0:
+            return 0.0
+        return self.__depth_sum / float(self.__depth_count)
+
+    def stats(self):
+        return (
+            "%d rows written, %d dropped, queue depth mean %.1f max %d of %d batches"
+            % (
+                self.written_rows,
+                self.dropped_rows,
+                self.mean_depth,
+                self.max_depth,
+                self.__queue.maxsize,
+            )
+        )
+
+    def __put(self, item):
+        if self.__error is not None:
+            raise self.__error
+        depth = self.__queue.qsize()
+        self.__depth_sum += depth
+        self.__depth_count += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+        try:
+            self.__queue.put(item, self.__block)
+        except queue.Full:
+            self.dropped_rows += len(item)
+            return
+        self.queued_rows += len(item)
+
+    def __run(self):
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                return
+            if self.__error is not None:
+                continue  # drain the queue so that close() can not block
+            try:
+                if isinstance(item, list):
+                    for row in item:
+                        self.__writer.writerow(row)
+                else:
+                    self.__writer.writebatch(item)
+            except Exception as e:
+                _log.error("RTDE writer thread failed: " + str(e))
+                self.__error = e
+                continue
+            self.written_rows += len(item)
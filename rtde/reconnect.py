@@ -0,0 +1,167 @@
+# Copyright (c) 2020-2022, Universal Robots A/S,
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the Universal Robots A/S nor the names of its
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL UNIVERSAL ROBOTS A/S BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import logging
+import random
+import socket
+import time
+
+from rtde.rtde import RTDEException, LOGNAME
+
+_log = logging.getLogger(LOGNAME)
+
+DEFAULT_FIRST_DELAY = 0.05  # s, the first retry after a failure
+DEFAULT_INITIAL_DELAY = 0.5  # s, the second retry, doubled from there on
+DEFAULT_MAX_DELAY = 10.0  # s
+DEFAULT_JITTER = 0.5  # fraction of the delay that is randomized
+DEFAULT_RESET_AFTER = 5.0  # s a connection must be up to reset the backoff
+
+
+class Backoff(object):
+    """Bounded exponential backoff with jitter and a fast first retry.
+
+    next_delay() returns first_delay, then initial_delay doubled on every
+    call up to max_delay. Each delay except the first is shortened by a
+    random part of up to jitter times the delay, so that several clients
+    do not retry in lockstep.
+    """
+
+    def __init__(
+        self,
+        first_delay=DEFAULT_FIRST_DELAY,
+        initial_delay=DEFAULT_INITIAL_DELAY,
+        max_delay=DEFAULT_MAX_DELAY,
+        jitter=DEFAULT_JITTER,
+    ):
+        self.first_delay = first_delay
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.reset()
+
+    def reset(self):
+        self.attempt = 0
+
+    def next_delay(self):
+        self.attempt += 1
+        if self.attempt == 1:
+            return self.first_delay
+        delay = min(self.initial_delay * 2 ** (self.attempt - 2), self.max_delay)
+        return delay * (1 - self.jitter * random.random())
+
+
+class Reconnector(object):
+    """Keeps an RTDE session up across failures.
+
+    connect() calls factory() for a new connected RTDE instance and
+    setup(con) to set up its recipes and start it, and retries with the
+    backoff until both succeeded. setup returns a result that is handed
+    back with the connection, None or False count as a failure, as does
+    any exception raised by factory or setup. When the
+    session fails, failed() closes the connection; the backoff is reset
+    if the connection was up for at least reset_after seconds. All waits
+    are done on stop_event, so a stop interrupts them immediately.
+    The time from failed() to the next successful connect() is kept in
+    last_recovery_time.
+    """
+
+    def __init__(
+        self,
+        factory,
+        setup,
+        stop_event,
+        backoff=None,
+        reset_after=DEFAULT_RESET_AFTER,
+    ):
+        self.factory = factory
+        self.setup = setup
+        self.stop_event = stop_event
+        self.backoff = backoff or Backoff()
+        self.reset_after = reset_after
+        self.attempt_count = 0
+        self.recovery_count = 0
+        self.last_recovery_time = None
+        self.__failed_at = None
+        self.__connected_at = None
+
+    def connect(self):
+        """Returns (connection, setup result), or (None, None) once stopped"""
+        while not self.stop_event.is_set():
+            self.attempt_count += 1
+            con = None
+            try:
+                con = self.factory()
+                result = self.setup(con)
+                if result is None or result is False:
+                    raise RTDEException("setup failed")
+            except Exception as e:
+                # an unexpected error must not end the thread that reconnects,
+                # it is logged with its traceback and retried as well
+                self.__close(con)
+                delay = self.backoff.next_delay()
+                _log.warning(
+                    "RTDE connection attempt %d failed: %s, retrying in %.2f s"
+                    % (self.attempt_count, e, delay),
+                    exc_info=not isinstance(e, (RTDEException, socket.error, ValueError)),
+                )
+                self.stop_event.wait(delay)
+                continue
+            self.__connected_at = time.monotonic()
+            if self.__failed_at is not None:
+                self.last_recovery_time = self.__connected_at - self.__failed_at
+                self.recovery_count += 1
+                self.__failed_at = None
+                _log.info(
+                    "RTDE connection recovered in %.1f ms"
+                    % (self.last_recovery_time * 1000)
+                )
+            return con, result
+        return None, None
+
+    def failed(self, con, error=None):
+        """Closes a failed connection and waits for the next backoff delay"""
+        now = time.monotonic()
+        if self.__failed_at is None:
+            self.__failed_at = now
+        if self.__connected_at is not None and now - self.__connected_at >= self.reset_after:
+            self.backoff.reset()
+        self.__connected_at = None
+        _log.warning("RTDE connection failed: " + str(error))
+        self.__close(con)
+        self.stop_event.wait(self.backoff.next_delay())
+
+    def close(self, con):
+        """Pauses and closes a connection that did not fail"""
+        self.__connected_at = None
+        self.__close(con)
+
+    def __close(self, con):
+        if con is None:
+            return
+        if con.is_connected():
+            try:
+                con.send_pause()  # releases the inputs on the controller
+            except Exception as e:
+                _log.warning("RTDE pause before disconnecting failed: " + str(e))
+        con.disconnect()
@@ -21,18 +21,43 @@
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import collections
 import struct
 import socket
 import select
 import sys
 import logging
+import threading
+import time
 
 if sys.version_info[0] < 3:
     import serialize
+    import timing
+    import capture
+    import Queue as queue
 else:
     from rtde import serialize
+    from rtde import timing
+    from rtde import capture
+    import queue
 
 DEFAULT_TIMEOUT = 1.0
+# s, lower bound of the dead link time: a single retransmission takes at
+# least 200 ms (the Linux minimum RTO), so fewer cycles at a high frequency
+# would declare a link dead that only lost one segment
+MIN_DEAD_LINK_TIME = 0.25
+DEFAULT_BUFFER_SIZE = 1 << 20  # hard cap on buffered, not yet parsed bytes
+
+HEADER_SIZE = 3
+MAX_PACKAGE_SIZE = 0xFFFF
+RECV_CHUNK_SIZE = 4096
+DEFAULT_QUEUE_SIZE = 1000  # states buffered per reader thread subscriber
+
+# SO_TIMESTAMPNS, kernel receive times as struct timespec (Linux only)
+KERNEL_TIMESTAMP_OPTION = getattr(
+    socket, "SO_TIMESTAMPNS", 35 if sys.platform.startswith("linux") else None
+)
+KERNEL_TIMESTAMP = struct.Struct("@ll")
 
 LOGNAME = "rtde"
 _log = logging.getLogger(LOGNAME)
@@ -73,40 +98,469 @@ class RTDETimeoutException(RTDEException):
         super(RTDETimeoutException, self).__init__(msg)
 
 
+class RTDELinkLostException(RTDEException):
+    def __init__(self, msg):
+        super(RTDELinkLostException, self).__init__(msg)
+
+
+class PacketBuffer(object):
+    """Preallocated receive buffer for the RTDE byte stream.
+
+    Data is received straight into a fixed size bytearray and packages are
+    handed out as memoryview slices, so no bytes are copied while framing.
+    Unparsed bytes are only moved back to the front of the buffer when the
+    free tail space runs out. The capacity is a hard limit: when it is
+    reached the oldest complete packages are dropped and counted in
+    overflow_drop_count.
+
+    Payloads returned by pop() are only valid until the next call to
+    recv_into(), copy them if they must be kept.
+
+    With enable_timestamps() the time of every receive call is kept and
+    timestamp() returns the time the last popped package was complete.
+    """
+
+    __header = struct.Struct(">HB")
+
+    def __init__(self, capacity=DEFAULT_BUFFER_SIZE):
+        if capacity < MAX_PACKAGE_SIZE + RECV_CHUNK_SIZE:
+            raise ValueError(
+                "Buffer capacity must be at least "
+                + str(MAX_PACKAGE_SIZE + RECV_CHUNK_SIZE)
+                + " bytes"
+            )
+        self.__buf = bytearray(capacity)
+        self.__view = memoryview(self.__buf)
+        self.__start = 0
+        self.__end = 0
+        self.__overflow_drop_count = 0
+        self.__bytes_copied = 0
+        # stream positions, to match packages with the receive timestamps
+        self.__received = 0
+        self.__consumed = 0
+        self.__timestamps = None
+        self.__clock = None
+        self.__kernel_timestamps = False
+        self.__capture = None
+
+    def __len__(self):
+        return self.__end - self.__start
+
+    def clear(self):
+        self.__start = 0
+        self.__end = 0
+        self.__received = 0
+        self.__consumed = 0
+        if self.__timestamps is not None:
+            self.__timestamps.clear()
+
+    def enable_timestamps(self, clock=time.monotonic, kernel=False):
+        """Keep the receive time of the data, taken from clock or, with
+        kernel set, from the SO_TIMESTAMPNS time of the socket (Linux, the
+        option must be enabled on the socket).
+        """
+        self.__clock = clock
+        self.__kernel_timestamps = kernel
+        # bytes buffered before are taken as received now
+        self.__timestamps = collections.deque([(self.__received, clock())])
+
+    def recv_into(self, sock):
+        """Receive available data from sock into the free tail space.
+        Returns the number of bytes received, 0 when the peer closed the connection.
+        """
+        self.__reserve(RECV_CHUNK_SIZE)
+        end = min(self.__end + MAX_PACKAGE_SIZE, len(self.__buf))
+        if self.__kernel_timestamps:
+            return self.__recvmsg_into(sock, self.__view[self.__end : end])
+        received = sock.recv_into(self.__view[self.__end : end])
+        self.__end += received
+        self.__received += received
+        if self.__timestamps is not None and received:
+            self.__timestamps.append((self.__received, self.__clock()))
+        if self.__capture is not None and received:
+            self.__capture.write(time.time(), self.__view[self.__end - received : self.__end])
+        return received
+
+    def set_capture(self, writer):
+        """Write every received chunk to writer, a capture.CaptureWriter, or
+        stop with None. Returns the previous writer. Bytes already buffered
+        are written first, they start at a package boundary."""
+        previous = self.__capture
+        self.__capture = writer
+        if writer is not None and len(self):
+            writer.write(time.time(), self.__view[self.__start : self.__end])
+        return previous
+
+    def timestamp(self):
+        """Receive time of the last popped package"""
+        # the package was complete with the first receive call reaching its end
+        while self.__timestamps[0][0] < self.__consumed:
+            self.__timestamps.popleft()
+        return self.__timestamps[0][1]
+
+    def peek_header(self, offset=0):
+        """Returns (size, command) of the package starting offset bytes after
+        the next one or None if less than a header is buffered there."""
+        if self.__end - self.__start - offset < HEADER_SIZE:
+            return None
+        return self.__header.unpack_from(self.__buf, self.__start + offset)
+
+    def peek(self):
+        """The buffered bytes, valid until the next recv_into() or pop()"""
+        return self.__view[self.__start : self.__end]
+
+    def skip(self, nbytes):
+        """Consumes nbytes of complete packages without returning them"""
+        self.__start += nbytes
+        self.__consumed += nbytes
+        if self.__start == self.__end:
+            self.__start = self.__end = 0
+
+    def pop(self, size):
+        """Consumes a package of size bytes and returns its payload."""
+        payload = self.__view[self.__start + HEADER_SIZE : self.__start + size]
+        self.__start += size
+        self.__consumed += size
+        if self.__start == self.__end:
+            self.__start = self.__end = 0
+        return payload
+
+    def __reserve(self, nbytes):
+        if len(self.__buf) - self.__end >= nbytes:
+            return
+        self.__compact()
+        while len(self.__buf) - self.__end < nbytes:
+            header = self.peek_header()
+            if header is None or header[0] < HEADER_SIZE or header[0] > len(self):
+                # Only a partial package left, cannot happen with a valid stream
+                # since the capacity holds a maximum sized package plus a chunk
+                self.clear()
+                break
+            self.__start += header[0]
+            self.__consumed += header[0]
+            self.__overflow_drop_count += 1
+            self.__compact()
+
+    def __recvmsg_into(self, sock, view):
+        received, ancdata, _, _ = sock.recvmsg_into(
+            [view], socket.CMSG_SPACE(KERNEL_TIMESTAMP.size)
+        )
+        self.__end += received
+        if received:
+            timestamp = None
+            for level, kind, data in ancdata:
+                if level == socket.SOL_SOCKET and kind == KERNEL_TIMESTAMP_OPTION:
+                    seconds, nanoseconds = KERNEL_TIMESTAMP.unpack_from(data)
+                    timestamp = seconds + nanoseconds * 1e-9
+            self.__received += received
+            self.__timestamps.append((self.__received, timestamp or self.__clock()))
+            if self.__capture is not None:
+                self.__capture.write(
+                    timestamp or time.time(), self.__view[self.__end - received : self.__end]
+                )
+        return received
+
+    def __compact(self):
+        pending = self.__end - self.__start
+        if self.__start == 0:
+            return
+        if pending:
+            pending_bytes = self.__view[self.__start : self.__end]
+            if pending > self.__start:
+                # overlapping regions, go through a temporary copy
+                pending_bytes = pending_bytes.tobytes()
+            self.__buf[:pending] = pending_bytes
+            self.__bytes_copied += pending
+        self.__start = 0
+        self.__end = pending
+
+    @property
+    def capacity(self):
+        return len(self.__buf)
+
+    @property
+    def overflow_drop_count(self):
+        """Number of packages dropped because the buffer was full"""
+        return self.__overflow_drop_count
+
+    @property
+    def bytes_copied(self):
+        """Number of bytes moved while compacting the buffer"""
+        return self.__bytes_copied
+
+
+class StateQueue(object):
+    """Bounded queue of (sequence, state) tuples for one subscriber of the
+    reader thread. When the queue is full new states are dropped and counted
+    in dropped_count, the reader thread never waits for a subscriber.
+    """
+
+    def __init__(self, maxsize=DEFAULT_QUEUE_SIZE):
+        self.__queue = queue.Queue(maxsize)
+        self.__dropped_count = 0
+
+    def put(self, sequence, state):
+        try:
+            self.__queue.put_nowait((sequence, state))
+        except queue.Full:
+            self.__dropped_count += 1
+
+    def get(self, block=True, timeout=None):
+        """Returns the next (sequence, state), raises queue.Empty on timeout"""
+        return self.__queue.get(block, timeout)
+
+    def qsize(self):
+        return self.__queue.qsize()
+
+    @property
+    def dropped_count(self):
+        """States dropped because the queue was full"""
+        return self.__dropped_count
+
+
 class RTDE(object):
-    def __init__(self, hostname, port=30004):
+    def __init__(
+        self,
+        hostname,
+        port=30004,
+        buffer_size=DEFAULT_BUFFER_SIZE,
+        timeout=DEFAULT_TIMEOUT,
+        dead_link_cycles=None,
+    ):
+        """timeout applies to connecting and to every wait for data or for
+        room in the send buffer. If dead_link_cycles is set, the link is
+        declared dead once no data arrived for that many periods of the
+        output frequency, but at least MIN_DEAD_LINK_TIME seconds, while
+        synchronization is started: the connection is closed and
+        RTDELinkLostException raised by the receive calls.
+        """
         self.hostname = hostname
         self.port = port
+        self.timeout = timeout
+        self.dead_link_cycles = dead_link_cycles
         self.__conn_state = ConnectionState.DISCONNECTED
         self.__sock = None
+        self.__buf = PacketBuffer(buffer_size)
         self.__output_config = None
         self.__input_config = {}
+        self.__input_packers = {}
         self.__skipped_package_count = 0
         self.__protocolVersion = RTDE_PROTOCOL_VERSION_1
-
-    def connect(self):
+        self.__pending_setup = None
+        self.__reader = None
+        self.__reader_stop = threading.Event()
+        self.__reader_error = None
+        self.__latest_state = (0, None)
+        self.__subscribers = []
+        self.__keepalive = None
+        self.__user_timeout = None
+        self.__send_blocking = True
+        self.__unsent = bytearray()  # queued by a non-blocking send
+        self.__output_frequency = None
+        self.__last_receive_time = 0.0
+        self.__link_loss_count = 0
+        self.__link_loss_detection_latency = None
+        self.__frequency_switch_count = 0
+        self.__frequency_switch_latency = None
+        self.__timing = None
+        self.__clock = time.monotonic
+        self.__kernel_timestamps = False
+        self.__last_receive_timestamp = None
+        self.__replay = None
+        self.__output_decoding = (None, False, serialize.VECTOR_LIST)
+
+    def connect(self, sock=None, negotiate=True):
+        """Connect to the controller and negotiate the protocol version.
+        sock may be an already connected socket to use instead of opening a
+        new one, e.g. one connected without blocking by an event loop or a
+        Unix socket of an RTDE proxy. With negotiate=False the protocol
+        version request is left to begin_setup(), so connect() does not
+        block at all.
+        """
         if self.__sock:
             return
 
-        self.__buf = b""  # buffer data in binary format
+        self.__buf.clear()
         try:
-            self.__sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.__sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.__sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-            self.__sock.settimeout(DEFAULT_TIMEOUT)
+            if sock is None:
+                self.__sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                self.__sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                self.__sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self.__apply_link_options()
+                self.__sock.settimeout(self.timeout)
+                self.__sock.connect((self.hostname, self.port))
+            else:
+                self.__sock = sock
+                # a Unix socket, e.g. of an RTDE proxy, has no TCP options
+                if sock.family in (socket.AF_INET, socket.AF_INET6):
+                    self.__sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    self.__apply_link_options()
+            if self.__kernel_timestamps:
+                self.__sock.setsockopt(socket.SOL_SOCKET, KERNEL_TIMESTAMP_OPTION, 1)
             self.__skipped_package_count = 0
-            self.__sock.connect((self.hostname, self.port))
+            self.__protocolVersion = RTDE_PROTOCOL_VERSION_1
+            self.__pending_setup = None
+            del self.__unsent[:]
+            # All waiting is done with select from here on, a socket timeout
+            # would add a hidden poll to every send and recv call
+            self.__sock.setblocking(False)
             self.__conn_state = ConnectionState.CONNECTED
         except (socket.timeout, socket.error):
             self.__sock = None
             raise
-        if not self.negotiate_protocol_version():
+        if negotiate and not self.negotiate_protocol_version():
             raise RTDEException("Unable to negotiate protocol version")
 
+    def set_keepalive(self, idle=1, interval=1, count=3):
+        """Enable TCP keepalive: after idle seconds without traffic a probe is
+        sent every interval seconds and the connection is dropped by the
+        kernel after count unanswered probes. Values are whole seconds.
+        """
+        self.__keepalive = (idle, interval, count)
+        if self.__sock and self.__sock.family in (socket.AF_INET, socket.AF_INET6):
+            self.__apply_link_options()
+
+    def set_user_timeout(self, timeout):
+        """Set TCP_USER_TIMEOUT (Linux): the kernel drops the connection when
+        sent data stays unacknowledged for timeout seconds.
+        """
+        self.__user_timeout = timeout
+        if self.__sock and self.__sock.family in (socket.AF_INET, socket.AF_INET6):
+            self.__apply_link_options()
+
+    def set_send_blocking(self, blocking):
+        """With blocking=False a send that does not fit into the socket
+        buffer queues the rest instead of waiting up to timeout seconds for
+        room. An event loop then waits for the socket to become writable
+        while pending_send() is not 0 and calls flush().
+        """
+        self.__send_blocking = blocking
+
+    def pending_send(self):
+        """Number of queued bytes not written yet"""
+        return len(self.__unsent)
+
+    def flush(self):
+        """Writes as much of the queued bytes as fits without waiting,
+        returns True once none are left"""
+        if not self.__unsent:
+            return True
+        if self.__sock is None:
+            raise RTDEException("Not connected")
+        try:
+            sent = self.__sock.send(self.__unsent)
+        except BlockingIOError:
+            sent = 0
+        del self.__unsent[:sent]
+        return not self.__unsent
+
+    def set_output_decoding(self, fields=None, lazy=False, vectors=serialize.VECTOR_LIST):
+        """Select how received states are decoded. With fields only these
+        output fields are decoded, the others are skipped and missing on
+        the states. With lazy the states keep a copy of the payload and
+        decode a field on first access, which saves the decoding of the
+        fields that are never read. vectors selects the type of vector
+        fields: serialize.VECTOR_LIST, VECTOR_ARRAY for array.array or
+        VECTOR_NUMPY for read-only numpy views of the payload, both without
+        an object per element. Applies to the current and all following
+        output setups.
+        """
+        self.__output_decoding = (fields, lazy, vectors)
+        if self.__output_config is not None:
+            self.__output_config.set_decoding(fields, lazy, vectors)
+
+    def enable_timing(self, window=10.0, kernel_timestamps=False):
+        """Record the receive time of every data package and keep histograms
+        of inter-arrival time, jitter against the output period, parse time
+        and consumer lag, see timing(). By default receive times are taken
+        from time.monotonic() right after reading from the socket, with
+        kernel_timestamps from the SO_TIMESTAMPNS wall clock time of the
+        kernel (Linux), which excludes the delay until Python reads.
+        Packages read by one receive call share its timestamp.
+        """
+        if kernel_timestamps and KERNEL_TIMESTAMP_OPTION is None:
+            raise RTDEException("Kernel timestamps are not supported on this platform")
+        self.__timing = timing.ReceiveTiming(window)
+        if self.__output_frequency:
+            self.__timing.period = 1.0 / self.__output_frequency
+        if self.__replay is not None:
+            # a replay is timed with the recorded receive times
+            self.__clock = self.__replay.last_timestamp
+            self.__buf.enable_timestamps(self.__clock)
+            return
+        self.__kernel_timestamps = kernel_timestamps
+        self.__clock = time.time if kernel_timestamps else time.monotonic
+        self.__buf.enable_timestamps(self.__clock, kernel_timestamps)
+        if self.__sock and kernel_timestamps:
+            self.__sock.setsockopt(socket.SOL_SOCKET, KERNEL_TIMESTAMP_OPTION, 1)
+
+    def start_capture(self, filename):
+        """Write the received byte stream with the receive times to filename,
+        see rtde.capture. Started before connect() the capture includes the
+        setup replies, which replay() needs unless it is given the output
+        recipe.
+        """
+        self.stop_capture()
+        self.__buf.set_capture(capture.CaptureWriter(filename))
+
+    def stop_capture(self):
+        writer = self.__buf.set_capture(None)
+        if writer is not None:
+            writer.close()
+
+    def replay(
+        self,
+        filename,
+        output_names=None,
+        output_types=None,
+        frequency=None,
+        realtime=False,
+    ):
+        """Read the byte stream of a capture file instead of a connection.
+        Without an output recipe the capture must start at the connect: the
+        protocol version is negotiated from it and the setup calls made
+        while capturing must be repeated, their replies are read from the
+        capture. With output_names and output_types the data packages are
+        decoded with that recipe and receiving can start right away,
+        frequency is then only used for the timing statistics.
+        Sent data is discarded, the connection ends with the capture.
+        """
+        if self.__sock:
+            raise RTDEException("Cannot replay while connected")
+        self.__buf.clear()
+        self.__replay = capture.ReplaySource(filename, realtime)
+        self.__sock = self.__replay
+        self.__skipped_package_count = 0
+        self.__conn_state = ConnectionState.CONNECTED
+        if self.__timing is not None:
+            self.__clock = self.__replay.last_timestamp
+            self.__buf.enable_timestamps(self.__clock)
+        if output_names is None:
+            if not self.negotiate_protocol_version():
+                raise RTDEException("No protocol version reply in capture")
+            return
+        self.__protocolVersion = RTDE_PROTOCOL_VERSION_2
+        config = serialize.DataConfig.unpack_recipe(
+            b"\x01" + ",".join(output_types).encode("utf-8")
+        )
+        config.set_decoding(*self.__output_decoding)
+        config.names = output_names
+        self.__output_config = config
+        self.__output_frequency = frequency
+        if self.__timing is not None and frequency:
+            self.__timing.period = 1.0 / frequency
+        self.__conn_state = ConnectionState.STARTED
+
+    def timing(self):
+        """The ReceiveTiming histograms, None unless enable_timing() was called"""
+        return self.__timing
+
     def disconnect(self):
+        self.stop_reader()
         if self.__sock:
             self.__sock.close()
             self.__sock = None
+        self.__replay = None
         self.__conn_state = ConnectionState.DISCONNECTED
 
     def is_connected(self):
@@ -144,77 +598,215 @@ class RTDE(object):
 
     def send_input_setup(self, variables, types=[]):
         cmd = Command.RTDE_CONTROL_PACKAGE_SETUP_INPUTS
-        payload = bytearray(",".join(variables), "utf-8")
-        result = self.__sendAndReceive(cmd, payload)
-        if len(types) != 0 and not self.__list_equals(result.types, types):
-            _log.error(
-                "Data type inconsistency for input setup: "
-                + str(types)
-                + " - "
-                + str(result.types)
-            )
-            return None
-        result.names = variables
-        self.__input_config[result.id] = result
-        return serialize.DataObject.create_empty(variables, result.id)
+        result = self.__sendAndReceive(cmd, self.__input_setup_payload(variables))
+        return self.__on_input_setup(variables, types, result)
 
     def send_output_setup(self, variables, types=[], frequency=125):
         cmd = Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS
-        payload = struct.pack(">d", frequency)
-        payload = payload + (",".join(variables).encode("utf-8"))
+        payload = self.__output_setup_payload(variables, frequency)
         result = self.__sendAndReceive(cmd, payload)
-        if len(types) != 0 and not self.__list_equals(result.types, types):
-            _log.error(
-                "Data type inconsistency for output setup: "
-                + str(types)
-                + " - "
-                + str(result.types)
-            )
-            return False
-        result.names = variables
-        self.__output_config = result
-        return True
+        return self.__on_output_setup(variables, types, result, frequency)
 
     def send_start(self):
         cmd = Command.RTDE_CONTROL_PACKAGE_START
         success = self.__sendAndReceive(cmd)
-        if success:
-            _log.info("RTDE synchronization started")
-            self.__conn_state = ConnectionState.STARTED
-        else:
-            _log.error("RTDE synchronization failed to start")
-        return success
+        return self.__on_start(success)
+
+    def send_setup(self, output_variables, output_types=[], frequency=125, inputs=[], start=True):
+        """Pipelined setup of the input recipes, the output recipe and
+        optionally the synchronization start.
+        All requests are written at once and the replies, which the
+        controller sends in request order, are collected afterwards, so the
+        whole setup costs a single round trip.
+        inputs is a list of (variables, types) tuples.
+        Returns the list of input data objects in the order of inputs, or
+        None if any step failed.
+        """
+        if not self.begin_setup(output_variables, output_types, frequency, inputs, start):
+            return None
+        return self.finish_setup()
+
+    def begin_setup(self, output_variables, output_types=[], frequency=125, inputs=[], start=True):
+        """Writes the requests of send_setup() without waiting for the
+        replies, preceded by the protocol version request if connect() was
+        called with negotiate=False. An event loop polls setup_ready() when
+        the socket is readable and then calls finish_setup(), which does not
+        block anymore. Returns False if the requests could not be written.
+        """
+        self.__check_no_reader()
+        requests = []
+        if self.__protocolVersion != RTDE_PROTOCOL_VERSION_2:
+            requests.append(
+                (
+                    Command.RTDE_REQUEST_PROTOCOL_VERSION,
+                    struct.pack(">H", RTDE_PROTOCOL_VERSION_2),
+                )
+            )
+        requests.extend(
+            (Command.RTDE_CONTROL_PACKAGE_SETUP_INPUTS, self.__input_setup_payload(v))
+            for v, _ in inputs
+        )
+        requests.append(
+            (
+                Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS,
+                self.__output_setup_payload(output_variables, frequency),
+            )
+        )
+        if start:
+            requests.append((Command.RTDE_CONTROL_PACKAGE_START, b""))
+        self.__pending_setup = (
+            [cmd for cmd, _ in requests],
+            output_variables,
+            output_types,
+            frequency,
+            inputs,
+            start,
+        )
+        buf = b"".join(self.__pack_package(cmd, payload) for cmd, payload in requests)
+        return self.__send_package(buf)
+
+    def setup_ready(self):
+        """Reads what is available without waiting and returns True once
+        all replies to begin_setup() are buffered"""
+        if self.__pending_setup is None:
+            raise RTDEException("No setup in progress")
+        self.__recv_to_buffer(0)
+        commands = self.__pending_setup[0]
+        replies = 0
+        offset = 0
+        packet_header = self.__buf.peek_header()
+        while packet_header is not None and len(self.__buf) >= offset + packet_header[0]:
+            if packet_header[1] in commands:
+                replies += 1
+            offset += packet_header[0]
+            packet_header = self.__buf.peek_header(offset)
+        return replies >= len(commands)
+
+    def finish_setup(self):
+        """Handles the replies to begin_setup(), waiting for them unless
+        setup_ready() returned True. Returns what send_setup() returns."""
+        if self.__pending_setup is None:
+            raise RTDEException("No setup in progress")
+        commands, output_variables, output_types, frequency, inputs, start = self.__pending_setup
+        self.__pending_setup = None
+        replies = [self.__recv(cmd) for cmd in commands]
+
+        ok = True
+        if commands[0] == Command.RTDE_REQUEST_PROTOCOL_VERSION:
+            if replies.pop(0):
+                self.__protocolVersion = RTDE_PROTOCOL_VERSION_2
+            else:
+                _log.error("Unable to negotiate protocol version")
+                ok = False
+        input_data = []
+        for (variables, types), result in zip(inputs, replies):
+            data = self.__on_input_setup(variables, types, result)
+            ok = ok and data is not None
+            input_data.append(data)
+        result = replies[len(inputs)]
+        ok = (
+            self.__on_output_setup(output_variables, output_types, result, frequency)
+            and ok
+        )
+        if start:
+            ok = self.__on_start(replies[-1]) and ok
+        return input_data if ok else None
+
+    def set_output_frequency(self, frequency):
+        """Change the frequency of the started output recipe.
+        Pause, output setup with the new frequency and start are written at
+        once, the input recipes stay configured. The time until the start
+        was confirmed is kept in frequency_switch_latency.
+        """
+        if self.__output_config is None:
+            raise RTDEException("Output configuration not initialized")
+        self.__check_no_reader()
+        start_time = time.monotonic()
+        names = self.__output_config.names
+        types = self.__output_config.types
+        requests = [
+            (Command.RTDE_CONTROL_PACKAGE_PAUSE, b""),
+            (
+                Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS,
+                self.__output_setup_payload(names, frequency),
+            ),
+            (Command.RTDE_CONTROL_PACKAGE_START, b""),
+        ]
+        buf = b"".join(self.__pack_package(cmd, payload) for cmd, payload in requests)
+        if not self.__send_package(buf):
+            return False
+        # the pause is applied before waiting for the other replies, so the
+        # missing data packages are not taken for a dead link
+        ok = self.__on_pause(self.__recv(Command.RTDE_CONTROL_PACKAGE_PAUSE))
+        result = self.__recv(Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS)
+        ok = self.__on_output_setup(names, types, result, frequency) and ok
+        ok = self.__on_start(self.__recv(Command.RTDE_CONTROL_PACKAGE_START)) and ok
+        if ok:
+            self.__frequency_switch_latency = time.monotonic() - start_time
+            self.__frequency_switch_count += 1
+            _log.info(
+                "RTDE output frequency set to %g Hz in %.1f ms",
+                frequency,
+                self.__frequency_switch_latency * 1000,
+            )
+        return ok
 
     def send_pause(self):
         cmd = Command.RTDE_CONTROL_PACKAGE_PAUSE
-        success = self.__sendAndReceive(cmd)
-        if success:
-            _log.info("RTDE synchronization paused")
-            self.__conn_state = ConnectionState.PAUSED
-        else:
-            _log.error("RTDE synchronization failed to pause")
-        return success
+        return self.__on_pause(self.__sendAndReceive(cmd))
 
     def send(self, input_data):
         if self.__conn_state != ConnectionState.STARTED:
             _log.error("Cannot send when RTDE synchronization is inactive")
             return
-        if not input_data.recipe_id in self.__input_config:
+        packer = self.__input_packers.get(input_data.recipe_id)
+        if packer is None:
             _log.error("Input configuration id not found: " + str(input_data.recipe_id))
             return
-        config = self.__input_config[input_data.recipe_id]
-        return self.__sendall(Command.RTDE_DATA_PACKAGE, config.pack(input_data))
+        return self.__send_package(packer.pack(input_data))
+
+    def send_many(self, input_datas):
+        """Send the input packages of several recipes with a single write.
+        Each recipe may appear only once, its package is packed into the
+        preallocated buffer of the recipe.
+        """
+        if self.__conn_state != ConnectionState.STARTED:
+            _log.error("Cannot send when RTDE synchronization is inactive")
+            return
+        bufs = []
+        recipe_ids = set()
+        for input_data in input_datas:
+            packer = self.__input_packers.get(input_data.recipe_id)
+            if packer is None:
+                _log.error(
+                    "Input configuration id not found: " + str(input_data.recipe_id)
+                )
+                return
+            if input_data.recipe_id in recipe_ids:
+                raise ValueError(
+                    "Input recipe sent twice: " + str(input_data.recipe_id)
+                )
+            recipe_ids.add(input_data.recipe_id)
+            bufs.append(packer.pack(input_data))
+        if len(bufs) == 0:
+            return True
+        if len(bufs) == 1:
+            return self.__send_package(bufs[0])
+        return self.__send_packages(bufs)
 
     def receive(self, binary=False):
         """Recieve the latest data package.
         If muliple packages has been received, older ones are discarded
         and only the newest one will be returned. Will block untill a package
-        is received or the connection is lost
+        is received or the connection is lost.
+        Discarded packages are only framed by their headers, never decoded,
+        and are counted in skipped_package_count.
         """
         if self.__output_config is None:
             raise RTDEException("Output configuration not initialized")
         if self.__conn_state != ConnectionState.STARTED:
             raise RTDEException("Cannot receive when RTDE synchronization is inactive")
+        self.__check_no_reader()
         return self.__recv(Command.RTDE_DATA_PACKAGE, binary)
 
     def receive_buffered(self, binary=False, buffer_limit=None):
@@ -227,11 +819,14 @@ class RTDE(object):
         if self._RTDE__output_config is None:
             logging.error("Output configuration not initialized")
             return None
+        self.__check_no_reader()
 
         try:
             while (
                 self.is_connected()
                 and (buffer_limit == None or len(self.__buf) < buffer_limit)
+                # a replay is read on demand, not as fast as it can be read
+                and (self.__replay is None or self.__next_packet_header() is None)
                 and self.__recv_to_buffer(0)
             ):
                 pass
@@ -242,8 +837,143 @@ class RTDE(object):
         else:
             data = self.__recv_from_buffer(Command.RTDE_DATA_PACKAGE, binary)
 
+        if data is None:
+            self.__check_link()
         return data
 
+    def receive_batch(self, buffer_limit=None):
+        """Recieve all buffered data packages at once.
+        Waits for data like receive(), then reads what is available without
+        waiting and decodes all complete data packages together into a numpy
+        structured array, one row per package, oldest first, with the dtype
+        of serialize.DataConfig.dtype(): a column per field and vector
+        fields as subarray columns. Nothing is skipped, packages after a
+        control package or text message are returned by the next call.
+        Returns None if no data is available.
+        """
+        if self.__output_config is None:
+            raise RTDEException("Output configuration not initialized")
+        if self.__conn_state != ConnectionState.STARTED:
+            raise RTDEException("Cannot receive when RTDE synchronization is inactive")
+        self.__check_no_reader()
+
+        if self.__next_packet_header() is None:
+            try:
+                if not self.__recv_to_buffer(self.__wait_timeout()):
+                    self.__check_link()
+            except RTDETimeoutException:
+                self.__check_link()
+                return None
+        try:
+            while (
+                self.__replay is None
+                and self.is_connected()
+                and (buffer_limit is None or len(self.__buf) < buffer_limit)
+                and self.__recv_to_buffer(0)
+            ):
+                pass
+        except RTDEException as e:
+            batch = self.__batch_from_buffer()
+            if batch is None:
+                raise e
+            return batch
+        return self.__batch_from_buffer()
+
+    def receive_ready(self, binary=False):
+        """Recieve all data packages that can be read without waiting.
+        Performs a single read from the socket, meant to be called by an
+        event loop once the socket (see fileno()) is readable.
+        Returns the list of complete data packages, oldest first.
+        """
+        if self.__output_config is None:
+            raise RTDEException("Output configuration not initialized")
+        self.__check_no_reader()
+        try:
+            received = self.__buf.recv_into(self.__sock)
+        except BlockingIOError:
+            received = None
+        if received == 0:
+            _log.error(
+                "received 0 bytes from Controller, probable cause: Controller has stopped"
+            )
+            self.__trigger_disconnected()
+            raise RTDEException("received 0 bytes from Controller")
+        if received:
+            self.__last_receive_time = time.monotonic()
+
+        states = []
+        data = self.__recv_from_buffer(Command.RTDE_DATA_PACKAGE, binary)
+        while data is not None:
+            states.append(data)
+            data = self.__recv_from_buffer(Command.RTDE_DATA_PACKAGE, binary)
+        return states
+
+    def fileno(self):
+        """File descriptor of the connection, for use with select/selectors"""
+        if self.__sock is None:
+            raise RTDEException("Not connected")
+        return self.__sock.fileno()
+
+    def start_reader(self, binary=False):
+        """Start a background thread that owns the receiving side of the socket.
+        Every received data package is published to latest_state() and
+        delivered to the registered callbacks and subscriber queues.
+        receive(), receive_buffered() and the setup/start/pause requests are
+        unavailable until stop_reader() is called, send() can still be used.
+        """
+        if self.__reader is not None:
+            return
+        if self.__output_config is None:
+            raise RTDEException("Output configuration not initialized")
+        if self.__conn_state != ConnectionState.STARTED:
+            raise RTDEException("Cannot receive when RTDE synchronization is inactive")
+        self.__reader_stop.clear()
+        self.__reader_error = None
+        self.__reader = threading.Thread(
+            target=self.__reader_loop, args=(binary,), name="rtde-reader"
+        )
+        self.__reader.daemon = True
+        self.__reader.start()
+
+    def stop_reader(self, timeout=None):
+        """Stop the reader thread, it exits within timeout seconds"""
+        reader = self.__reader
+        if reader is None:
+            return
+        self.__reader_stop.set()
+        if reader is not threading.current_thread():
+            reader.join(timeout)
+        self.__reader = None
+
+    def is_reader_running(self):
+        return self.__reader is not None and self.__reader.is_alive()
+
+    def latest_state(self):
+        """Returns (sequence, state) of the newest package published by the
+        reader thread. The sequence starts at 1 and increases with every
+        package, (0, None) is returned before the first one arrives.
+        """
+        return self.__latest_state
+
+    def subscribe(self, callback=None, maxsize=DEFAULT_QUEUE_SIZE):
+        """Register a subscriber to all states received by the reader thread.
+        If callback is given it is called as callback(sequence, state) on the
+        reader thread and must return quickly. Otherwise a StateQueue of
+        maxsize entries is returned for consumption on another thread.
+        """
+        subscriber = StateQueue(maxsize) if callback is None else callback
+        # copy on write, the reader thread iterates without locking
+        self.__subscribers = self.__subscribers + [subscriber]
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.__subscribers = [s for s in self.__subscribers if s is not subscriber]
+
+    @property
+    def reader_error(self):
+        """The exception that terminated the reader thread, if any"""
+        return self.__reader_error
+
     def send_message(
         self, message, source="Python Client", type=serialize.Message.INFO_MESSAGE
     ):
@@ -253,6 +983,10 @@ class RTDE(object):
         return self.__sendall(cmd, payload)
 
     def __on_packet(self, cmd, payload):
+        if cmd == Command.RTDE_DATA_PACKAGE:
+            return self.__unpack_data_package(payload, self.__output_config)
+        # control packages are rare, unpack them from a private copy
+        payload = bytes(payload)
         if cmd == Command.RTDE_REQUEST_PROTOCOL_VERSION:
             return self.__unpack_protocol_version_package(payload)
         elif cmd == Command.RTDE_GET_URCONTROL_VERSION:
@@ -267,33 +1001,140 @@ class RTDE(object):
             return self.__unpack_start_package(payload)
         elif cmd == Command.RTDE_CONTROL_PACKAGE_PAUSE:
             return self.__unpack_pause_package(payload)
-        elif cmd == Command.RTDE_DATA_PACKAGE:
-            return self.__unpack_data_package(payload, self.__output_config)
         else:
             _log.error("Unknown package command: " + str(cmd))
 
+    def __input_setup_payload(self, variables):
+        return bytearray(",".join(variables), "utf-8")
+
+    def __output_setup_payload(self, variables, frequency):
+        payload = struct.pack(">d", frequency)
+        return payload + (",".join(variables).encode("utf-8"))
+
+    def __on_input_setup(self, variables, types, result):
+        if result is None:
+            _log.error("No reply to input setup")
+            return None
+        if len(types) != 0 and not self.__list_equals(result.types, types):
+            _log.error(
+                "Data type inconsistency for input setup: "
+                + str(types)
+                + " - "
+                + str(result.types)
+            )
+            return None
+        result.names = variables
+        self.__input_config[result.id] = result
+        self.__input_packers[result.id] = result.create_packer(
+            Command.RTDE_DATA_PACKAGE
+        )
+        return serialize.DataObject.create_empty(variables, result.id)
+
+    def __on_output_setup(self, variables, types, result, frequency):
+        if result is None:
+            _log.error("No reply to output setup")
+            return False
+        if len(types) != 0 and not self.__list_equals(result.types, types):
+            _log.error(
+                "Data type inconsistency for output setup: "
+                + str(types)
+                + " - "
+                + str(result.types)
+            )
+            return False
+        result.set_decoding(*self.__output_decoding)
+        result.names = variables
+        self.__output_config = result
+        self.__output_frequency = frequency
+        if self.__timing is not None:
+            self.__timing.period = 1.0 / frequency
+        return True
+
+    def __on_pause(self, success):
+        if success:
+            _log.info("RTDE synchronization paused")
+            self.__conn_state = ConnectionState.PAUSED
+        else:
+            _log.error("RTDE synchronization failed to pause")
+        return success
+
+    def __on_start(self, success):
+        if success:
+            _log.info("RTDE synchronization started")
+            self.__conn_state = ConnectionState.STARTED
+            self.__last_receive_time = time.monotonic()
+        else:
+            _log.error("RTDE synchronization failed to start")
+        return success
+
     def __sendAndReceive(self, cmd, payload=b""):
+        self.__check_no_reader()
         if self.__sendall(cmd, payload):
             return self.__recv(cmd)
         else:
             return None
 
     def __sendall(self, command, payload=b""):
+        return self.__send_package(self.__pack_package(command, payload))
+
+    def __pack_package(self, command, payload=b""):
         fmt = ">HB"
         size = struct.calcsize(fmt) + len(payload)
-        buf = struct.pack(fmt, size, command) + payload
+        return struct.pack(fmt, size, command) + bytes(payload)
 
+    def __send_package(self, buf):
         if self.__sock is None:
             _log.error("Unable to send: not connected to Robot")
             return False
 
-        _, writable, _ = select.select([], [self.__sock], [], DEFAULT_TIMEOUT)
-        if len(writable):
-            self.__sock.sendall(buf)
+        if self.__unsent:
+            # behind the bytes queued by a non-blocking send
+            buf = bytes(self.__unsent) + bytes(buf)
+            del self.__unsent[:]
+
+        # a single non-blocking send is enough unless the socket buffer is full
+        try:
+            sent = self.__sock.send(buf)
+        except BlockingIOError:
+            sent = 0
+        if sent == len(buf):
             return True
-        else:
-            self.__trigger_disconnected()
+        return self.__send_remaining(memoryview(buf)[sent:])
+
+    def __send_packages(self, bufs):
+        if self.__sock is None:
+            _log.error("Unable to send: not connected to Robot")
             return False
+        # not available on Windows
+        if not hasattr(self.__sock, "sendmsg") or self.__unsent:
+            return self.__send_package(b"".join(bufs))
+
+        # one vectored write, the rest is only copied if it did not fit
+        try:
+            sent = self.__sock.sendmsg(bufs)
+        except BlockingIOError:
+            sent = 0
+        remaining = sum(len(buf) for buf in bufs) - sent
+        if remaining == 0:
+            return True
+        return self.__send_remaining(memoryview(b"".join(bufs))[sent:])
+
+    def __send_remaining(self, remaining):
+        if not self.__send_blocking:
+            # copied, the packers reuse their buffers
+            self.__unsent += remaining
+            return True
+        while len(remaining):
+            _, writable, _ = select.select([], [self.__sock], [], self.timeout)
+            if not len(writable):
+                self.__trigger_disconnected()
+                return False
+            try:
+                sent = self.__sock.send(remaining)
+            except BlockingIOError:
+                sent = 0
+            remaining = remaining[sent:]
+        return True
 
     def has_data(self):
         timeout = 0
@@ -301,84 +1142,250 @@ class RTDE(object):
         return len(readable) != 0
 
     def __recv(self, command, binary=False):
+        # data packages are read from the socket first to get the newest one,
+        # control replies of a pipelined request may already be buffered
+        wait = (
+            command == Command.RTDE_DATA_PACKAGE or self.__next_packet_header() is None
+        )
         while self.is_connected():
-            try:
-                self.__recv_to_buffer(DEFAULT_TIMEOUT)
-            except RTDETimeoutException:
-                return None
-
-            # unpack_from requires a buffer of at least 3 bytes
-            while len(self.__buf) >= 3:
-                # Attempts to extract a packet
-                packet_header = serialize.ControlHeader.unpack(self.__buf)
-
-                if len(self.__buf) >= packet_header.size:
-                    packet, self.__buf = (
-                        self.__buf[3 : packet_header.size],
-                        self.__buf[packet_header.size :],
-                    )
-                    data = self.__on_packet(packet_header.command, packet)
-                    if len(self.__buf) >= 3 and command == Command.RTDE_DATA_PACKAGE:
-                        next_packet_header = serialize.ControlHeader.unpack(self.__buf)
-                        if next_packet_header.command == command:
-                            _log.debug("skipping package(1)")
-                            self.__skipped_package_count += 1
-                            continue
-                    if packet_header.command == command:
-                        if binary:
-                            return packet[1:]
-
-                        return data
-                    else:
-                        _log.debug("skipping package(2)")
-                else:
-                    break
+            if wait:
+                try:
+                    if not self.__recv_to_buffer(self.__wait_timeout()):
+                        self.__check_link()
+                except RTDETimeoutException:
+                    self.__check_link()
+                    return None
+            wait = True
+
+            packet = self.__next_package(command, latest=True)
+            if packet is not None:
+                return self.__decode(command, packet, binary)
         raise RTDEException(" _recv() Connection lost ")
 
     def __recv_to_buffer(self, timeout):
+        if self.__replay is not None:
+            if self.__buf.recv_into(self.__replay) == 0:
+                _log.info("end of capture " + self.__replay.filename)
+                self.__trigger_disconnected()
+                return False
+            return True
         readable, _, xlist = select.select([self.__sock], [], [self.__sock], timeout)
         if len(readable):
-            more = self.__sock.recv(4096)
+            received = self.__buf.recv_into(self.__sock)
             # When the controller stops while the script is running
-            if len(more) == 0:
+            if received == 0:
                 _log.error(
                     "received 0 bytes from Controller, probable cause: Controller has stopped"
                 )
                 self.__trigger_disconnected()
                 raise RTDEException("received 0 bytes from Controller")
 
-            self.__buf = self.__buf + more
+            self.__last_receive_time = time.monotonic()
             return True
 
         if (
             len(xlist) or len(readable) == 0
         ) and timeout != 0:  # Effectively a timeout of timeout seconds
-            _log.warning("no data received in last %d seconds ", timeout)
+            _log.warning("no data received in last %.3f seconds ", timeout)
             raise RTDETimeoutException("no data received within timeout")
 
         return False
 
     def __recv_from_buffer(self, command, binary=False):
-        # unpack_from requires a buffer of at least 3 bytes
-        while len(self.__buf) >= 3:
-            # Attempts to extract a packet
-            packet_header = serialize.ControlHeader.unpack(self.__buf)
-
-            if len(self.__buf) >= packet_header.size:
-                packet, self.__buf = (
-                    self.__buf[3 : packet_header.size],
-                    self.__buf[packet_header.size :],
+        packet = self.__next_package(command)
+        if packet is None:
+            return None
+        return self.__decode(command, packet, binary)
+
+    def __next_package(self, command, latest=False):
+        """Pops the next complete package of command from the buffer, None
+        if there is none. The packages in front of it are skipped, with
+        latest also a data package that a newer one follows. Only the
+        headers are inspected until the package to return is found."""
+        packet_header = self.__next_packet_header()
+        while packet_header is not None:
+            size, packet_command = packet_header
+            if packet_command == command and not (
+                latest and self.__superseded(size, packet_command)
+            ):
+                return self.__pop(size, packet_command)
+            self.__skip(size, packet_command)
+            packet_header = self.__next_packet_header()
+        return None
+
+    def __superseded(self, size, command):
+        if command != Command.RTDE_DATA_PACKAGE:
+            return False
+        next_packet_header = self.__buf.peek_header(size)
+        return next_packet_header is not None and next_packet_header[1] == command
+
+    def __skip(self, size, command):
+        packet = self.__pop(size, command)
+        _log.debug("skipping package %d", command)
+        if command == Command.RTDE_DATA_PACKAGE:
+            # dropped undecoded
+            self.__skipped_package_count += 1
+        else:
+            # text messages and control replies are still handled
+            self.__on_packet(command, packet)
+
+    def __decode(self, command, packet, binary):
+        if command == Command.RTDE_DATA_PACKAGE:
+            return self.__on_data_package(packet, binary)
+        return self.__on_packet(command, packet)
+
+    def __batch_from_buffer(self):
+        """Decodes the next run of data packages in the buffer into an array,
+        packages after a control package are left for the next call"""
+        packet_header = self.__next_packet_header()
+        while packet_header is not None:
+            size, packet_command = packet_header
+            if packet_command == Command.RTDE_DATA_PACKAGE:
+                batch = self.__output_config.unpack_packages(
+                    self.__buf.peek(), Command.RTDE_DATA_PACKAGE
+                )
+                if len(batch):
+                    if self.__timing is None:
+                        self.__buf.skip(len(batch) * size)
+                    else:
+                        for _ in range(len(batch)):
+                            self.__pop(size, packet_command)
+                    return batch
+                _log.error("data package of unexpected size: " + str(size))
+                self.__pop(size, packet_command)
+            else:
+                self.__on_packet(packet_command, self.__pop(size, packet_command))
+            packet_header = self.__next_packet_header()
+        return None
+
+    def __pop(self, size, command):
+        packet = self.__buf.pop(size)
+        if self.__timing is not None and command == Command.RTDE_DATA_PACKAGE:
+            self.__last_receive_timestamp = self.__buf.timestamp()
+            self.__timing.on_package(self.__last_receive_timestamp)
+        return packet
+
+    def __on_data_package(self, packet, binary):
+        """Decodes a data package handed to the caller"""
+        if self.__timing is None:
+            if binary:
+                return packet[1:].tobytes()
+            return self.__on_packet(Command.RTDE_DATA_PACKAGE, packet)
+        start = time.perf_counter()
+        if binary:
+            data = packet[1:].tobytes()
+        else:
+            data = self.__on_packet(Command.RTDE_DATA_PACKAGE, packet)
+        parsed = time.perf_counter()
+        self.__timing.on_returned(
+            parsed - start, self.__clock() - self.__last_receive_timestamp
+        )
+        return data
+
+    def __next_packet_header(self):
+        """Returns (size, command) if a complete package is buffered, else None"""
+        packet_header = self.__buf.peek_header()
+        if packet_header is None:
+            return None
+        if packet_header[0] < HEADER_SIZE:
+            self.__trigger_disconnected()
+            raise RTDEException("Invalid package size: " + str(packet_header[0]))
+        if len(self.__buf) < packet_header[0]:
+            return None
+        return packet_header
+
+    def __apply_link_options(self):
+        if self.__keepalive is not None:
+            idle, interval, count = self.__keepalive
+            self.__sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            # TCP_KEEPIDLE is called TCP_KEEPALIVE on macOS
+            keepidle = getattr(socket, "TCP_KEEPIDLE", getattr(socket, "TCP_KEEPALIVE", None))
+            for option, value in (
+                (keepidle, idle),
+                (getattr(socket, "TCP_KEEPINTVL", None), interval),
+                (getattr(socket, "TCP_KEEPCNT", None), count),
+            ):
+                if option is not None:
+                    self.__sock.setsockopt(socket.IPPROTO_TCP, option, int(value))
+        if self.__user_timeout is not None:
+            if hasattr(socket, "TCP_USER_TIMEOUT"):
+                self.__sock.setsockopt(
+                    socket.IPPROTO_TCP,
+                    socket.TCP_USER_TIMEOUT,
+                    int(self.__user_timeout * 1000),
                 )
-                data = self.__on_packet(packet_header.command, packet)
-                if packet_header.command == command:
-                    if binary:
-                        return packet[1:]
-
-                    return data
-                else:
-                    _log.debug("skipping package(2)")
             else:
-                return None
+                _log.warning("TCP_USER_TIMEOUT is not supported on this platform")
+
+    def __link_deadline(self):
+        if (
+            self.dead_link_cycles is None
+            or not self.__output_frequency
+            or self.__conn_state != ConnectionState.STARTED
+        ):
+            return None
+        return self.__last_receive_time + max(
+            self.dead_link_cycles / float(self.__output_frequency), MIN_DEAD_LINK_TIME
+        )
+
+    def __wait_timeout(self):
+        deadline = self.__link_deadline()
+        if deadline is None:
+            return self.timeout
+        return max(0.0, min(self.timeout, deadline - time.monotonic()))
+
+    def __check_link(self):
+        deadline = self.__link_deadline()
+        if deadline is None:
+            return
+        now = time.monotonic()
+        if now < deadline:
+            return
+        latency = now - self.__last_receive_time
+        self.__link_loss_count += 1
+        self.__link_loss_detection_latency = latency
+        _log.error(
+            "no data received for %.3f seconds (%d cycles at %g Hz), link is dead",
+            latency,
+            self.dead_link_cycles,
+            self.__output_frequency,
+        )
+        self.__trigger_disconnected()
+        raise RTDELinkLostException("no data received for %.3f seconds" % latency)
+
+    def __check_no_reader(self):
+        if self.__reader is not None:
+            raise RTDEException("The connection is owned by the reader thread")
+
+    def __reader_loop(self, binary):
+        sequence = self.__latest_state[0]
+        try:
+            while not self.__reader_stop.is_set() and self.is_connected():
+                try:
+                    if not self.__recv_to_buffer(self.__wait_timeout()):
+                        self.__check_link()
+                except RTDETimeoutException:
+                    self.__check_link()
+                    continue
+                state = self.__recv_from_buffer(Command.RTDE_DATA_PACKAGE, binary)
+                while state is not None:
+                    sequence += 1
+                    self.__latest_state = (sequence, state)
+                    for subscriber in self.__subscribers:
+                        self.__deliver(subscriber, sequence, state)
+                    state = self.__recv_from_buffer(Command.RTDE_DATA_PACKAGE, binary)
+        except Exception as e:
+            _log.error("RTDE reader thread stopped: " + str(e))
+            self.__reader_error = e
+
+    def __deliver(self, subscriber, sequence, state):
+        if isinstance(subscriber, StateQueue):
+            subscriber.put(sequence, state)
+            return
+        try:
+            subscriber(sequence, state)
+        except Exception:
+            _log.exception("RTDE state callback failed")
 
     def __trigger_disconnected(self):
         _log.info("RTDE disconnected")
@@ -462,9 +1469,47 @@ class RTDE(object):
 
     @property
     def skipped_package_count(self):
-        """The skipped package count, resets on connect"""
+        """Data packages dropped undecoded, because a newer one was
+        buffered in receive() or while waiting for a control reply. Resets
+        on connect."""
         return self.__skipped_package_count
 
+    @property
+    def last_receive_timestamp(self):
+        """Receive time of the last data package, needs enable_timing()"""
+        return self.__last_receive_timestamp
+
+    @property
+    def output_frequency(self):
+        """Frequency of the configured output recipe"""
+        return self.__output_frequency
+
+    @property
+    def frequency_switch_count(self):
+        """Number of successful set_output_frequency() calls"""
+        return self.__frequency_switch_count
+
+    @property
+    def frequency_switch_latency(self):
+        """Seconds the last set_output_frequency() took, None before the first"""
+        return self.__frequency_switch_latency
+
+    @property
+    def link_loss_count(self):
+        """Number of times the link was declared dead"""
+        return self.__link_loss_count
+
+    @property
+    def link_loss_detection_latency(self):
+        """Seconds between the last received data and the detection of the
+        last dead link, None if no dead link was detected"""
+        return self.__link_loss_detection_latency
+
+    @property
+    def overflow_drop_count(self):
+        """Packages dropped because the receive buffer reached its size limit"""
+        return self.__buf.overflow_drop_count
+
 
 
 
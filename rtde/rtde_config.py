@@ -23,9 +23,11 @@
 
 import xml.etree.ElementTree as ET
 
+from . import field_catalog, serialize
+
 
 class Recipe(object):
-    __slots__ = ["key", "names", "types"]
+    __slots__ = ["key", "names", "types", "config"]
 
     @staticmethod
     def parse(recipe_node):
@@ -33,19 +35,48 @@ class Recipe(object):
         rmd.key = recipe_node.get("key")
         rmd.names = [f.get("name") for f in recipe_node.findall("field")]
         rmd.types = [f.get("type") for f in recipe_node.findall("field")]
+        rmd.config = None
         return rmd
 
+    def compile(self):
+        """Builds the struct format and record class of the recipe. They are
+        cached in serialize and reused by every connection that sets up the
+        same recipe, also after a reconnect."""
+        payload = ",".join(self.types).encode("utf-8")
+        self.config = serialize.DataConfig.unpack_recipe(b"\x00" + payload)
+        self.config.names = self.names
+
 
 class ConfigFile(object):
-    def __init__(self, filename):
+    """The recipes of an XML configuration file.
+
+    With validate every recipe is checked against rtde.field_catalog and
+    compiled when the file is loaded, so that a bad recipe fails here
+    instead of at the setup on the robot. Pass validate=False for fields
+    the catalog does not know yet.
+    """
+
+    def __init__(self, filename, validate=True):
         self.__filename = filename
         tree = ET.parse(self.__filename)
         root = tree.getroot()
         recipes = [Recipe.parse(r) for r in root.findall("recipe")]
         self.__dictionary = dict()
         for r in recipes:
+            try:
+                if validate:
+                    field_catalog.check_recipe(r.names, r.types)
+                r.compile()
+            except ValueError as e:
+                raise ValueError(
+                    "%s: recipe %s: %s" % (self.__filename, r.key, e)
+                )
             self.__dictionary[r.key] = r
 
     def get_recipe(self, key):
         r = self.__dictionary[key]
         return r.names, r.types
+
+    def get_config(self, key):
+        """The compiled serialize.DataConfig of a recipe"""
+        return self.__dictionary[key].config
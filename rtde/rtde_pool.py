@@ -0,0 +1,398 @@
+# Copyright (c) 2020-2022, Universal Robots A/S,
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the Universal Robots A/S nor the names of its
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL UNIVERSAL ROBOTS A/S BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import collections
+import errno
+import logging
+import os
+import selectors
+import socket
+import threading
+import time
+
+from rtde.rtde import RTDE, RTDEException, DEFAULT_TIMEOUT, LOGNAME
+
+_log = logging.getLogger(LOGNAME)
+
+DEFAULT_RETRY_DELAY = 0.1  # s, first reconnect attempt
+DEFAULT_MAX_RETRY_DELAY = 10.0  # s
+
+
+class SessionState:
+    WAITING = 0  # waiting for the next connection attempt
+    CONNECTING = 1  # TCP connect in progress
+    STREAMING = 2  # synchronization started, receiving data packages
+    SETUP = 3  # setup requests written, waiting for the replies
+    RESOLVING = 4  # hostname lookup running in a worker thread
+
+
+class RobotSession(object):
+    """One robot of an RTDEPool.
+
+    Holds the recipes to set up on every (re)connect, the RTDE connection,
+    the newest received state and the reconnect state machine.
+    """
+
+    def __init__(
+        self,
+        name,
+        hostname,
+        port,
+        output_names,
+        output_types,
+        frequency,
+        input_recipes,
+        on_state,
+    ):
+        self.name = name
+        self.hostname = hostname
+        self.port = port
+        self.output_names = output_names
+        self.output_types = output_types
+        self.frequency = frequency
+        self.input_recipes = input_recipes
+        self.on_state = on_state
+        self.connection = None
+        self.inputs = {}
+        self.state = SessionState.WAITING
+        self.latest_state = None
+        self.received_count = 0
+        self.connect_count = 0
+        self.retry_delay = DEFAULT_RETRY_DELAY
+        self.next_attempt = 0.0
+        self.last_receive = 0.0
+        self.sock = None
+        self.fd = None  # descriptor registered with the selector
+
+    def is_streaming(self):
+        return self.state == SessionState.STREAMING
+
+
+class RTDEPool(object):
+    """Runs the RTDE connections of several robots on one selectors loop.
+
+    Each robot is a RobotSession with its own reconnect state machine: a
+    hostname is looked up in a worker thread on every attempt, the TCP
+    connect and the setup handshake, protocol version, recipes and
+    start written at once, both run without blocking through the selector.
+    Received states are stored per robot and passed to the optional
+    on_state(session, state) callback. A robot that fails, rejects its
+    recipes (e.g. IN_USE) or stays silent for timeout seconds is
+    reconnected with an exponential backoff that is reset after a
+    successful start, without holding up the other robots.
+    """
+
+    def __init__(
+        self,
+        timeout=DEFAULT_TIMEOUT,
+        retry_delay=DEFAULT_RETRY_DELAY,
+        max_retry_delay=DEFAULT_MAX_RETRY_DELAY,
+    ):
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.__selector = selectors.DefaultSelector()
+        self.__sessions = {}
+        # (session, address or error) of finished lookups, the worker wakes
+        # up the selector through the socket pair
+        self.__resolved = collections.deque()
+        self.__wakeup, self.__wakeup_sender = socket.socketpair()
+        self.__wakeup.setblocking(False)
+        self.__wakeup_sender.setblocking(False)
+        self.__selector.register(self.__wakeup, selectors.EVENT_READ, None)
+
+    def add_robot(
+        self,
+        name,
+        hostname,
+        output_names,
+        output_types,
+        frequency=125,
+        port=30004,
+        input_recipes={},
+        on_state=None,
+    ):
+        """Adds a robot. input_recipes maps a key to (names, types) of an
+        input recipe, the matching input objects are available in
+        session.inputs after every connect."""
+        if name in self.__sessions:
+            raise ValueError("Robot already added: " + str(name))
+        session = RobotSession(
+            name,
+            hostname,
+            port,
+            output_names,
+            output_types,
+            frequency,
+            input_recipes,
+            on_state,
+        )
+        session.retry_delay = self.retry_delay
+        self.__sessions[name] = session
+        return session
+
+    def remove_robot(self, name):
+        session = self.__sessions.pop(name)
+        self.__close(session)
+
+    def get_session(self, name):
+        return self.__sessions[name]
+
+    def sessions(self):
+        return list(self.__sessions.values())
+
+    def send(self, name, input_data):
+        """Sends input_data to a robot, returns False if it is not streaming"""
+        session = self.__sessions[name]
+        if not session.is_streaming():
+            return False
+        try:
+            # what does not fit into the socket buffer is queued and written
+            # from run_once(), waiting for room would hold up every robot
+            result = session.connection.send(input_data)
+        except (RTDEException, socket.error) as e:
+            self.__fail(session, e)
+            return False
+        self.__watch_send(session)
+        return result
+
+    def run(self, stop_event):
+        while not stop_event.is_set():
+            self.run_once()
+        self.close()
+
+    def run_once(self, max_wait=0.1):
+        """Handles due connection attempts and all ready sockets once"""
+        now = time.monotonic()
+        wait = max_wait
+        for session in list(self.__sessions.values()):
+            if session.state == SessionState.WAITING:
+                if now >= session.next_attempt:
+                    self.__resolve(session, now)
+                else:
+                    wait = min(wait, session.next_attempt - now)
+            elif session.state == SessionState.RESOLVING:
+                pass  # bounded by the timeouts of the resolver
+            elif now - session.last_receive > self.timeout:
+                self.__fail(session, RTDEException("no data received within timeout"))
+                wait = 0
+
+        for key, events in self.__selector.select(max(wait, 0)):
+            session = key.data
+            if session is None:
+                self.__on_resolved()
+                continue
+            if session.state == SessionState.CONNECTING:
+                self.__finish_connect(session)
+                continue
+            if events & selectors.EVENT_WRITE:
+                self.__flush(session)
+            if not events & selectors.EVENT_READ:
+                continue
+            if session.state == SessionState.SETUP:
+                self.__finish_setup(session)
+            elif session.state == SessionState.STREAMING:
+                self.__receive(session)
+
+    def close(self):
+        for session in self.__sessions.values():
+            self.__close(session)
+        self.__selector.close()
+        self.__wakeup.close()
+        self.__wakeup_sender.close()
+
+    def __resolve(self, session, now):
+        try:
+            # an IP address needs no lookup
+            address = socket.getaddrinfo(
+                session.hostname,
+                session.port,
+                type=socket.SOCK_STREAM,
+                flags=socket.AI_NUMERICHOST,
+            )[0]
+        except socket.gaierror:
+            session.state = SessionState.RESOLVING
+            worker = threading.Thread(
+                target=self.__lookup, args=(session,), name="rtde-resolve"
+            )
+            worker.daemon = True
+            worker.start()
+            return
+        self.__start_connect(session, address, now)
+
+    def __lookup(self, session):
+        try:
+            result = socket.getaddrinfo(
+                session.hostname, session.port, type=socket.SOCK_STREAM
+            )[0]
+        except (socket.error, UnicodeError) as e:
+            result = e
+        self.__resolved.append((session, result))
+        try:
+            self.__wakeup_sender.send(b"\0")
+        except socket.error:
+            pass  # closed, or already woken up
+
+    def __on_resolved(self):
+        try:
+            while self.__wakeup.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        while self.__resolved:
+            session, result = self.__resolved.popleft()
+            # removed or closed while the lookup was running
+            if (
+                self.__sessions.get(session.name) is not session
+                or session.state != SessionState.RESOLVING
+            ):
+                continue
+            if isinstance(result, Exception):
+                self.__fail(session, result)
+            else:
+                self.__start_connect(session, result, time.monotonic())
+
+    def __start_connect(self, session, address, now):
+        family, _, _, _, sockaddr = address
+        try:
+            session.sock = socket.socket(family, socket.SOCK_STREAM)
+            session.sock.setblocking(False)
+            err = session.sock.connect_ex(sockaddr)
+            if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+                raise socket.error(err, os.strerror(err))
+        except socket.error as e:
+            self.__fail(session, e)
+            return
+        session.state = SessionState.CONNECTING
+        # the connect timeout is watched through last_receive
+        session.last_receive = now
+        session.fd = session.sock.fileno()
+        self.__selector.register(session.fd, selectors.EVENT_WRITE, session)
+
+    def __finish_connect(self, session):
+        self.__selector.unregister(session.fd)
+        session.fd = None
+        err = session.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err != 0:
+            self.__fail(session, socket.error(err, "connect failed"))
+            return
+        try:
+            self.__begin_setup(session)
+        except (RTDEException, socket.error) as e:
+            self.__fail(session, e)
+            return
+        session.state = SessionState.SETUP
+        # the setup timeout is watched through last_receive as well
+        session.last_receive = time.monotonic()
+        session.fd = session.connection.fileno()
+        self.__selector.register(session.fd, selectors.EVENT_READ, session)
+        self.__watch_send(session)
+
+    def __begin_setup(self, session):
+        con = RTDE(session.hostname, session.port, timeout=self.timeout)
+        session.connection = con
+        con.connect(session.sock, negotiate=False)
+        con.set_send_blocking(False)
+        session.sock = None
+        if not con.begin_setup(
+            session.output_names,
+            session.output_types,
+            session.frequency,
+            [session.input_recipes[key] for key in session.input_recipes],
+        ):
+            raise RTDEException("Unable to send the setup requests")
+
+    def __finish_setup(self, session):
+        con = session.connection
+        try:
+            if not con.setup_ready():
+                return
+            input_data = con.finish_setup()
+            if input_data is None:
+                raise RTDEException("Unable to set up the recipes and start")
+        except (RTDEException, socket.error, ValueError) as e:
+            # ValueError: an input of the recipes is IN_USE
+            self.__fail(session, e)
+            return
+        session.inputs = dict(zip(session.input_recipes, input_data))
+        session.state = SessionState.STREAMING
+        session.connect_count += 1
+        session.retry_delay = self.retry_delay
+        session.last_receive = time.monotonic()
+        _log.info("RTDE pool: robot " + str(session.name) + " streaming")
+
+    def __watch_send(self, session):
+        # writable is only of interest while queued bytes are left
+        events = selectors.EVENT_READ
+        if session.connection.pending_send():
+            events |= selectors.EVENT_WRITE
+        if self.__selector.get_key(session.fd).events != events:
+            self.__selector.modify(session.fd, events, session)
+
+    def __flush(self, session):
+        try:
+            session.connection.flush()
+        except (RTDEException, socket.error) as e:
+            self.__fail(session, e)
+            return
+        self.__watch_send(session)
+
+    def __receive(self, session):
+        try:
+            states = session.connection.receive_ready()
+        except (RTDEException, socket.error, ValueError) as e:
+            self.__fail(session, e)
+            return
+        if not states:
+            return
+        session.last_receive = time.monotonic()
+        session.received_count += len(states)
+        session.latest_state = states[-1]
+        if session.on_state is not None:
+            for state in states:
+                session.on_state(session, state)
+
+    def __fail(self, session, error):
+        _log.warning(
+            "RTDE pool: robot "
+            + str(session.name)
+            + " failed: "
+            + str(error)
+            + ", retrying in %.1f s" % session.retry_delay
+        )
+        self.__close(session)
+        session.state = SessionState.WAITING
+        session.next_attempt = time.monotonic() + session.retry_delay
+        session.retry_delay = min(session.retry_delay * 2, self.max_retry_delay)
+
+    def __close(self, session):
+        if session.fd is not None:
+            self.__selector.unregister(session.fd)
+            session.fd = None
+        if session.sock is not None:
+            session.sock.close()
+            session.sock = None
+        if session.connection is not None:
+            session.connection.disconnect()
+            session.connection = None
+        session.state = SessionState.WAITING
@@ -0,0 +1,427 @@
+# Copyright (c) 2020-2022, Universal Robots A/S,
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the Universal Robots A/S nor the names of its
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL UNIVERSAL ROBOTS A/S BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import logging
+import os
+import selectors
+import socket
+import stat
+import struct
+import time
+
+from rtde import serialize
+from rtde.rtde import (
+    RTDE,
+    Command,
+    PacketBuffer,
+    RTDEException,
+    DEFAULT_TIMEOUT,
+    LOGNAME,
+    RTDE_PROTOCOL_VERSION_2,
+)
+
+_log = logging.getLogger(LOGNAME)
+
+DEFAULT_SOCKET_PATH = "/tmp/rtde_proxy.sock"
+DEFAULT_RETRY_DELAY = 0.1  # s, first reconnect attempt to the robot
+DEFAULT_MAX_RETRY_DELAY = 5.0  # s
+MAX_PENDING_BYTES = 1 << 16  # per client, data packages are dropped beyond
+
+
+def open_socket(path=DEFAULT_SOCKET_PATH):
+    """Returns a socket connected to an RTDEProxy, to be passed to RTDE.connect()"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        sock.close()
+        raise
+    return sock
+
+
+def _package(command, payload=b""):
+    return struct.pack(">HB", len(payload) + 3, command) + payload
+
+
+class _ProxyClient(object):
+    """A local client connection of the proxy"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buf = PacketBuffer(4 * MAX_PENDING_BYTES)
+        self.pending = bytearray()
+        self.output_packer = None
+        self.decimation = 1
+        self.cycle = 0
+        self.streaming = False
+        self.input_configs = {}  # client recipe id -> DataConfig
+        self.claims = set()  # claimed robot input field names
+        self.dropped_count = 0
+
+
+class RTDEProxy(object):
+    """Shares one RTDE connection to a robot between local clients.
+
+    The proxy speaks RTDE to its clients on a Unix socket, so a client is
+    a plain RTDE instance connected with RTDE.connect(open_socket(path)).
+    The robot side is set up once with the output recipe and the input
+    recipes given here; clients subscribe to any subset of the outputs,
+    at the robot frequency or a divisor of it, and claim input fields.
+    A field claimed by one client is reported as IN_USE to the others,
+    as the controller does. Inputs of all clients are merged into the
+    robot side input recipes, which are sent once all their fields have
+    a value. The robot connection is reestablished with a backoff while
+    clients stay connected, and the last inputs of the connected clients
+    are sent again. The inputs of a client are forgotten when it
+    disconnects, they are not restored on the robot without an owner.
+    """
+
+    def __init__(
+        self,
+        hostname,
+        output_names,
+        output_types,
+        frequency=125,
+        input_recipes=[],
+        port=30004,
+        path=DEFAULT_SOCKET_PATH,
+        timeout=DEFAULT_TIMEOUT,
+        retry_delay=DEFAULT_RETRY_DELAY,
+        max_retry_delay=DEFAULT_MAX_RETRY_DELAY,
+    ):
+        """input_recipes is a list of (names, types) tuples"""
+        self.hostname = hostname
+        self.port = port
+        self.path = path
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.frequency = frequency
+        self.output_names = list(output_names)
+        self.output_types = list(output_types)
+        self.input_recipes = list(input_recipes)
+        self.__output_types = dict(zip(output_names, output_types))
+        self.__input_types = {}
+        for names, types in self.input_recipes:
+            self.__input_types.update(zip(names, types))
+        self.__input_values = {}
+        self.__claims = {}  # robot input field name -> client
+        self.__robot = None
+        self.__robot_fd = None
+        self.__robot_inputs = []
+        self.__last_receive = 0.0
+        self.__controller_version = (0, 0, 0, 0)
+        self.__next_attempt = 0.0
+        self.__delay = retry_delay
+        self.__clients = {}
+        self.__selector = selectors.DefaultSelector()
+        self.__server = self.__listen(path)
+        self.__selector.register(self.__server, selectors.EVENT_READ, None)
+
+    def run(self, stop_event):
+        while not stop_event.is_set():
+            self.run_once()
+        self.close()
+
+    def run_once(self, max_wait=0.1):
+        """Connects the robot when due and handles all ready sockets once"""
+        now = time.monotonic()
+        wait = max_wait
+        if self.__robot is None:
+            if now >= self.__next_attempt:
+                self.__connect_robot()
+            else:
+                wait = min(wait, self.__next_attempt - now)
+        elif now - self.__last_receive > self.timeout:
+            self.__robot_failed(RTDEException("no data received within timeout"))
+
+        for key, events in self.__selector.select(max(wait, 0)):
+            if key.fileobj is self.__server:
+                self.__accept()
+            elif key.data is self:
+                self.__receive_robot()
+            else:
+                client = key.data
+                if events & selectors.EVENT_WRITE and client.sock in self.__clients:
+                    self.__flush(client)
+                if events & selectors.EVENT_READ and client.sock in self.__clients:
+                    self.__receive_client(client)
+
+    def close(self):
+        for client in list(self.__clients.values()):
+            self.__drop_client(client)
+        self.__close_robot()
+        self.__selector.close()
+        self.__server.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def is_robot_connected(self):
+        return self.__robot is not None
+
+    def client_count(self):
+        return len(self.__clients)
+
+    def dropped_count(self):
+        """Data packages dropped for clients that did not keep up"""
+        return sum(client.dropped_count for client in self.__clients.values())
+
+    def __listen(self, path):
+        # a socket file left by a proxy that did not exit cleanly
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen(16)
+        server.setblocking(False)
+        return server
+
+    def __connect_robot(self):
+        robot = RTDE(self.hostname, self.port, timeout=self.timeout)
+        try:
+            robot.connect()
+            version = robot.get_controller_version()
+            if version[0] is None:
+                raise RTDEException("No reply to the controller version request")
+            self.__controller_version = version
+            inputs = robot.send_setup(
+                self.output_names, self.output_types, self.frequency, self.input_recipes
+            )
+            if inputs is None:
+                raise RTDEException("Unable to set up the robot recipes")
+        except (RTDEException, socket.error) as e:
+            robot.disconnect()
+            self.__robot_failed(e)
+            return
+        self.__robot = robot
+        self.__robot_inputs = inputs
+        self.__delay = self.retry_delay
+        self.__last_receive = time.monotonic()
+        self.__robot_fd = robot.fileno()
+        self.__selector.register(self.__robot_fd, selectors.EVENT_READ, self)
+        _log.info("RTDE proxy: connected to " + self.hostname)
+        # restore the inputs the connected clients set before the reconnect
+        self.__send_inputs(set(self.__input_values).intersection(self.__claims))
+
+    def __robot_failed(self, error):
+        _log.warning(
+            "RTDE proxy: robot connection failed: "
+            + str(error)
+            + ", retrying in %.1f s" % self.__delay
+        )
+        self.__close_robot()
+        self.__next_attempt = time.monotonic() + self.__delay
+        self.__delay = min(self.__delay * 2, self.max_retry_delay)
+
+    def __close_robot(self):
+        if self.__robot is None:
+            return
+        # the descriptor is already closed if RTDE detected the disconnect
+        self.__selector.unregister(self.__robot_fd)
+        self.__robot_fd = None
+        self.__robot.disconnect()
+        self.__robot = None
+        self.__robot_inputs = []
+
+    def __receive_robot(self):
+        try:
+            states = self.__robot.receive_ready()
+        except (RTDEException, socket.error) as e:
+            self.__robot_failed(e)
+            return
+        if states:
+            self.__last_receive = time.monotonic()
+        for state in states:
+            for client in list(self.__clients.values()):
+                if not client.streaming:
+                    continue
+                client.cycle += 1
+                if client.cycle % client.decimation:
+                    continue
+                self.__send(client, client.output_packer.pack(state), data=True)
+
+    def __send_inputs(self, names):
+        """Sends the robot input recipes containing any of names"""
+        if self.__robot is None:
+            return
+        due = []
+        for (recipe_names, _), input_data in zip(self.input_recipes, self.__robot_inputs):
+            if names.isdisjoint(recipe_names):
+                continue
+            for name in recipe_names:
+                setattr(input_data, name, self.__input_values.get(name))
+            if any(getattr(input_data, name) is None for name in recipe_names):
+                _log.debug("RTDE proxy: input recipe not complete yet")
+                continue
+            due.append(input_data)
+        if due:
+            try:
+                self.__robot.send_many(due)
+            except (RTDEException, socket.error) as e:
+                self.__robot_failed(e)
+
+    def __accept(self):
+        try:
+            sock, _ = self.__server.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        client = _ProxyClient(sock)
+        self.__clients[sock] = client
+        self.__selector.register(sock, selectors.EVENT_READ, client)
+        _log.info("RTDE proxy: client connected, %d clients" % len(self.__clients))
+
+    def __drop_client(self, client):
+        if client.sock not in self.__clients:
+            return
+        for name in client.claims:
+            del self.__claims[name]
+            self.__input_values.pop(name, None)
+        self.__selector.unregister(client.sock)
+        del self.__clients[client.sock]
+        client.sock.close()
+        _log.info("RTDE proxy: client disconnected, %d clients" % len(self.__clients))
+
+    def __receive_client(self, client):
+        try:
+            received = client.buf.recv_into(client.sock)
+        except BlockingIOError:
+            return
+        except socket.error:
+            received = 0
+        if received == 0:
+            self.__drop_client(client)
+            return
+        header = client.buf.peek_header()
+        while header is not None and len(client.buf) >= header[0]:
+            size, command = header
+            if size < 3:
+                self.__drop_client(client)
+                return
+            self.__on_client_package(client, command, client.buf.pop(size))
+            header = client.buf.peek_header()
+
+    def __on_client_package(self, client, command, payload):
+        if command == Command.RTDE_DATA_PACKAGE:
+            config = client.input_configs.get(payload[0])
+            if config is None:
+                _log.warning("RTDE proxy: data for unknown input recipe")
+                return
+            data = config.unpack(payload)
+            for name in config.names:
+                self.__input_values[name] = getattr(data, name)
+            self.__send_inputs(set(config.names))
+            return
+
+        payload = bytes(payload)
+        if command == Command.RTDE_REQUEST_PROTOCOL_VERSION:
+            accepted = payload == struct.pack(">H", RTDE_PROTOCOL_VERSION_2)
+            reply = struct.pack(">B", accepted)
+        elif command == Command.RTDE_GET_URCONTROL_VERSION:
+            reply = struct.pack(">IIII", *self.__controller_version)
+        elif command == Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS:
+            reply = self.__setup_outputs(client, payload)
+        elif command == Command.RTDE_CONTROL_PACKAGE_SETUP_INPUTS:
+            reply = self.__setup_inputs(client, payload)
+        elif command == Command.RTDE_CONTROL_PACKAGE_START:
+            client.streaming = client.output_packer is not None
+            reply = struct.pack(">B", client.streaming)
+        elif command == Command.RTDE_CONTROL_PACKAGE_PAUSE:
+            client.streaming = False
+            reply = struct.pack(">B", True)
+        else:
+            _log.warning("RTDE proxy: unsupported client package: " + str(command))
+            return
+        self.__send(client, _package(command, reply))
+
+    def __setup_outputs(self, client, payload):
+        frequency = struct.unpack_from(">d", payload)[0]
+        names = payload[8:].decode("utf-8").split(",")
+        types = [self.__output_types.get(name, "NOT_FOUND") for name in names]
+        recipe_id = 0
+        if "NOT_FOUND" not in types:
+            recipe_id = 1
+            config = serialize.DataConfig.unpack_recipe(
+                struct.pack(">B", recipe_id) + ",".join(types).encode("utf-8")
+            )
+            config.names = names
+            client.output_packer = config.create_packer(Command.RTDE_DATA_PACKAGE)
+            client.decimation = max(1, int(round(self.frequency / frequency)))
+            client.cycle = 0
+        return struct.pack(">B", recipe_id) + ",".join(types).encode("utf-8")
+
+    def __setup_inputs(self, client, payload):
+        names = payload.decode("utf-8").split(",")
+        types = []
+        for name in names:
+            if name not in self.__input_types:
+                types.append("NOT_FOUND")
+            elif self.__claims.get(name, client) is not client:
+                types.append("IN_USE")
+            else:
+                types.append(self.__input_types[name])
+        recipe_id = 0
+        if "NOT_FOUND" not in types and "IN_USE" not in types:
+            recipe_id = len(client.input_configs) + 1
+            config = serialize.DataConfig.unpack_recipe(
+                struct.pack(">B", recipe_id) + ",".join(types).encode("utf-8")
+            )
+            config.names = names
+            client.input_configs[recipe_id] = config
+            for name in names:
+                self.__claims[name] = client
+                client.claims.add(name)
+        return struct.pack(">B", recipe_id) + ",".join(types).encode("utf-8")
+
+    def __send(self, client, package, data=False):
+        if client.pending:
+            if data and len(client.pending) > MAX_PENDING_BYTES:
+                client.dropped_count += 1
+                return
+            client.pending += package
+            return
+        try:
+            sent = client.sock.send(package)
+        except BlockingIOError:
+            sent = 0
+        except socket.error:
+            self.__drop_client(client)
+            return
+        if sent < len(package):
+            client.pending += package[sent:]
+            self.__selector.modify(
+                client.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, client
+            )
+
+    def __flush(self, client):
+        try:
+            sent = client.sock.send(client.pending)
+        except BlockingIOError:
+            return
+        except socket.error:
+            self.__drop_client(client)
+            return
+        del client.pending[:sent]
+        if not client.pending:
+            self.__selector.modify(client.sock, selectors.EVENT_READ, client)
@@ -0,0 +1,130 @@
+# Copyright (c) 2020-2022, Universal Robots A/S,
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the Universal Robots A/S nor the names of its
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL UNIVERSAL ROBOTS A/S BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import json
+import logging
+import os
+
+import numpy as np
+
+from . import csv_reader
+from .csv_binary_reader import record_dtype, runtime_state_running
+from .csv_binary_writer import HEADER, MAGIC
+from .rtde import LOGNAME
+from .segmented_writer import open_segment
+
+_log = logging.getLogger(LOGNAME)
+
+
+class SegmentedReader(object):
+    """Reads a recording written by segmented_writer.SegmentedWriter.
+
+    The segments listed in the manifest are read in order, compressed
+    segments are decompressed while reading. chunks() streams the whole
+    recording in constant memory, like csv_reader.read_chunks().
+    """
+
+    def __init__(self, manifest):
+        self.__directory = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest) as f:
+            content = json.load(f)
+        self.names = content["names"]
+        self.types = content["types"]
+        self.binary = content["binary"]
+        self.segments = content["segments"]
+
+    def get_samples(self):
+        """Rows in all segments, before filtering"""
+        return sum(s["rows"] for s in self.segments)
+
+    def open_segment(self, entry):
+        return open_segment(os.path.join(self.__directory, entry["file"]), self.binary)
+
+    def chunks(
+        self,
+        chunk_size=csv_reader.DEFAULT_CHUNK_SIZE,
+        filter_running_program=False,
+        columns=None,
+    ):
+        """Yields a dictionary from the column names, or only the given
+        columns, to numpy arrays per chunk of up to chunk_size rows. Vector
+        fields are split into name_0, name_1, ... columns."""
+        for entry in self.segments:
+            try:
+                segment = self.open_segment(entry)
+            except FileNotFoundError:
+                # removed to limit the disk use since the manifest was read
+                _log.warning("Segment " + entry["file"] + " no longer exists")
+                continue
+            with segment:
+                if self.binary:
+                    blocks = self.__binary_chunks(
+                        segment, entry["rows"], chunk_size, filter_running_program, columns
+                    )
+                else:
+                    blocks = csv_reader.read_chunks(
+                        segment,
+                        chunk_size,
+                        filter_running_program=filter_running_program,
+                        columns=columns,
+                    )
+                for block in blocks:
+                    yield block
+
+    def __binary_chunks(self, segment, rows, chunk_size, filter_running_program, columns):
+        magic, length = HEADER.unpack(segment.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("Not an RTDE binary recording: " + segment.name)
+        segment.read(length)
+        dtype = record_dtype(self.names, self.types)
+        filtering = filter_running_program and csv_reader.runtime_state in self.names
+        if filter_running_program and not filtering:
+            _log.warning(
+                "Unable to filter data since runtime_state field is missing in data set"
+            )
+        while rows > 0:
+            count = min(chunk_size, rows)
+            data = segment.read(count * dtype.itemsize)
+            count = len(data) // dtype.itemsize
+            if count == 0:
+                return
+            rows -= count
+            records = np.frombuffer(data, dtype, count)
+            if filtering:
+                records = records[
+                    records[csv_reader.runtime_state] == runtime_state_running
+                ]
+            if not len(records):
+                continue
+            block = {}
+            for name in self.names:
+                column = records[name]
+                if column.ndim > 1:
+                    for j in range(column.shape[1]):
+                        block[name + "_" + str(j)] = column[:, j]
+                else:
+                    block[name] = column
+            if columns is not None:
+                block = {c: block[c] for c in columns if c in block}
+            yield block
@@ -0,0 +1,289 @@
+# Copyright (c) 2020-2022, Universal Robots A/S,
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the Universal Robots A/S nor the names of its
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL UNIVERSAL ROBOTS A/S BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Recordings split into segment files.
+
+A SegmentedWriter writes a recording as a sequence of complete CSV or
+binary recordings, the segments, each with its own header. A segment is
+closed once it reaches segment_bytes or is segment_seconds old and is
+then compressed with zlib (gzip files) or lzma (xz files) on a
+background thread. The manifest, a JSON file next to the segments, lists
+the closed segments in order, see segmented_reader.SegmentedReader.
+"""
+
+import gzip
+import json
+import logging
+import lzma
+import os
+import queue
+import shutil
+import threading
+import time
+
+from rtde.rtde import LOGNAME
+from rtde import csv_binary_writer, csv_writer
+
+_log = logging.getLogger(LOGNAME)
+
+COMPRESSION_NONE = "none"
+COMPRESSION_ZLIB = "zlib"
+COMPRESSION_LZMA = "lzma"
+
+# file suffix and open() of the compressed segments
+_CODECS = {
+    COMPRESSION_ZLIB: (".gz", gzip.open),
+    COMPRESSION_LZMA: (".xz", lzma.open),
+}
+
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def manifest_path(path):
+    """The manifest of a segmented recording written to path"""
+    return os.path.splitext(path)[0] + MANIFEST_SUFFIX
+
+
+def open_segment(filename, binary):
+    """Opens a segment for reading, decompressing compressed segments"""
+    mode = "rb" if binary else "rt"
+    for suffix, codec_open in _CODECS.values():
+        if filename.endswith(suffix):
+            return codec_open(filename, mode)
+    return open(filename, mode)
+
+
+class _CountingFile(object):
+    """Counts the characters written to a text file, bytes for the ASCII
+    of a CSV recording, without asking the file system"""
+
+    __slots__ = ["file", "count"]
+
+    def __init__(self, file):
+        self.file = file
+        self.count = 0
+
+    def write(self, text):
+        self.count += len(text)
+        return self.file.write(text)
+
+
+class SegmentedWriter(object):
+    """Writes a recording to path as segments path-000000.ext, ...
+
+    Used like CSVWriter and CSVBinaryWriter, also from a QueuedWriter.
+    Closed segments are compressed on a background thread, the thread
+    calling writerow() only writes. With max_bytes the oldest segments
+    are deleted while the closed segments take more than max_bytes.
+    close() closes the last segment and waits for the compression.
+    """
+
+    def __init__(
+        self,
+        path,
+        names,
+        types,
+        binary=False,
+        segment_bytes=DEFAULT_SEGMENT_BYTES,
+        segment_seconds=None,
+        compression=COMPRESSION_ZLIB,
+        max_bytes=None,
+    ):
+        if compression != COMPRESSION_NONE and compression not in _CODECS:
+            raise ValueError("Unknown compression: " + str(compression))
+        self.__base, self.__suffix = os.path.splitext(path)
+        self.__directory = os.path.dirname(os.path.abspath(path))
+        self.__names = names
+        self.__types = types
+        self.__binary = binary
+        self.__segment_bytes = segment_bytes
+        self.__segment_seconds = segment_seconds
+        self.__compression = compression
+        self.__max_bytes = max_bytes
+        self.__manifest_path = manifest_path(path)
+        self.__manifest = {
+            "names": list(names),
+            "types": list(types),
+            "binary": binary,
+            "segments": [],
+        }
+        self.__lock = threading.Lock()  # the manifest
+        self.__number = 0
+        self.__file = None
+        self.__counting_file = None  # of a CSV segment
+        self.__writer = None
+        self.__entry = None
+        self.__opened = 0.0
+        self.__compress_queue = queue.Queue()
+        self.__compressor = threading.Thread(
+            target=self.__compress_loop, name="rtde-compressor"
+        )
+        self.__compressor.daemon = True
+        self.__compressor.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def writeheader(self):
+        # every segment gets its header when it is opened
+        self.__open_segment()
+
+    def writerow(self, row):
+        if self.__file is None:
+            self.__open_segment()
+        self.__writer.writerow(row)
+        self.__entry["rows"] += 1
+        self.__roll_if_due()
+
+    def writebatch(self, batch):
+        if self.__file is None:
+            self.__open_segment()
+        self.__writer.writebatch(batch)
+        self.__entry["rows"] += len(batch)
+        self.__roll_if_due()
+
+    def writefooter(self):
+        """Closes the current segment"""
+        self.__close_segment()
+
+    def close(self):
+        """Closes the current segment and waits for the compression"""
+        self.__close_segment()
+        self.__compress_queue.put(None)
+        self.__compressor.join()
+
+    def __segment_name(self):
+        return "%s-%06d%s" % (
+            os.path.basename(self.__base),
+            self.__number,
+            self.__suffix,
+        )
+
+    def __open_segment(self):
+        name = self.__segment_name()
+        self.__number += 1
+        self.__file = open(
+            os.path.join(self.__directory, name), "wb" if self.__binary else "w"
+        )
+        if self.__binary:
+            self.__writer = csv_binary_writer.CSVBinaryWriter(
+                self.__file, self.__names, self.__types
+            )
+        else:
+            self.__counting_file = _CountingFile(self.__file)
+            self.__writer = csv_writer.CSVWriter(
+                self.__counting_file, self.__names, self.__types
+            )
+        self.__writer.writeheader()
+        self.__entry = {"file": name, "rows": 0, "started": time.time()}
+        self.__opened = time.monotonic()
+
+    def __roll_if_due(self):
+        # the bytes written so far, including those still in the buffer of
+        # the file, tell() of a binary file does not need a system call
+        if self.__binary:
+            size = self.__file.tell()
+        else:
+            size = self.__counting_file.count
+        if size >= self.__segment_bytes or (
+            self.__segment_seconds is not None
+            and time.monotonic() - self.__opened >= self.__segment_seconds
+        ):
+            self.__close_segment()
+
+    def __close_segment(self):
+        if self.__file is None:
+            return
+        if self.__binary:
+            self.__writer.writefooter()
+        self.__file.close()
+        self.__file = None
+        self.__counting_file = None
+        self.__writer = None
+        entry, self.__entry = self.__entry, None
+        entry["bytes"] = os.path.getsize(os.path.join(self.__directory, entry["file"]))
+        with self.__lock:
+            self.__manifest["segments"].append(entry)
+            self.__write_manifest()
+        if self.__compression != COMPRESSION_NONE:
+            self.__compress_queue.put(entry)
+        else:
+            self.__limit_size()
+
+    def __compress_loop(self):
+        while True:
+            entry = self.__compress_queue.get()
+            if entry is None:
+                return
+            try:
+                self.__compress(entry)
+            except (OSError, lzma.LZMAError) as e:
+                _log.error("Unable to compress segment " + entry["file"] + ": " + str(e))
+            self.__limit_size()
+
+    def __compress(self, entry):
+        suffix, codec_open = _CODECS[self.__compression]
+        source = os.path.join(self.__directory, entry["file"])
+        target = source + suffix
+        with open(source, "rb") as src, codec_open(target, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        with self.__lock:
+            entry["file"] = os.path.basename(target)
+            entry["bytes"] = os.path.getsize(target)
+            self.__write_manifest()
+        os.remove(source)
+
+    def __limit_size(self):
+        if self.__max_bytes is None:
+            return
+        with self.__lock:
+            segments = self.__manifest["segments"]
+            removed = []
+            # a segment that is still being compressed is never removed
+            while (
+                len(segments) > 1
+                and sum(s["bytes"] for s in segments) > self.__max_bytes
+                and segments[0]["file"].endswith(self.__compressed_suffix())
+            ):
+                removed.append(segments.pop(0))
+            if removed:
+                self.__write_manifest()
+        for entry in removed:
+            _log.info("Removing segment " + entry["file"] + " to limit the disk use")
+            os.remove(os.path.join(self.__directory, entry["file"]))
+
+    def __compressed_suffix(self):
+        if self.__compression == COMPRESSION_NONE:
+            return self.__suffix
+        return _CODECS[self.__compression][0]
+
+    def __write_manifest(self):
+        """Replaces the manifest atomically, called with the lock held"""
+        temporary = self.__manifest_path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.__manifest, f, indent=1)
+        os.replace(temporary, self.__manifest_path)
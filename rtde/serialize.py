@@ -21,7 +21,21 @@
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import array
+import keyword
+import re
 import struct
+import sys
+
+try:
+    import numpy
+except ImportError:  # only needed for VECTOR_NUMPY
+    numpy = None
+
+# How DataConfig decodes vector fields
+VECTOR_LIST = "list"  # a list of Python numbers
+VECTOR_ARRAY = "array"  # an array.array, no object per element
+VECTOR_NUMPY = "numpy"  # a read-only numpy view of the payload
 
 
 class ControlHeader(object):
@@ -161,46 +175,445 @@ class DataObject(object):
         return obj
 
 
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*\Z")
+
+# numpy types of the field formats, array.array uses the formats
+_NUMPY_TYPES = {"d": "f8", "i": "i4", "I": "u4", "Q": "u8", "B": "u1", "?": "?"}
+_HEADER_SIZE = struct.calcsize(">HB")
+_SWAP = sys.byteorder == "little"  # RTDE is big endian
+
+# parsed and compiled recipes, shared by all connections so that a
+# reconnect with the same recipe does not parse or compile it again
+_recipe_formats = {}  # types payload -> (types, fmt, Struct)
+_compiled_recipes = {}  # (names, types, fields, lazy, vectors) -> compiled
+
+
+def _check_vectors(vectors):
+    if vectors not in (VECTOR_LIST, VECTOR_ARRAY, VECTOR_NUMPY):
+        raise ValueError("Unknown vector decoding: " + str(vectors))
+    if vectors == VECTOR_NUMPY and numpy is None:
+        raise ImportError("numpy is required to decode vectors as numpy arrays")
+
+
+def _vector_reader(codes, vectors):
+    """Returns read(payload, offset) for a vector field of the given formats"""
+    size = struct.calcsize(">" + codes)
+    if vectors == VECTOR_ARRAY:
+        code = codes[0]
+
+        def read(payload, offset):
+            value = array.array(code)
+            value.frombytes(payload[offset : offset + size])
+            if _SWAP:
+                value.byteswap()
+            return value
+
+    elif vectors == VECTOR_NUMPY:
+        dtype = numpy.dtype(">" + _NUMPY_TYPES[codes[0]])
+
+        def read(payload, offset):
+            return numpy.frombuffer(payload, dtype, len(codes), offset)
+
+    else:
+        unpack_from = struct.Struct(">" + codes).unpack_from
+
+        def read(payload, offset):
+            return list(unpack_from(payload, offset))
+
+    return read
+
+
+def _field_layout(names, types, fmt, fields):
+    """(name, data_type, codes, offset, decoded) of every field of a recipe,
+    offset in bytes from the start of the payload, decoded False for the
+    fields left out by the fields projection."""
+    if len(names) != len(types) or len(set(names)) != len(names):
+        return None
+    for name in names:
+        if not _IDENTIFIER.match(name) or keyword.iskeyword(name) or name == "recipe_id":
+            return None
+    if fields is not None:
+        unknown = set(fields) - set(names)
+        if unknown:
+            raise ValueError("Unknown output fields: " + ", ".join(sorted(unknown)))
+    layout = []
+    position = 2  # fmt is ">B" followed by the field formats
+    offset = 1
+    for name, data_type in zip(names, types):
+        size = get_item_size(data_type)
+        codes = fmt[position : position + size]
+        decoded = fields is None or name in fields
+        layout.append((name, data_type, codes, offset, decoded))
+        position += size
+        offset += struct.calcsize(">" + codes)
+    return layout
+
+
+def compile_record_class(names, types, fmt, fields=None, vectors=VECTOR_LIST):
+    """Generates the record class of a recipe.
+
+    The class has __slots__ for recipe_id and the field names, or only the
+    names in fields if given. Returns (record_class, unpack, flatten):
+    unpack(data) decodes a data package payload with a precompiled
+    struct.Struct into a record, skipping the fields not in fields, with
+    vector fields decoded as selected by vectors. flatten(obj) returns the
+    field values of any object with the recipe attributes, vectors
+    expanded and without the recipe id. The code is generated once per
+    recipe, so decoding does not dispatch on the field types. Returns None
+    if the names are not usable as attribute names.
+    """
+    layout = _field_layout(names, types, fmt, fields)
+    if layout is None:
+        return None
+
+    record_fmt = ">B"
+    unpack_lines = ["def unpack(data):"]
+    if vectors == VECTOR_NUMPY:
+        # the numpy views need a payload that is not reused
+        unpack_lines.append("    data = bytes(data)")
+    unpack_lines += ["    v = unpack_from(data)", "    o = new(Record)"]
+    unpack_lines.append("    o.recipe_id = v[0]")
+    flatten_lines = ["def flatten(o):"]
+    flat = []
+    index = 1
+    for i, (name, data_type, codes, offset, decoded) in enumerate(layout):
+        size = len(codes)
+        nbytes = struct.calcsize(">" + codes)
+        if decoded and size > 1 and vectors == VECTOR_ARRAY:
+            record_fmt += "%dx" % nbytes
+            unpack_lines.append(
+                "    o.%s = a = array(%r); a.frombytes(data[%d:%d])%s"
+                % (name, codes[0], offset, offset + nbytes, "; a.byteswap()" if _SWAP else "")
+            )
+        elif decoded and size > 1 and vectors == VECTOR_NUMPY:
+            record_fmt += "%dx" % nbytes
+            unpack_lines.append(
+                "    o.%s = frombuffer(data, dtype_%s, %d, %d)" % (name, codes[0], size, offset)
+            )
+        elif decoded:
+            record_fmt += codes
+            if size > 1:
+                items = ", ".join("v[%d]" % (index + j) for j in range(size))
+                unpack_lines.append("    o.%s = [%s]" % (name, items))
+            else:
+                unpack_lines.append("    o.%s = v[%d]" % (name, index))
+            index += size
+        else:
+            # pad bytes, struct skips them without creating values
+            record_fmt += "%dx" % nbytes
+        if size > 1:
+            flatten_lines.append("    f%d = o.%s" % (i, name))
+            flat.extend("f%d[%d]" % (i, j) for j in range(size))
+        else:
+            flat.append("o." + name)
+            if data_type == "BOOL":
+                # struct packs None as False, an unset flag must not be sent
+                flatten_lines.append("    if o.%s is None: raise TypeError(%r)" % (name, name))
+    unpack_lines.append("    return o")
+    flatten_lines.append("    return [%s]" % ", ".join(flat))
+
+    def pack(self, names=None, types=None):
+        """The values of the record in the order of the recipe, compatible with DataObject.pack"""
+        values = flatten(self)
+        if self.recipe_id is not None:
+            values.insert(0, self.recipe_id)
+        return values
+
+    slots = ["recipe_id"] + [field[0] for field in layout if field[4]]
+    record_class = type("DataRecord", (object,), {"__slots__": slots, "pack": pack})
+    namespace = {
+        "unpack_from": struct.Struct(record_fmt).unpack_from,
+        "new": object.__new__,
+        "Record": record_class,
+        "array": array.array,
+    }
+    if vectors == VECTOR_NUMPY:
+        namespace["frombuffer"] = numpy.frombuffer
+        for code in "diI":
+            namespace["dtype_" + code] = numpy.dtype(">" + _NUMPY_TYPES[code])
+    exec("\n".join(unpack_lines + flatten_lines), namespace)
+    flatten = namespace["flatten"]
+    return record_class, namespace["unpack"], flatten
+
+
+class _LazyField(object):
+    """Decodes one field of a LazyDataRecord on first access.
+
+    The value is stored in the instance __dict__, which takes precedence
+    over this non-data descriptor on all following accesses.
+    """
+
+    __slots__ = ["name", "read", "offset"]
+
+    def __init__(self, name, codes, offset, vectors):
+        self.name = name
+        self.offset = offset
+        if len(codes) > 1:
+            self.read = _vector_reader(codes, vectors)
+        else:
+            unpack_from = struct.Struct(">" + codes).unpack_from
+            self.read = lambda payload, offset: unpack_from(payload, offset)[0]
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+        value = self.read(obj._payload, self.offset)
+        obj.__dict__[self.name] = value
+        return value
+
+
+class LazyDataRecord(object):
+    """Base of the lazy record classes, holds a copy of the payload"""
+
+    __slots__ = ["recipe_id", "_payload", "__dict__"]
+
+
+def compile_lazy_record_class(names, types, fmt, fields=None, vectors=VECTOR_LIST):
+    """Generates a record class that decodes a field on first access.
+
+    Returns (record_class, unpack). unpack(data) only copies the payload,
+    payloads of the receive buffer are reused, every field is unpacked by
+    a precompiled struct.Struct at its offset when it is first read. The
+    fields not in fields are not available. Returns None if the names are
+    not usable as attribute names.
+    """
+    layout = _field_layout(names, types, fmt, fields)
+    if layout is None:
+        return None
+    compiled = compile_record_class(names, types, fmt)
+    attributes = {"__slots__": [], "pack": compiled[0].pack}
+    for name, _, codes, offset, decoded in layout:
+        if decoded:
+            attributes[name] = _LazyField(name, codes, offset, vectors)
+    record_class = type("LazyDataRecord", (LazyDataRecord,), attributes)
+
+    def unpack(data, new=object.__new__):
+        o = new(record_class)
+        o._payload = payload = bytes(data)
+        o.recipe_id = payload[0]
+        return o
+
+    return record_class, unpack
+
+
+def uninitialized_error(state, names):
+    """The ValueError for the first field of state that was never set"""
+    for name in names:
+        if getattr(state, name, None) is None:
+            return ValueError("Uninitialized parameter: " + name)
+    return ValueError("Invalid parameter value")
+
+
+def _parse_types(types):
+    """(types, fmt, Struct) of the types of a recipe"""
+    fmt = ">B"
+    for i in types:
+        if i == "INT32":
+            fmt += "i"
+        elif i == "UINT32":
+            fmt += "I"
+        elif i == "VECTOR6D":
+            fmt += "d" * 6
+        elif i == "VECTOR3D":
+            fmt += "d" * 3
+        elif i == "VECTOR6INT32":
+            fmt += "i" * 6
+        elif i == "VECTOR6UINT32":
+            fmt += "I" * 6
+        elif i == "DOUBLE":
+            fmt += "d"
+        elif i == "UINT64":
+            fmt += "Q"
+        elif i == "UINT8":
+            fmt += "B"
+        elif i == "BOOL":
+            fmt += "?"
+        elif i == "IN_USE":
+            raise ValueError("An input parameter is already in use.")
+        else:
+            raise ValueError("Unknown data type: " + i)
+    return tuple(types), fmt, struct.Struct(fmt)
+
+
 class DataConfig(object):
-    __slots__ = ["id", "names", "types", "fmt"]
+    __slots__ = [
+        "id",
+        "types",
+        "fmt",
+        "record_class",
+        "__names",
+        "__struct",
+        "__unpack",
+        "__flatten",
+        "__fields",
+        "__lazy",
+        "__vectors",
+        "__dtypes",
+    ]
 
     @staticmethod
     def unpack_recipe(buf):
         rmd = DataConfig()
+        rmd.__names = None
+        rmd.__fields = None
+        rmd.__lazy = False
+        rmd.__vectors = VECTOR_LIST
+        rmd.__dtypes = {}
+        rmd.record_class = None
+        rmd.__unpack = None
+        rmd.__flatten = None
         rmd.id = struct.unpack_from(">B", buf)[0]
-        rmd.types = buf.decode("utf-8")[1:].split(",")
-        rmd.fmt = ">B"
-        for i in rmd.types:
-            if i == "INT32":
-                rmd.fmt += "i"
-            elif i == "UINT32":
-                rmd.fmt += "I"
-            elif i == "VECTOR6D":
-                rmd.fmt += "d" * 6
-            elif i == "VECTOR3D":
-                rmd.fmt += "d" * 3
-            elif i == "VECTOR6INT32":
-                rmd.fmt += "i" * 6
-            elif i == "VECTOR6UINT32":
-                rmd.fmt += "I" * 6
-            elif i == "DOUBLE":
-                rmd.fmt += "d"
-            elif i == "UINT64":
-                rmd.fmt += "Q"
-            elif i == "UINT8":
-                rmd.fmt += "B"
-            elif i == "BOOL":
-                rmd.fmt += "?"
-            elif i == "IN_USE":
-                raise ValueError("An input parameter is already in use.")
-            else:
-                raise ValueError("Unknown data type: " + i)
+        key = bytes(buf[1:])
+        parsed = _recipe_formats.get(key)
+        if parsed is None:
+            parsed = _parse_types(key.decode("utf-8").split(","))
+            _recipe_formats[key] = parsed
+        types, rmd.fmt, rmd.__struct = parsed
+        rmd.types = list(types)
         return rmd
 
+    @property
+    def names(self):
+        return self.__names
+
+    @names.setter
+    def names(self, names):
+        # the recipe is complete once the names are known, compile it
+        self.__names = names
+        self.__dtypes = {}
+        self.__compile()
+
+    def set_decoding(self, fields=None, lazy=False, vectors=VECTOR_LIST):
+        """Selects what unpack() returns: with fields only these fields are
+        decoded and available on the records, with lazy the records decode
+        a field on first access. vectors selects the type of the vector
+        fields, VECTOR_LIST, VECTOR_ARRAY or VECTOR_NUMPY."""
+        _check_vectors(vectors)
+        self.__fields = None if fields is None else frozenset(fields)
+        self.__lazy = lazy
+        self.__vectors = vectors
+        if self.__names is not None:
+            self.__compile()
+
+    def __compile(self):
+        key = (
+            tuple(self.__names),
+            tuple(self.types),
+            self.__fields,
+            self.__lazy,
+            self.__vectors,
+        )
+        compiled = _compiled_recipes.get(key)
+        if compiled is None:
+            compiled = self.__compile_record_class()
+            _compiled_recipes[key] = compiled
+        self.record_class, self.__unpack, self.__flatten = compiled
+
+    def __compile_record_class(self):
+        compiled = compile_record_class(
+            self.__names, self.types, self.fmt, self.__fields, self.__vectors
+        )
+        if compiled is None:
+            return None, None, None
+        if self.__lazy:
+            record_class, unpack = compile_lazy_record_class(
+                self.__names, self.types, self.fmt, self.__fields, self.__vectors
+            )
+            return record_class, unpack, compiled[2]
+        return compiled
+
+    def flatten(self, state):
+        """The field values of state, vectors expanded, without recipe id"""
+        if self.__flatten is None:
+            return state.pack(self.names, self.types)[state.recipe_id is not None :]
+        return self.__flatten(state)
+
     def pack(self, state):
-        l = state.pack(self.names, self.types)
-        return struct.pack(self.fmt, *l)
+        if self.__flatten is None:
+            l = state.pack(self.names, self.types)
+            return struct.pack(self.fmt, *l)
+        try:
+            return self.__struct.pack(state.recipe_id, *self.__flatten(state))
+        except (TypeError, struct.error):
+            raise uninitialized_error(state, self.names)
+
+    def create_packer(self, command):
+        return InputPacker(self, command)
+
+    def dtype(self, header_size=0):
+        """The numpy structured dtype of the recipe in the big endian layout
+        of the payload: a recipe_id column and a column per field, vector
+        fields as subarray columns. With header_size the fields start after
+        that many bytes, to view complete packages."""
+        dtype = self.__dtypes.get(header_size)
+        if dtype is not None:
+            return dtype
+        if numpy is None:
+            raise ImportError("numpy is required for structured arrays")
+        names = ["recipe_id"]
+        formats = ["u1"]
+        offsets = [header_size]
+        offset = header_size + 1
+        position = 2  # fmt is ">B" followed by the field formats
+        for name, data_type in zip(self.names, self.types):
+            size = get_item_size(data_type)
+            code = self.fmt[position]
+            fmt = ">" + _NUMPY_TYPES[code]
+            names.append(name)
+            formats.append(fmt if size == 1 else (fmt, (size,)))
+            offsets.append(offset)
+            position += size
+            offset += size * struct.calcsize(">" + code)
+        dtype = numpy.dtype(
+            {"names": names, "formats": formats, "offsets": offsets, "itemsize": offset}
+        )
+        self.__dtypes[header_size] = dtype
+        return dtype
+
+    def unpack_packages(self, data, command):
+        """Decodes the run of complete packages of this recipe at the start of
+        data, a byte stream of packages with their headers, into a numpy
+        structured array with dtype(header size), one row per package. The
+        run ends at the first package that is not a command package of the
+        recipe size. The rows are a copy, data can be reused."""
+        packed = self.dtype(_HEADER_SIZE)
+        count = len(data) // packed.itemsize
+        # the first word of every package: size, command and recipe id
+        if count:
+            words = numpy.ndarray((count,), ">u4", data, 0, (packed.itemsize,))
+            valid = (words >> 8) == (packed.itemsize << 8 | command)
+            end = int(valid.argmin())
+            if not valid[end]:
+                count = end
+        return numpy.frombuffer(bytearray(data[: count * packed.itemsize]), packed, count)
 
     def unpack(self, data):
+        if self.__unpack is not None:
+            return self.__unpack(data)
         li = struct.unpack_from(self.fmt, data)
         return DataObject.unpack(li, self.names, self.types)
+
+
+class InputPacker(object):
+    """Packs an input recipe into a preallocated data package.
+
+    The package header and the recipe id are written once, pack() only
+    writes the field values and returns the same bytearray every time.
+    """
+
+    __slots__ = ["buffer", "__config", "__values"]
+
+    def __init__(self, config, command):
+        # config.fmt is ">B" followed by the field formats
+        self.__values = struct.Struct(">" + config.fmt[2:])
+        self.__config = config
+        size = 4 + self.__values.size
+        self.buffer = bytearray(size)
+        struct.pack_into(">HBB", self.buffer, 0, size, command, config.id)
+
+    def pack(self, state):
+        try:
+            self.__values.pack_into(self.buffer, 4, *self.__config.flatten(state))
+        except (TypeError, struct.error):
+            raise uninitialized_error(state, self.__config.names)
+        return self.buffer
@@ -0,0 +1,155 @@
+# Copyright (c) 2020-2022, Universal Robots A/S,
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the Universal Robots A/S nor the names of its
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL UNIVERSAL ROBOTS A/S BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+
+class Histogram(object):
+    """Log-linear histogram of non-negative integers, in the style of HdrHistogram.
+
+    Values below 2**sub_bucket_bits are counted exactly, larger values in
+    buckets of a relative width of at most 2**-(sub_bucket_bits - 1).
+    Values above highest_value are counted as highest_value. Recording is
+    a few integer operations and memory use is fixed.
+    """
+
+    def __init__(self, highest_value=60 * 1000 * 1000, sub_bucket_bits=7):
+        self.highest_value = highest_value
+        self.__sub_bits = sub_bucket_bits
+        self.__half = 1 << (sub_bucket_bits - 1)
+        self.__counts = [0] * (self.__index(highest_value) + 1)
+        self.reset()
+
+    def reset(self):
+        for i in range(len(self.__counts)):
+            self.__counts[i] = 0
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        value = min(max(int(value), 0), self.highest_value)
+        self.__counts[self.__index(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def mean(self):
+        return float(self.total) / self.count if self.count else None
+
+    def percentile(self, percent):
+        """Returns the highest value of the bucket holding the given percentile"""
+        if self.count == 0:
+            return None
+        rank = max(1, int(round(self.count * percent / 100.0)))
+        seen = 0
+        for index, count in enumerate(self.__counts):
+            seen += count
+            if seen >= rank:
+                return min(self.__highest_in(index), self.max)
+        return self.max
+
+    def summary(self):
+        """count, mean, min, percentiles 50 to 99.9 and max as a dict"""
+        return {
+            "count": self.count,
+            "mean": self.mean(),
+            "min": self.min,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "p99.9": self.percentile(99.9),
+            "max": self.max,
+        }
+
+    def __index(self, value):
+        # bucket 0 holds the values below 2**sub_bucket_bits one by one, every
+        # further bucket covers twice the range with half of the slots
+        bucket = max(0, value.bit_length() - self.__sub_bits)
+        return bucket * self.__half + (value >> bucket)
+
+    def __highest_in(self, index):
+        if index < 2 * self.__half:
+            return index
+        bucket = index // self.__half - 1
+        return ((index - bucket * self.__half + 1) << bucket) - 1
+
+
+class ReceiveTiming(object):
+    """Timing of the data packages received by an RTDE connection.
+
+    Histograms in microseconds:
+        inter_arrival: between the receive times of consecutive data packages
+        jitter: deviation of inter_arrival from the output period
+        parse_time: decoding of a package handed to the caller
+        consumer_lag: from receiving a package to handing it to the caller
+    The histograms cover the running window of window seconds, at its end
+    they are moved to previous and a new window starts.
+    """
+
+    NAMES = ("inter_arrival", "jitter", "parse_time", "consumer_lag")
+
+    def __init__(self, window=10.0):
+        self.window = window
+        self.period = None  # s, set from the output frequency
+        self.histograms = dict((name, Histogram()) for name in self.NAMES)
+        self.previous = None
+        self.__window_start = None
+        self.__last_timestamp = None
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+        self.previous = None
+        self.__window_start = None
+        self.__last_timestamp = None
+
+    def on_package(self, timestamp):
+        """Records the receive time of a data package, returned or skipped"""
+        if self.__window_start is None:
+            self.__window_start = timestamp
+        elif timestamp - self.__window_start >= self.window:
+            self.previous = self.histograms
+            self.histograms = dict((name, Histogram()) for name in self.NAMES)
+            self.__window_start = timestamp
+        if self.__last_timestamp is not None:
+            interval = timestamp - self.__last_timestamp
+            self.histograms["inter_arrival"].record(interval * 1e6)
+            if self.period:
+                self.histograms["jitter"].record(abs(interval - self.period) * 1e6)
+        self.__last_timestamp = timestamp
+
+    def on_returned(self, parse_time, lag):
+        """Records the decode time and the lag of a package handed to the caller"""
+        self.histograms["parse_time"].record(parse_time * 1e6)
+        self.histograms["consumer_lag"].record(lag * 1e6)
+
+    def summary(self, previous=False):
+        """Summaries of the running window, or of the last complete one"""
+        histograms = self.previous if previous else self.histograms
+        if histograms is None:
+            return None
+        return dict((name, h.summary()) for name, h in histograms.items())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""Benchmark of data package decoding.
+
+Decodes data packages for the recipe in record_configuration.xml with the
+generic DataObject.unpack, which dispatches on the type of every field,
+with the record class DataConfig compiles for the recipe, with vector
+fields as array.array or numpy arrays, with lazy records and with a
+projection to a few fields, and reports the time per package, including
+reading the --read fields, and the memory and allocated blocks per
+decoded object.
+"""
+
+import argparse
+import struct
+import sys
+import time
+import tracemalloc
+
+sys.path.append("..")
+import rtde.rtde_config as rtde_config
+import rtde.serialize as serialize
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--config",
+    default="record_configuration.xml",
+    help="data configuration file to use (record_configuration.xml)",
+)
+parser.add_argument(
+    "--packages", type=int, default=100000, help="number of packages per run (100000)"
+)
+parser.add_argument(
+    "--objects",
+    type=int,
+    default=10000,
+    help="objects kept alive to measure memory (10000)",
+)
+parser.add_argument(
+    "--read",
+    nargs="*",
+    default=["timestamp", "actual_TCP_speed"],
+    help="fields read from every state, also the projection (timestamp actual_TCP_speed)",
+)
+args = parser.parse_args()
+
+
+def legacy_unpack(config, payload):
+    values = struct.unpack_from(config.fmt, payload)
+    return serialize.DataObject.unpack(values, config.names, config.types)
+
+
+def time_per_package(unpack, config, payload):
+    start = time.perf_counter()
+    for _ in range(args.packages):
+        state = unpack(config, payload)
+        for name in args.read:
+            getattr(state, name)
+    return (time.perf_counter() - start) / args.packages * 1e6
+
+
+def memory_per_object(unpack, config, payload):
+    """Bytes and allocated memory blocks per decoded object"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [unpack(config, payload) for _ in range(args.objects)]
+    stats = tracemalloc.take_snapshot().compare_to(before, "filename")
+    tracemalloc.stop()
+    used = sum(stat.size_diff for stat in stats)
+    blocks = sum(stat.count_diff for stat in stats)
+    # the list holding the objects is not part of an object
+    used -= sys.getsizeof(objects)
+    return used / float(len(objects)), blocks / float(len(objects))
+
+
+def make_config(fields=None, lazy=False, vectors=serialize.VECTOR_LIST):
+    config = serialize.DataConfig.unpack_recipe(
+        b"\x01" + ",".join(output_types).encode("utf-8")
+    )
+    config.set_decoding(fields, lazy, vectors)
+    config.names = output_names
+    return config
+
+
+conf = rtde_config.ConfigFile(args.config)
+output_names, output_types = conf.get_recipe("out")
+config = make_config()
+if config.record_class is None:
+    sys.exit("The recipe can not be compiled to a record class")
+
+values = [1]
+for data_type in output_types:
+    values.extend([1] * serialize.get_item_size(data_type))
+payload = memoryview(struct.pack(config.fmt, *values))
+
+print(
+    "%d fields, %d values, payload %d bytes, reading %s"
+    % (len(output_names), len(values) - 1, len(payload), " ".join(args.read))
+)
+decoders = [
+    ("DataObject.unpack", legacy_unpack, config),
+    ("compiled record", serialize.DataConfig.unpack, config),
+    ("array vectors", serialize.DataConfig.unpack, make_config(vectors=serialize.VECTOR_ARRAY)),
+]
+if serialize.numpy is not None:
+    decoders.append(
+        ("numpy vectors", serialize.DataConfig.unpack, make_config(vectors=serialize.VECTOR_NUMPY))
+    )
+decoders += [
+    ("lazy record", serialize.DataConfig.unpack, make_config(lazy=True)),
+    ("projected record", serialize.DataConfig.unpack, make_config(args.read)),
+]
+
+print(
+    "%-20s %14s %16s %16s"
+    % ("decoder", "decode [us]", "object [bytes]", "object [blocks]")
+)
+for name, unpack, run_config in decoders:
+    decode_us = time_per_package(unpack, run_config, payload)
+    print(
+        "%-20s %14.2f %16.0f %16.1f"
+        % ((name, decode_us) + memory_per_object(unpack, run_config, payload))
+    )
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+"""Benchmark of rtde.rtde_pool.RTDEPool against one thread per robot.
+
+Starts fake_controller.py in a subprocess with one simulated controller
+per robot, streams the "out" recipe of recipe.xml from all of them and
+reports the packages received and the CPU time this process spent, once
+for a single RTDEPool loop and once for one RTDE instance and thread per
+robot.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.append("..")
+import rtde.rtde as rtde
+import rtde.rtde_config as rtde_config
+import rtde.rtde_pool as rtde_pool
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--robots", type=int, default=24, help="number of robots (24)")
+parser.add_argument(
+    "--frequency", type=int, default=125, help="the sampling frequency in Herz (125)"
+)
+parser.add_argument(
+    "--duration", type=float, default=5.0, help="seconds per measurement (5)"
+)
+parser.add_argument(
+    "--port", type=int, default=31004, help="first fake controller port (31004)"
+)
+parser.add_argument(
+    "--config",
+    default=os.path.join("..", "recipe.xml"),
+    help="data configuration file to use (../recipe.xml)",
+)
+args = parser.parse_args()
+
+conf = rtde_config.ConfigFile(args.config)
+output_names, output_types = conf.get_recipe("out")
+
+
+def run_pool():
+    pool = rtde_pool.RTDEPool()
+    for i in range(args.robots):
+        pool.add_robot(
+            i, "127.0.0.1", output_names, output_types, args.frequency, args.port + i
+        )
+    # connect all robots before measuring
+    while not all(s.is_streaming() for s in pool.sessions()):
+        pool.run_once()
+    start_cpu = time.process_time()
+    start = time.monotonic()
+    while time.monotonic() - start < args.duration:
+        pool.run_once()
+    cpu = time.process_time() - start_cpu
+    received = sum(s.received_count for s in pool.sessions())
+    pool.close()
+    return received, cpu
+
+
+def run_threads():
+    connections = []
+    for i in range(args.robots):
+        con = rtde.RTDE("127.0.0.1", args.port + i)
+        con.connect()
+        con.send_output_setup(output_names, output_types, args.frequency)
+        con.send_start()
+        connections.append(con)
+    counts = [0] * args.robots
+    stop = threading.Event()
+
+    def receive(i, con):
+        while not stop.is_set():
+            if con.receive() is not None:
+                counts[i] += 1
+
+    threads = [
+        threading.Thread(target=receive, args=(i, con))
+        for i, con in enumerate(connections)
+    ]
+    start_cpu = time.process_time()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    cpu = time.process_time() - start_cpu
+    for con in connections:
+        con.send_pause()
+        con.disconnect()
+    return sum(counts), cpu
+
+
+controllers = subprocess.Popen(
+    [
+        sys.executable,
+        "fake_controller.py",
+        "--port",
+        str(args.port),
+        "--count",
+        str(args.robots),
+    ],
+    stdout=subprocess.PIPE,
+    text=True,
+)
+try:
+    for i in range(args.robots):
+        controllers.stdout.readline()
+
+    expected = args.robots * args.frequency * args.duration
+    print(
+        "%d robots at %d Hz, %.0f packages expected per run"
+        % (args.robots, args.frequency, expected)
+    )
+    print("%-20s %10s %10s %14s" % ("client", "packages", "cpu [s]", "cpu/pkg [us]"))
+    for name, run in (("RTDEPool", run_pool), ("thread per robot", run_threads)):
+        received, cpu = run()
+        print(
+            "%-20s %10d %10.2f %14.1f"
+            % (name, received, cpu, cpu / max(received, 1) * 1e6)
+        )
+finally:
+    controllers.terminate()
+    controllers.wait()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""Benchmark of the RTDE receive buffer.
+
+Feeds a backlog of data packages for the recipe in record_configuration.xml
+through the old "bytes concatenation" buffering scheme and through
+rtde.PacketBuffer and reports bytes copied and time spent per package.
+"""
+
+import argparse
+import io
+import struct
+import sys
+import time
+
+sys.path.append("..")
+import rtde.rtde as rtde
+import rtde.rtde_config as rtde_config
+import rtde.serialize as serialize
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--config",
+    default="record_configuration.xml",
+    help="data configuration file to use (record_configuration.xml)",
+)
+parser.add_argument(
+    "--packages", type=int, default=20000, help="number of packages per run (20000)"
+)
+parser.add_argument(
+    "--backlog",
+    type=int,
+    nargs="+",
+    default=[1, 10, 100, 1000],
+    help="packages buffered before they are parsed (1 10 100 1000)",
+)
+args = parser.parse_args()
+
+
+class StreamSocket(object):
+    """Minimal socket replacement reading from an in memory byte stream"""
+
+    def __init__(self, data):
+        self.__stream = io.BytesIO(data)
+
+    def recv(self, size):
+        return self.__stream.read(size)
+
+    def recv_into(self, buf):
+        return self.__stream.readinto(buf)
+
+
+class LegacyBuffer(object):
+    """The buffering scheme RTDE used before PacketBuffer"""
+
+    def __init__(self):
+        self.buf = b""
+        self.bytes_copied = 0
+
+    def recv_into(self, sock):
+        more = sock.recv(rtde.RECV_CHUNK_SIZE)
+        self.bytes_copied += len(self.buf) + len(more)
+        self.buf = self.buf + more
+        return len(more)
+
+    def pop(self):
+        if len(self.buf) < 3:
+            return None
+        size = serialize.ControlHeader.unpack(self.buf).size
+        if len(self.buf) < size:
+            return None
+        packet, self.buf = self.buf[3:size], self.buf[size:]
+        self.bytes_copied += len(packet) + len(self.buf)
+        return packet
+
+
+class NewBuffer(object):
+    def __init__(self):
+        self.buf = rtde.PacketBuffer()
+
+    def recv_into(self, sock):
+        return self.buf.recv_into(sock)
+
+    def pop(self):
+        header = self.buf.peek_header()
+        if header is None or len(self.buf) < header[0]:
+            return None
+        return self.buf.pop(header[0])
+
+    @property
+    def bytes_copied(self):
+        return self.buf.bytes_copied
+
+
+def make_package(config, recipe_id=1):
+    # one format character per value after the byte order and recipe id
+    values = [recipe_id] + [0] * (len(config.fmt) - 2)
+    payload = struct.pack(config.fmt, *values)
+    return struct.pack(">HB", len(payload) + 3, rtde.Command.RTDE_DATA_PACKAGE) + payload
+
+
+def run(buffer, package, packages, backlog, config):
+    chunk = package * backlog
+    start = time.perf_counter()
+    parsed = 0
+    while parsed < packages:
+        sock = StreamSocket(chunk)
+        while buffer.recv_into(sock):
+            pass
+        payload = buffer.pop()
+        while payload is not None:
+            config.unpack(payload)
+            parsed += 1
+            payload = buffer.pop()
+    elapsed = time.perf_counter() - start
+    return buffer.bytes_copied / float(parsed), elapsed / parsed * 1e6
+
+
+conf = rtde_config.ConfigFile(args.config)
+output_names, output_types = conf.get_recipe("out")
+config = serialize.DataConfig.unpack_recipe(
+    b"\x01" + ",".join(output_types).encode("utf-8")
+)
+config.names = output_names
+package = make_package(config)
+
+print("package size: %d bytes" % len(package))
+print("%8s %22s %22s %14s %14s" % ("backlog", "legacy copied/pkg [B]", "new copied/pkg [B]", "legacy [us]", "new [us]"))
+for backlog in args.backlog:
+    legacy_copied, legacy_us = run(LegacyBuffer(), package, args.packages, backlog, config)
+    new_copied, new_us = run(NewBuffer(), package, args.packages, backlog, config)
+    print(
+        "%8d %22.1f %22.1f %14.2f %14.2f"
+        % (backlog, legacy_copied, new_copied, legacy_us, new_us)
+    )
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""Benchmark of the RTDE framing and decoding on captured traffic.
+
+Replays a capture written by record.py --capture through RTDE, repeating
+the setup requests record.py made, and reports the time spent per data
+package, optionally with a cProfile listing.
+"""
+
+import argparse
+import cProfile
+import pstats
+import sys
+import time
+
+sys.path.append("..")
+import rtde.rtde as rtde
+import rtde.rtde_config as rtde_config
+
+parser = argparse.ArgumentParser()
+parser.add_argument("capture", help="capture file written by record.py --capture")
+parser.add_argument(
+    "--config",
+    default="record_configuration.xml",
+    help="data configuration file used for the capture (record_configuration.xml)",
+)
+parser.add_argument(
+    "--frequency", type=int, default=125, help="the sampling frequency in Herz (125)"
+)
+parser.add_argument(
+    "--buffered", help="use buffered receive which doesn't skip data", action="store_true"
+)
+parser.add_argument(
+    "--binary", help="return the raw payloads instead of decoding", action="store_true"
+)
+parser.add_argument("--profile", help="print a cProfile listing", action="store_true")
+args = parser.parse_args()
+
+conf = rtde_config.ConfigFile(args.config)
+output_names, output_types = conf.get_recipe("out")
+
+
+def replay():
+    con = rtde.RTDE("replay")
+    con.replay(args.capture)
+    con.get_controller_version()
+    con.send_output_setup(output_names, output_types, frequency=args.frequency)
+    con.send_start()
+    received = 0
+    start = time.perf_counter()
+    try:
+        while con.is_connected():
+            if args.buffered:
+                state = con.receive_buffered(args.binary)
+            else:
+                state = con.receive(args.binary)
+            if state is not None:
+                received += 1
+    except rtde.RTDEException:
+        pass  # end of the capture
+    elapsed = time.perf_counter() - start
+    return received, con.skipped_package_count, elapsed
+
+
+if args.profile:
+    profile = cProfile.Profile()
+    received, skipped, elapsed = profile.runcall(replay)
+    pstats.Stats(profile).sort_stats("cumulative").print_stats(15)
+else:
+    received, skipped, elapsed = replay()
+print(
+    "%d packages returned, %d skipped, %.2f us per package"
+    % (received, skipped, elapsed / max(received + skipped, 1) * 1e6)
+)
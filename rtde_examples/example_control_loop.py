@@ -29,6 +29,7 @@ import logging
 
 import rtde.rtde as rtde
 import rtde.rtde_config as rtde_config
+import rtde.input_scheduler as input_scheduler
 
 
 # logging.basicConfig(level=logging.INFO)
@@ -36,6 +37,7 @@ import rtde.rtde_config as rtde_config
 ROBOT_HOST = "localhost"
 ROBOT_PORT = 30004
 config_filename = "control_loop_configuration.xml"
+WATCHDOG_RATE = 10  # Hz, well above the 1 Hz watchdog of the robot program
 
 keep_running = True
 
@@ -85,6 +87,12 @@ def list_to_setp(sp, list):
     return sp
 
 
+# setpoints are sent when they change, the watchdog periodically and on change,
+# packages due in the same cycle go out in one write
+scheduler = input_scheduler.InputScheduler(con)
+scheduler.add(setp)
+scheduler.add(watchdog, rate=WATCHDOG_RATE, on_change=True)
+
 # start data synchronization
 if not con.send_start():
     sys.exit()
@@ -104,16 +112,14 @@ while keep_running:
         new_setp = setp1 if setp_to_list(setp) == setp2 else setp2
         list_to_setp(setp, new_setp)
         print("New pose = " + str(new_setp))
-        # send new setpoint
-        con.send(setp)
         watchdog.input_int_register_0 = 1
     elif not move_completed and state.output_int_register_0 == 0:
         print("Move to confirmed pose = " + str(state.target_q))
         move_completed = True
         watchdog.input_int_register_0 = 0
 
-    # kick watchdog
-    con.send(watchdog)
+    # send the new setpoint and kick the watchdog
+    scheduler.run_once()
 
 con.send_pause()
 
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+"""Minimal RTDE controller simulator.
+
+Speaks enough of the RTDE protocol (version 2) for the client in rtde/ to
+connect, set up recipes, start and pause synchronization and stream data
+packages. Output values are zero, except a leading DOUBLE field such as
+"timestamp", which counts the seconds since synchronization started.
+Field types are looked up in the recipe files of this repository. Received input packages are kept in FakeController.inputs.
+Input fields listed in in_use are answered with IN_USE, as for a field that
+another client already writes. Clearing the FakeController.reading event
+stops reading from the clients, e.g. to fill the socket buffer of one.
+"""
+
+import argparse
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+sys.path.append("..")
+import rtde.rtde as rtde
+
+DEFAULT_TYPE = "DOUBLE"
+_here = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CONFIGS = [
+    os.path.join(_here, "record_configuration.xml"),
+    os.path.join(_here, "control_loop_configuration.xml"),
+    os.path.join(_here, "..", "recipe.xml"),
+]
+
+_type_fmt = {
+    "VECTOR6D": "d" * 6,
+    "VECTOR3D": "d" * 3,
+    "VECTOR6INT32": "i" * 6,
+    "VECTOR6UINT32": "I" * 6,
+    "DOUBLE": "d",
+    "UINT64": "Q",
+    "UINT32": "I",
+    "INT32": "i",
+    "UINT8": "B",
+    "BOOL": "?",
+}
+
+
+def load_field_types(filenames):
+    """Collects the field types of all recipes in the given configuration files"""
+    field_types = {}
+    for filename in filenames:
+        if not os.path.exists(filename):
+            continue
+        root = ET.parse(filename).getroot()
+        for field in root.iter("field"):
+            field_types[field.get("name")] = field.get("type")
+    return field_types
+
+
+def make_package(command, payload=b""):
+    return struct.pack(">HB", len(payload) + 3, command) + payload
+
+
+class FakeController(object):
+    def __init__(
+        self, host="127.0.0.1", port=0, config_files=DEFAULT_CONFIGS, in_use=()
+    ):
+        self.field_types = load_field_types(config_files)
+        self.in_use = set(in_use)
+        self.__server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.__server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.__server.bind((host, port))
+        self.__server.listen(16)
+        self.host, self.port = self.__server.getsockname()
+        self.inputs = []
+        self.reading = threading.Event()
+        self.reading.set()
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__serve, daemon=True)
+        self.__thread.start()
+
+    def close(self):
+        self.__running = False
+        self.__server.close()
+
+    def __serve(self):
+        while self.__running:
+            try:
+                conn, _ = self.__server.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            session = _Session(self, conn)
+            threading.Thread(target=session.run, daemon=True).start()
+
+
+class _Session(object):
+    def __init__(self, controller, conn):
+        self.controller = controller
+        self.conn = conn
+        self.lock = threading.Lock()
+        self.output_fmt = None
+        self.frequency = 125.0
+        self.streaming = threading.Event()
+        self.start_count = 0  # restarts the stream timing, also for a quick pause/start
+        self.restarted = threading.Event()
+        self.recipes = {}
+
+    def field_type(self, name):
+        return self.controller.field_types.get(name, DEFAULT_TYPE)
+
+    def send(self, data):
+        with self.lock:
+            self.conn.sendall(data)
+
+    def run(self):
+        buf = b""
+        threading.Thread(target=self.stream, daemon=True).start()
+        try:
+            while True:
+                self.controller.reading.wait()
+                more = self.conn.recv(65536)
+                if not more:
+                    break
+                buf += more
+                while len(buf) >= 3:
+                    size, command = struct.unpack_from(">HB", buf)
+                    if len(buf) < size:
+                        break
+                    payload, buf = buf[3:size], buf[size:]
+                    self.on_package(command, payload)
+        except OSError:
+            pass
+        finally:
+            self.streaming.clear()
+            self.conn.close()
+
+    def on_package(self, command, payload):
+        if command == rtde.Command.RTDE_REQUEST_PROTOCOL_VERSION:
+            self.send(make_package(command, b"\x01"))
+        elif command == rtde.Command.RTDE_GET_URCONTROL_VERSION:
+            self.send(make_package(command, struct.pack(">IIII", 5, 11, 0, 0)))
+        elif command == rtde.Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS:
+            self.frequency = struct.unpack_from(">d", payload)[0]
+            names = payload[8:].decode("utf-8").split(",")
+            types = [self.field_type(n) for n in names]
+            self.output_fmt = struct.Struct(
+                ">B" + "".join(_type_fmt[t] for t in types)
+            )
+            self.send(make_package(command, b"\x00" + ",".join(types).encode()))
+        elif command == rtde.Command.RTDE_CONTROL_PACKAGE_SETUP_INPUTS:
+            names = payload.decode("utf-8").split(",")
+            types = [self.field_type(n) for n in names]
+            if self.controller.in_use.intersection(names):
+                types = [
+                    "IN_USE" if n in self.controller.in_use else t
+                    for n, t in zip(names, types)
+                ]
+                self.send(make_package(command, b"\x00" + ",".join(types).encode()))
+                return
+            recipe_id = len(self.recipes) + 1
+            self.recipes[recipe_id] = struct.Struct(
+                ">B" + "".join(_type_fmt[t] for t in types)
+            )
+            self.send(
+                make_package(
+                    command, struct.pack(">B", recipe_id) + ",".join(types).encode()
+                )
+            )
+        elif command == rtde.Command.RTDE_CONTROL_PACKAGE_START:
+            self.start_count += 1
+            self.streaming.set()
+            self.restarted.set()
+            self.send(make_package(command, b"\x01"))
+        elif command == rtde.Command.RTDE_CONTROL_PACKAGE_PAUSE:
+            self.streaming.clear()
+            self.send(make_package(command, b"\x01"))
+        elif command == rtde.Command.RTDE_DATA_PACKAGE:
+            recipe = self.recipes.get(payload[0])
+            if recipe is not None:
+                self.controller.inputs.append(recipe.unpack(payload))
+
+    def stream(self):
+        start_count = 0
+        while True:
+            if not self.streaming.is_set():
+                if self.conn.fileno() < 0:
+                    return
+                self.streaming.wait(0.1)
+                continue
+            if start_count != self.start_count:
+                self.restarted.clear()
+                start_count = self.start_count
+                start = time.monotonic()
+                cycle = 0
+            fmt = self.output_fmt
+            if fmt is None:
+                continue
+            now = time.monotonic()
+            values = [0] * (len(fmt.format) - 2)
+            if fmt.format[2] == "d":
+                values[0] = now - start
+            try:
+                self.send(
+                    make_package(rtde.Command.RTDE_DATA_PACKAGE, fmt.pack(0, *values))
+                )
+            except OSError:
+                return
+            cycle += 1
+            delay = start + cycle / self.frequency - time.monotonic()
+            if delay > 0:
+                self.restarted.wait(delay)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--host", default="127.0.0.1", help="address to listen on (127.0.0.1)"
+    )
+    parser.add_argument("--port", type=int, default=30004, help="port number (30004)")
+    parser.add_argument(
+        "--count",
+        type=int,
+        default=1,
+        help="number of controllers, listening on consecutive ports (1)",
+    )
+    args = parser.parse_args()
+
+    controllers = []
+    for i in range(args.count):
+        controller = FakeController(args.host, args.port + i)
+        controllers.append(controller)
+        print("Fake RTDE controller listening on %s:%d" % (controller.host, controller.port))
+    sys.stdout.flush()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for controller in controllers:
+            controller.close()
@@ -31,6 +31,8 @@ import sys
 sys.path.append("..")
 
 import rtde.csv_reader as csv_reader
+import rtde.csv_binary_reader as csv_binary_reader
+import rtde.csv_binary_writer as csv_binary_writer
 
 
 class Plotter(object):
@@ -109,7 +111,7 @@ class Plotter(object):
         plot_name = name
         cnt = 0
         for p in self.plot_data:
-            y = p.__dict__[name]
+            y = getattr(p, name)
             if len(self.plot_data) > 1:
                 plot_name = name + " " + p.get_name()
             plot_color = self.get_plot_color(style, cnt)
@@ -161,12 +163,12 @@ class Plotter(object):
                 self.addYtext(subplots, naming)
                 for i in range(6):
                     name = "target_current_" + str(i)
-                    target_current = self.plot_data[0].__dict__[name]
+                    target_current = getattr(self.plot_data[0], name)
                     self.makesubplot(subplots[i], name, "rx-")
                     name = "actual_current_" + str(i)
                     self.makesubplot(subplots[i], name, "b+-")
                     name = "actual_current_window_" + str(i)
-                    current_window = self.plot_data[0].__dict__[name]
+                    current_window = getattr(self.plot_data[0], name)
                     self.makesubplot_withdata(
                         subplots[i],
                         target_current + current_window,
@@ -266,12 +268,12 @@ class Plotter(object):
                 name = "target_qdd_" + str(idx)
                 self.makesubplot(subplots[2], name, "rx-", 40)
                 name = "target_current_" + str(idx)
-                target_current = self.plot_data[0].__dict__[name]
+                target_current = getattr(self.plot_data[0], name)
                 self.makesubplot(subplots[3], name, "rx-")
                 name = "actual_current_" + str(idx)
                 self.makesubplot(subplots[3], name, "b+-")
                 name = "actual_current_window_" + str(idx)
-                current_window = self.plot_data[0].__dict__[name]
+                current_window = getattr(self.plot_data[0], name)
                 self.makesubplot_withdata(
                     subplots[3], target_current + current_window, "current max", "--"
                 )
@@ -302,13 +304,60 @@ class Plotter(object):
         plot_data.append(data)
         return (plot_samples, plot_data)
 
+    def get_plot_columns(self, plot_types):
+        """The columns plot_all() uses for the plot types"""
+        columns = ["robot_mode", "safety_mode"]
+        for plot_type in plot_types:
+            if plot_type in ("q", "qd"):
+                fields = ["target_" + plot_type, "actual_" + plot_type]
+            elif plot_type == "i":
+                fields = ["target_current", "actual_current", "actual_current_window"]
+            elif plot_type == "qdd":
+                fields = ["target_qdd"]
+            elif plot_type == "x":
+                fields = ["target_TCP_pose", "actual_TCP_pose"]
+            elif plot_type == "xd":
+                fields = ["target_TCP_speed", "actual_TCP_speed"]
+            elif plot_type.isdigit():
+                idx = plot_type
+                fields = []
+                columns += [
+                    "target_q_" + idx,
+                    "actual_q_" + idx,
+                    "target_qd_" + idx,
+                    "actual_qd_" + idx,
+                    "target_qdd_" + idx,
+                    "target_current_" + idx,
+                    "actual_current_" + idx,
+                    "actual_current_window_" + idx,
+                    "joint_mode_" + idx,
+                    "joint_control_output_" + idx,
+                ]
+            else:
+                raise ValueError("Unrecognized plot type: " + plot_type)
+            columns += [field + "_" + str(i) for field in fields for i in range(6)]
+        return columns
+
     def get_plot_data(self, args):
+        # only the plotted columns are parsed from CSV files
+        columns = self.get_plot_columns(args.type)
         for file in args.file:
-            with open(file) as csvfile:
-                data = csv_reader.CSVReader(csvfile, filter_running_program=args.filter)
-                self.plot_samples, self.plot_data = self.fill_plot_data(
-                    data, self.plot_samples, self.plot_data
-                )
+            with open(file, "rb") as binfile:
+                binary = binfile.read(len(csv_binary_writer.MAGIC)) == csv_binary_writer.MAGIC
+                binfile.seek(0)
+                if binary:
+                    # memory mapped, only the plotted columns are read
+                    data = csv_binary_reader.CSVBinaryReader(
+                        binfile, filter_running_program=args.filter
+                    )
+            if not binary:
+                with open(file) as csvfile:
+                    data = csv_reader.CSVReader(
+                        csvfile, filter_running_program=args.filter, columns=columns
+                    )
+            self.plot_samples, self.plot_data = self.fill_plot_data(
+                data, self.plot_samples, self.plot_data
+            )
 
 
 if __name__ == "__main__":
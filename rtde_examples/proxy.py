@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# Copyright (c) 2020-2022, Universal Robots A/S,
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the Universal Robots A/S nor the names of its
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL UNIVERSAL ROBOTS A/S BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Holds the RTDE connection to a robot and shares it with local clients.
+
+Clients connect through the Unix socket with
+    con = rtde.RTDE(path)
+    con.connect(rtde_proxy.open_socket(path))
+and then use the usual recipe setup, start, receive and send calls with
+any of the fields of the recipes given here.
+"""
+
+import argparse
+import logging
+import sys
+import threading
+
+sys.path.append("..")
+import rtde.rtde_config as rtde_config
+import rtde.rtde_proxy as rtde_proxy
+
+# parameters
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--host", default="localhost", help="name of host to connect to (localhost)"
+)
+parser.add_argument("--port", type=int, default=30004, help="port number (30004)")
+parser.add_argument(
+    "--frequency", type=int, default=500, help="the robot side frequency in Herz (500)"
+)
+parser.add_argument(
+    "--config",
+    default="../recipe.xml",
+    help="data configuration file to use (../recipe.xml)",
+)
+parser.add_argument(
+    "--outputs", nargs="+", default=["out"], help="output recipe keys to merge (out)"
+)
+parser.add_argument(
+    "--inputs", nargs="*", default=["in"], help="input recipe keys (in)"
+)
+parser.add_argument(
+    "--socket",
+    default=rtde_proxy.DEFAULT_SOCKET_PATH,
+    help="Unix socket to listen on (%s)" % rtde_proxy.DEFAULT_SOCKET_PATH,
+)
+parser.add_argument("--verbose", help="increase output verbosity", action="store_true")
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+conf = rtde_config.ConfigFile(args.config)
+output_names = []
+output_types = []
+for key in args.outputs:
+    names, types = conf.get_recipe(key)
+    for name, type in zip(names, types):
+        if name not in output_names:
+            output_names.append(name)
+            output_types.append(type)
+input_recipes = [conf.get_recipe(key) for key in args.inputs]
+
+proxy = rtde_proxy.RTDEProxy(
+    args.host,
+    output_names,
+    output_types,
+    args.frequency,
+    input_recipes,
+    port=args.port,
+    path=args.socket,
+)
+sys.stdout.write("RTDE proxy listening on %s\n" % args.socket)
+sys.stdout.flush()
+
+try:
+    proxy.run(threading.Event())
+except KeyboardInterrupt:
+    proxy.close()
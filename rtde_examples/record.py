@@ -29,8 +29,11 @@ import sys
 sys.path.append("..")
 import rtde.rtde as rtde
 import rtde.rtde_config as rtde_config
+import rtde.rtde_proxy as rtde_proxy
 import rtde.csv_writer as csv_writer
 import rtde.csv_binary_writer as csv_binary_writer
+import rtde.queued_writer as queued_writer
+import rtde.segmented_writer as segmented_writer
 
 # parameters
 parser = argparse.ArgumentParser()
@@ -54,16 +57,70 @@ parser.add_argument(
     default="robot_data.csv",
     help="data output file to write to (robot_data.csv)",
 )
+parser.add_argument(
+    "--proxy", help="record through the Unix socket of a running proxy.py"
+)
+parser.add_argument(
+    "--capture", help="also write the raw RTDE byte stream to this file for replay"
+)
+parser.add_argument(
+    "--replay", help="record from a file written with --capture instead of a robot"
+)
 parser.add_argument("--verbose", help="increase output verbosity", action="store_true")
 parser.add_argument(
     "--buffered",
-    help="Use buffered receive which doesn't skip data",
+    help="Use buffered receive which doesn't skip data, decoded in batches with numpy",
     action="store_true",
 )
 parser.add_argument(
     "--binary", help="save the data in binary format", action="store_true"
 )
+parser.add_argument(
+    "--vectors",
+    choices=["list", "array", "numpy"],
+    default="list",
+    help="decode vector fields as lists, array.array or numpy arrays (list)",
+)
+parser.add_argument(
+    "--batch",
+    type=int,
+    default=queued_writer.DEFAULT_BATCH_SIZE,
+    help="rows handed to the writer thread at once (%d)" % queued_writer.DEFAULT_BATCH_SIZE,
+)
+parser.add_argument(
+    "--queue",
+    type=int,
+    default=queued_writer.DEFAULT_MAX_BATCHES,
+    help="batches queued for the writer thread before new ones are dropped (%d)"
+    % queued_writer.DEFAULT_MAX_BATCHES,
+)
+parser.add_argument(
+    "--segment-size",
+    type=float,
+    help="split the output into segments of this many MB, listed in a manifest",
+)
+parser.add_argument(
+    "--segment-time",
+    type=float,
+    help="split the output into segments of this many seconds, listed in a manifest",
+)
+parser.add_argument(
+    "--compress",
+    choices=[
+        segmented_writer.COMPRESSION_NONE,
+        segmented_writer.COMPRESSION_ZLIB,
+        segmented_writer.COMPRESSION_LZMA,
+    ],
+    default=segmented_writer.COMPRESSION_ZLIB,
+    help="compression of closed segments (zlib)",
+)
+parser.add_argument(
+    "--max-size",
+    type=float,
+    help="delete the oldest segments while the segments take more than this many MB",
+)
 args = parser.parse_args()
+segmented = args.segment_size is not None or args.segment_time is not None
 
 if args.verbose:
     logging.basicConfig(level=logging.INFO)
@@ -72,7 +129,13 @@ conf = rtde_config.ConfigFile(args.config)
 output_names, output_types = conf.get_recipe("out")
 
 con = rtde.RTDE(args.host, args.port)
-con.connect()
+con.set_output_decoding(vectors=args.vectors)
+if args.capture:
+    con.start_capture(args.capture)
+if args.replay:
+    con.replay(args.replay)
+else:
+    con.connect(rtde_proxy.open_socket(args.proxy) if args.proxy else None)
 
 # get controller version
 con.get_controller_version()
@@ -88,21 +151,48 @@ if not con.send_start():
     sys.exit()
 
 writeModes = "wb" if args.binary else "w"
-with open(args.output, writeModes) as csvfile:
-    writer = None
-
-    if args.binary:
-        writer = csv_binary_writer.CSVBinaryWriter(csvfile, output_names, output_types)
+if segmented:
+    # the segments are compressed on a background thread
+    output = segmented_writer.SegmentedWriter(
+        args.output,
+        output_names,
+        output_types,
+        args.binary,
+        segment_bytes=(args.segment_size or float("inf")) * 1024 * 1024,
+        segment_seconds=args.segment_time,
+        compression=args.compress,
+        max_bytes=None if args.max_size is None else args.max_size * 1024 * 1024,
+    )
+else:
+    output = open(args.output, writeModes)
+with output as csvfile:
+    file_writer = None
+
+    if segmented:
+        file_writer = csvfile
+    elif args.binary:
+        file_writer = csv_binary_writer.CSVBinaryWriter(
+            csvfile, output_names, output_types
+        )
     else:
-        writer = csv_writer.CSVWriter(csvfile, output_names, output_types)
+        file_writer = csv_writer.CSVWriter(csvfile, output_names, output_types)
 
-    writer.writeheader()
+    file_writer.writeheader()
+    # the rows are written on a separate thread, a slow disk does not delay
+    # the socket reads. Buffered receives keep the packages in the receive
+    # buffer while the queue is full, otherwise new rows are dropped.
+    writer = queued_writer.QueuedWriter(
+        file_writer, args.batch, args.queue, block=args.buffered
+    )
 
     i = 1
+    failed = False
+    next_progress = args.frequency
     keep_running = True
     while keep_running:
 
-        if i % args.frequency == 0:
+        if i >= next_progress:
+            next_progress += args.frequency
             if args.samples > 0:
                 sys.stdout.write("\r")
                 sys.stdout.write("{:.2%} done.".format(float(i) / float(args.samples)))
@@ -114,22 +204,45 @@ with open(args.output, writeModes) as csvfile:
         if args.samples > 0 and i >= args.samples:
             keep_running = False
         try:
+            if args.buffered and not args.binary:
+                # all buffered packages at once, decoded into one structured array
+                batch = con.receive_batch()
+                if batch is not None:
+                    if args.samples > 0:
+                        batch = batch[: args.samples - i + 1]
+                        keep_running = i + len(batch) <= args.samples
+                    writer.write_batch(batch)
+                    i += len(batch)
+                elif not con.is_connected():
+                    keep_running = False
+                continue
             if args.buffered:
                 state = con.receive_buffered(args.binary)
             else:
                 state = con.receive(args.binary)
             if state is not None:
-                writer.writerow(state)
+                writer.write(state)
                 i += 1
+            elif not con.is_connected():
+                keep_running = False
 
         except KeyboardInterrupt:
             keep_running = False
         except rtde.RTDEException:
             con.disconnect()
-            sys.exit()
+            failed = not args.replay  # else the end of the capture
+            keep_running = False
 
+    writer.close()
+    if args.binary:
+        file_writer.writefooter()
+    if failed:
+        sys.exit()
 
 sys.stdout.write("\rComplete!            \n")
+print("Writer: " + writer.stats())
 
-con.send_pause()
+if con.is_connected():
+    con.send_pause()
 con.disconnect()
+con.stop_capture()
@@ -0,0 +1,157 @@
+"""AsyncRTDE and RTDE against rtde_examples/fake_controller.py.
+
+Both clients run the same handshake, streaming and input scenario, and
+both raise the ValueError of an IN_USE input setup to the caller.
+
+Run from the repository root: python -m pytest tests
+"""
+
+import asyncio
+import os
+import sys
+import time
+import unittest
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _root)
+sys.path.insert(0, os.path.join(_root, "rtde_examples"))
+
+import rtde.rtde as rtde
+from rtde.async_rtde import AsyncRTDE
+from fake_controller import FakeController
+
+OUTPUT_NAMES = ["timestamp", "actual_TCP_speed"]
+OUTPUT_TYPES = ["DOUBLE", "VECTOR6D"]
+INPUT_NAMES = ["speed_slider_mask", "speed_slider_fraction"]
+INPUT_TYPES = ["UINT32", "DOUBLE"]
+IN_USE_FIELD = "input_int_register_0"
+FREQUENCY = 500
+
+
+def wait_for_inputs(controller, count, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while len(controller.inputs) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return controller.inputs
+
+
+class AsyncRTDETest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.controller = FakeController(in_use=[IN_USE_FIELD])
+        self.con = AsyncRTDE(self.controller.host, self.controller.port)
+
+    async def asyncTearDown(self):
+        await self.con.disconnect()
+
+    def tearDown(self):
+        self.controller.close()
+
+    async def test_stream_and_send(self):
+        await self.con.connect()
+        self.assertTrue(self.con.is_connected())
+        self.assertEqual(await self.con.get_controller_version(), (5, 11, 0, 0))
+        self.assertTrue(
+            await self.con.send_output_setup(OUTPUT_NAMES, OUTPUT_TYPES, FREQUENCY)
+        )
+        inputs = await self.con.send_input_setup(INPUT_NAMES, INPUT_TYPES)
+        self.assertIsNotNone(inputs)
+        self.assertTrue(await self.con.send_start())
+
+        timestamps = []
+        async for state in self.con:
+            self.assertEqual(len(state.actual_TCP_speed), 6)
+            timestamps.append(state.timestamp)
+            if len(timestamps) == 10:
+                break
+        self.assertEqual(timestamps, sorted(timestamps))
+
+        inputs.speed_slider_mask = 1
+        inputs.speed_slider_fraction = 0.25
+        await self.con.send(inputs)
+        received = await asyncio.get_running_loop().run_in_executor(
+            None, wait_for_inputs, self.controller, 1
+        )
+        self.assertEqual(received[-1][1:], (1, 0.25))
+
+        self.assertTrue(await self.con.send_pause())
+        await self.con.disconnect()
+        self.assertFalse(self.con.is_connected())
+
+    async def test_type_mismatch(self):
+        await self.con.connect()
+        self.assertFalse(
+            await self.con.send_output_setup(OUTPUT_NAMES, ["DOUBLE", "VECTOR3D"])
+        )
+        self.assertTrue(self.con.is_connected())
+
+    async def test_in_use_input(self):
+        await self.con.connect()
+        self.assertTrue(await self.con.send_output_setup(OUTPUT_NAMES, OUTPUT_TYPES))
+        with self.assertRaises(ValueError):
+            await self.con.send_input_setup([IN_USE_FIELD], ["INT32"])
+        # the connection is closed, later requests fail at once
+        self.assertFalse(self.con.is_connected())
+        start = time.monotonic()
+        self.assertFalse(await self.con.send_output_setup(OUTPUT_NAMES, OUTPUT_TYPES))
+        self.assertIsNone(await asyncio.wait_for(self.con.receive(), 1.0))
+        self.assertLess(time.monotonic() - start, self.con.timeout)
+
+    async def test_controller_stops(self):
+        await self.con.connect()
+        self.assertTrue(await self.con.send_output_setup(OUTPUT_NAMES, OUTPUT_TYPES))
+        self.assertTrue(await self.con.send_start())
+        self.assertIsNotNone(await self.con.receive())
+        self.con._AsyncRTDE__writer.get_extra_info("socket").shutdown(2)
+        while await asyncio.wait_for(self.con.receive(), 1.0) is not None:
+            pass
+        self.assertFalse(self.con.is_connected())
+
+
+class RTDETest(unittest.TestCase):
+    """The same scenario with the blocking client"""
+
+    def setUp(self):
+        self.controller = FakeController(in_use=[IN_USE_FIELD])
+        self.con = rtde.RTDE(self.controller.host, self.controller.port)
+
+    def tearDown(self):
+        self.con.disconnect()
+        self.controller.close()
+
+    def test_stream_and_send(self):
+        self.con.connect()
+        self.assertTrue(self.con.is_connected())
+        self.assertEqual(self.con.get_controller_version(), (5, 11, 0, 0))
+        self.assertTrue(
+            self.con.send_output_setup(OUTPUT_NAMES, OUTPUT_TYPES, FREQUENCY)
+        )
+        inputs = self.con.send_input_setup(INPUT_NAMES, INPUT_TYPES)
+        self.assertIsNotNone(inputs)
+        self.assertTrue(self.con.send_start())
+
+        timestamps = [self.con.receive().timestamp for _ in range(10)]
+        self.assertEqual(timestamps, sorted(timestamps))
+
+        inputs.speed_slider_mask = 1
+        inputs.speed_slider_fraction = 0.25
+        self.con.send(inputs)
+        self.assertEqual(wait_for_inputs(self.controller, 1)[-1][1:], (1, 0.25))
+
+        self.assertTrue(self.con.send_pause())
+        self.con.disconnect()
+        self.assertFalse(self.con.is_connected())
+
+    def test_type_mismatch(self):
+        self.con.connect()
+        self.assertFalse(self.con.send_output_setup(OUTPUT_NAMES, ["DOUBLE", "VECTOR3D"]))
+        self.assertTrue(self.con.is_connected())
+
+    def test_in_use_input(self):
+        self.con.connect()
+        self.assertTrue(self.con.send_output_setup(OUTPUT_NAMES, OUTPUT_TYPES))
+        with self.assertRaises(ValueError):
+            self.con.send_input_setup([IN_USE_FIELD], ["INT32"])
+
+
+if __name__ == "__main__":
+    unittest.main()
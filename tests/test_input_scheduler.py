@@ -0,0 +1,72 @@
+"""InputScheduler with a recording connection.
+
+Run from the repository root: python -m pytest tests
+"""
+
+import array
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy
+
+from rtde import serialize
+from rtde.input_scheduler import InputScheduler
+
+
+class RecordingConnection(object):
+    def __init__(self):
+        self.sent = []
+
+    def send_many(self, input_data):
+        self.sent.append([data.recipe_id for data in input_data])
+        return True
+
+
+def make_input(recipe_id, **values):
+    data = serialize.DataObject()
+    data.recipe_id = recipe_id
+    for name, value in values.items():
+        data.__dict__[name] = value
+    return data
+
+
+class InputSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.con = RecordingConnection()
+        self.scheduler = InputScheduler(self.con)
+
+    def test_change_does_not_delay_the_periodic_send(self):
+        watchdog = make_input(1, input_int_register_0=0)
+        self.scheduler.add(watchdog, rate=10, on_change=True)
+        self.assertEqual(self.scheduler.run_once(now=0.0), 1)
+        watchdog.input_int_register_0 = 1
+        self.assertEqual(self.scheduler.run_once(now=0.05), 1)
+        # due 0.1 s after the last periodic send, not after the change
+        self.assertEqual(self.scheduler.run_once(now=0.09), 0)
+        self.assertEqual(self.scheduler.run_once(now=0.1), 1)
+        self.assertEqual(self.scheduler.run_once(now=0.15), 0)
+
+    def test_array_changed_in_place(self):
+        setp = make_input(1, input_double_register_0=array.array("d", [0.0, 0.0]))
+        self.scheduler.add(setp)
+        self.assertEqual(self.scheduler.run_once(now=0.0), 1)
+        self.assertEqual(self.scheduler.run_once(now=0.01), 0)
+        setp.input_double_register_0[1] = 1.0
+        self.assertEqual(self.scheduler.run_once(now=0.02), 1)
+        self.assertEqual(self.scheduler.run_once(now=0.03), 0)
+
+    def test_numpy_changed_in_place(self):
+        setp = make_input(1, input_double_register_0=numpy.zeros(6))
+        self.scheduler.add(setp)
+        self.assertEqual(self.scheduler.run_once(now=0.0), 1)
+        self.assertEqual(self.scheduler.run_once(now=0.01), 0)
+        setp.input_double_register_0[3] = 0.5
+        self.assertEqual(self.scheduler.run_once(now=0.02), 1)
+        self.assertEqual(self.scheduler.run_once(now=0.03), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
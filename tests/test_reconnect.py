@@ -0,0 +1,70 @@
+"""Reconnector with connections that fail in unexpected ways.
+
+Run from the repository root: python -m pytest tests
+"""
+
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rtde.reconnect import Backoff, Reconnector
+
+
+class FakeConnection(object):
+    def __init__(self):
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+    def send_pause(self):
+        raise KeyError("pause")
+
+    def disconnect(self):
+        self.connected = False
+
+
+class ReconnectorTest(unittest.TestCase):
+    def setUp(self):
+        self.stop_event = threading.Event()
+        self.backoff = Backoff(first_delay=0.0, initial_delay=0.001, max_delay=0.001)
+
+    def test_unexpected_errors_are_retried(self):
+        errors = [KeyError("factory"), AttributeError("setup")]
+        closed = []
+
+        def factory():
+            if errors and isinstance(errors[0], KeyError):
+                raise errors.pop(0)
+            con = FakeConnection()
+            closed.append(con)
+            return con
+
+        def setup(con):
+            if errors:
+                raise errors.pop(0)
+            return ["inputs"]
+
+        reconnector = Reconnector(factory, setup, self.stop_event, self.backoff)
+        con, result = reconnector.connect()
+        self.assertEqual(result, ["inputs"])
+        self.assertEqual(reconnector.attempt_count, 3)
+        # the connection of the failed setup was closed although its pause raised
+        self.assertFalse(closed[0].is_connected())
+        self.assertIs(con, closed[1])
+        self.assertTrue(con.is_connected())
+
+    def test_stop_ends_the_retries(self):
+        def factory():
+            self.stop_event.set()
+            raise TypeError("factory")
+
+        reconnector = Reconnector(factory, None, self.stop_event, self.backoff)
+        self.assertEqual(reconnector.connect(), (None, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+"""RTDEPool against rtde_examples/fake_controller.py.
+
+Run from the repository root: python -m pytest tests
+"""
+
+import os
+import socket
+import sys
+import time
+import unittest
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _root)
+sys.path.insert(0, os.path.join(_root, "rtde_examples"))
+
+import rtde.rtde_pool as rtde_pool
+from fake_controller import FakeController
+
+OUTPUT_NAMES = ["timestamp", "actual_TCP_speed"]
+OUTPUT_TYPES = ["DOUBLE", "VECTOR6D"]
+IN_USE_FIELD = "input_int_register_0"
+
+
+class RTDEPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.controllers = []
+        self.pool = rtde_pool.RTDEPool(timeout=0.2, retry_delay=0.05)
+
+    def tearDown(self):
+        self.pool.close()
+        for controller in self.controllers:
+            controller.close()
+
+    def add_robot(self, name, input_recipes={}, in_use=()):
+        controller = FakeController(in_use=in_use)
+        self.controllers.append(controller)
+        return self.pool.add_robot(
+            name,
+            controller.host,
+            OUTPUT_NAMES,
+            OUTPUT_TYPES,
+            frequency=250,
+            port=controller.port,
+            input_recipes=input_recipes,
+        )
+
+    def run_pool(self, seconds):
+        """Runs the pool, returns the longest time run_once() took"""
+        longest = 0.0
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            start = time.monotonic()
+            self.pool.run_once()
+            longest = max(longest, time.monotonic() - start)
+        return longest
+
+    def test_streams_with_inputs(self):
+        session = self.add_robot(
+            "a",
+            {"speed": (["speed_slider_mask", "speed_slider_fraction"], ["UINT32", "DOUBLE"])},
+        )
+        self.run_pool(0.5)
+        self.assertTrue(session.is_streaming())
+        self.assertGreater(session.received_count, 50)
+        self.assertIn("speed", session.inputs)
+
+    def test_in_use_input_fails_only_its_robot(self):
+        healthy = self.add_robot("healthy")
+        broken = self.add_robot("broken", {"in": ([IN_USE_FIELD], ["INT32"])}, [IN_USE_FIELD])
+        self.run_pool(0.5)
+        self.assertTrue(healthy.is_streaming())
+        self.assertGreater(healthy.received_count, 50)
+        self.assertFalse(broken.is_streaming())
+        self.assertEqual(broken.received_count, 0)
+
+    def test_silent_robot_does_not_block_the_loop(self):
+        # accepts the connection but never answers the handshake
+        silent = socket.socket()
+        silent.bind(("127.0.0.1", 0))
+        silent.listen(4)
+        self.addCleanup(silent.close)
+        healthy = self.add_robot("healthy")
+        self.pool.add_robot(
+            "silent", "127.0.0.1", OUTPUT_NAMES, OUTPUT_TYPES, port=silent.getsockname()[1]
+        )
+        longest = self.run_pool(1.0)
+        self.assertLess(longest, self.pool.timeout / 2)
+        self.assertTrue(healthy.is_streaming())
+        self.assertGreater(healthy.received_count, 150)
+        self.assertFalse(self.pool.get_session("silent").is_streaming())
+
+    def test_full_send_buffer_does_not_block_the_loop(self):
+        recipe = {"speed": (["speed_slider_mask", "speed_slider_fraction"], ["UINT32", "DOUBLE"])}
+        healthy = self.add_robot("healthy")
+        stuck = self.add_robot("stuck", recipe)
+        controller = self.controllers[1]
+        # small socket buffers on both ends fill after a few hundred sends
+        controller._FakeController__server.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        self.run_pool(0.3)
+        self.assertTrue(stuck.is_streaming())
+        speed = stuck.inputs["speed"]
+        speed.speed_slider_mask = 1
+        speed.speed_slider_fraction = 0.5
+        con = stuck.connection
+        con._RTDE__sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        controller.reading.clear()
+        self.addCleanup(controller.reading.set)
+        received = healthy.received_count
+        sends = 0
+        while con.pending_send() == 0 and sends < 100000:
+            start = time.monotonic()
+            self.assertTrue(self.pool.send("stuck", speed))
+            self.assertLess(time.monotonic() - start, self.pool.timeout / 2)
+            sends += 1
+        self.assertGreater(con.pending_send(), 0)
+        self.assertLess(self.run_pool(0.2), self.pool.timeout / 2)
+        self.assertGreater(healthy.received_count, received)
+
+        # the queue is written once the robot reads again
+        controller.reading.set()
+        self.run_pool(0.5)
+        self.assertTrue(stuck.is_streaming())
+        self.assertEqual(con.pending_send(), 0)
+        self.assertEqual(len(controller.inputs), sends)
+
+    def test_unresolvable_robot_fails_only_its_session(self):
+        healthy = self.add_robot("healthy")
+        unresolvable = self.pool.add_robot(
+            "unresolvable", "no-such-host.invalid", OUTPUT_NAMES, OUTPUT_TYPES
+        )
+        self.run_pool(0.5)
+        self.assertTrue(healthy.is_streaming())
+        self.assertGreater(healthy.received_count, 50)
+        self.assertFalse(unresolvable.is_streaming())
+        self.assertEqual(unresolvable.connect_count, 0)
+        self.assertIsNone(unresolvable.sock)
+
+    def test_hostname_is_resolved(self):
+        controller = FakeController()
+        self.controllers.append(controller)
+        session = self.pool.add_robot(
+            "a", "localhost", OUTPUT_NAMES, OUTPUT_TYPES, port=controller.port
+        )
+        self.run_pool(0.3)
+        self.assertTrue(session.is_streaming())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+"""RTDEProxy between rtde.RTDE clients and rtde_examples/fake_controller.py.
+
+Run from the repository root: python -m pytest tests
+"""
+
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _root)
+sys.path.insert(0, os.path.join(_root, "rtde_examples"))
+
+import rtde.rtde as rtde
+import rtde.rtde_proxy as rtde_proxy
+from fake_controller import FakeController
+
+OUTPUT_NAMES = ["timestamp"]
+OUTPUT_TYPES = ["DOUBLE"]
+INPUT_NAMES = ["speed_slider_mask", "speed_slider_fraction"]
+INPUT_TYPES = ["UINT32", "DOUBLE"]
+
+
+def wait_for(condition, timeout=2.0, step=None):
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            return False
+        if step is None:
+            time.sleep(0.01)
+        else:
+            step()
+    return True
+
+
+class RTDEProxyTest(unittest.TestCase):
+    def setUp(self):
+        self.controller = FakeController()
+        self.addCleanup(self.controller.close)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.proxy = rtde_proxy.RTDEProxy(
+            self.controller.host,
+            OUTPUT_NAMES,
+            OUTPUT_TYPES,
+            input_recipes=[(INPUT_NAMES, INPUT_TYPES)],
+            port=self.controller.port,
+            path=os.path.join(directory, "proxy.sock"),
+            timeout=0.5,
+            retry_delay=0.01,
+        )
+        self.addCleanup(self.proxy.close)
+        self.__stop = threading.Event()
+        self.__loop = threading.Thread(target=self.__run_proxy)
+        self.__loop.daemon = True
+        self.__loop.start()
+        self.addCleanup(self.stop_proxy_thread)
+
+    def __run_proxy(self):
+        while not self.__stop.is_set():
+            self.proxy.run_once(0.01)
+
+    def stop_proxy_thread(self):
+        """From here on the test calls run_once() itself"""
+        self.__stop.set()
+        self.__loop.join()
+
+    def connect_client(self):
+        con = rtde.RTDE("proxy")
+        con.connect(rtde_proxy.open_socket(self.proxy.path))
+        speed = con.send_input_setup(INPUT_NAMES, INPUT_TYPES)
+        self.assertIsNotNone(speed)
+        self.assertTrue(con.send_output_setup(OUTPUT_NAMES, OUTPUT_TYPES))
+        self.assertTrue(con.send_start())
+        speed.speed_slider_mask = 1
+        speed.speed_slider_fraction = 0.25
+        con.send(speed)
+        self.assertTrue(wait_for(lambda: len(self.controller.inputs) > 0))
+        return con
+
+    def reconnect_robot(self):
+        """Breaks the robot connection and waits for the proxy to reconnect,
+        returns the number of inputs the controller got before"""
+        self.assertTrue(wait_for(self.proxy.is_robot_connected))
+        sent = len(self.controller.inputs)
+        robot = self.proxy._RTDEProxy__robot
+        robot._RTDE__sock.shutdown(socket.SHUT_RDWR)
+        self.assertTrue(
+            wait_for(lambda: self.proxy._RTDEProxy__robot is not robot, step=self.proxy.run_once)
+        )
+        self.assertTrue(wait_for(self.proxy.is_robot_connected, step=self.proxy.run_once))
+        wait_for(lambda: False, timeout=0.2, step=lambda: self.proxy.run_once(0.01))
+        return sent
+
+    def test_inputs_of_connected_client_restored_after_reconnect(self):
+        con = self.connect_client()
+        self.addCleanup(con.disconnect)
+        self.stop_proxy_thread()
+        sent = self.reconnect_robot()
+        self.assertGreater(len(self.controller.inputs), sent)
+        # recipe id, speed_slider_mask, speed_slider_fraction
+        self.assertEqual(self.controller.inputs[-1][1:], (1, 0.25))
+
+    def test_inputs_of_disconnected_client_not_restored(self):
+        con = self.connect_client()
+        con.disconnect()
+        self.assertTrue(wait_for(lambda: self.proxy.client_count() == 0))
+        self.stop_proxy_thread()
+        sent = self.reconnect_robot()
+        self.assertEqual(len(self.controller.inputs), sent)
+
+
+if __name__ == "__main__":
+    unittest.main()
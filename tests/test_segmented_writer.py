@@ -0,0 +1,75 @@
+"""SegmentedWriter segment sizes.
+
+Run from the repository root: python -m pytest tests
+"""
+
+import json
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rtde import csv_binary_writer, serialize, segmented_writer
+
+NAMES = ["timestamp", "actual_q"]
+TYPES = ["DOUBLE", "VECTOR6D"]
+SEGMENT_BYTES = 4096  # less than the buffer of a file
+
+
+class SegmentedWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "recording.csv")
+
+    def write(self, binary, rows):
+        writer = segmented_writer.SegmentedWriter(
+            self.path,
+            NAMES,
+            TYPES,
+            binary=binary,
+            segment_bytes=SEGMENT_BYTES,
+            compression=segmented_writer.COMPRESSION_NONE,
+        )
+        with writer:
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+        with open(segmented_writer.manifest_path(self.path)) as f:
+            return json.load(f)["segments"]
+
+    def assert_segments_close_at_size(self, segments, row_size, rows):
+        self.assertGreater(len(segments), 2)
+        self.assertEqual(sum(s["rows"] for s in segments), rows)
+        for segment in segments:
+            size = os.path.getsize(os.path.join(self.directory, segment["file"]))
+            self.assertEqual(segment["bytes"], size)
+        # all but the last segment end with the row that reached the size
+        for segment in segments[:-1]:
+            self.assertGreaterEqual(segment["bytes"], SEGMENT_BYTES)
+            self.assertLess(segment["bytes"], SEGMENT_BYTES + 2 * row_size)
+
+    def test_binary_segments(self):
+        fmt = csv_binary_writer.record_format(TYPES)
+        rows = [struct.pack(fmt, i * 0.002, *([0.5] * 6)) for i in range(1000)]
+        segments = self.write(True, rows)
+        # the footer with the index and the trailer is written on close
+        self.assert_segments_close_at_size(segments, struct.calcsize(fmt) + 64, len(rows))
+
+    def test_csv_segments(self):
+        rows = []
+        for i in range(1000):
+            row = serialize.DataObject()
+            row.timestamp = i * 0.002
+            row.actual_q = [0.5] * 6
+            rows.append(row)
+        segments = self.write(False, rows)
+        self.assert_segments_close_at_size(segments, 64, len(rows))
+
+
+if __name__ == "__main__":
+    unittest.main()